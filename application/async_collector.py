@@ -0,0 +1,236 @@
+"""
+Колектор на asyncio: запит /addHistory іде точно в свій слот (RATE_LIMITER),
+а пауза перед ним (DELAY, півтори години) використовується для фонової роботи
+замість сну в `make_request`:
+
+- підвантаження наступних порцій глав з БД (до COLLECTOR_PREFETCH_BATCHES);
+- обхід каталогу (і пошук нових глав манг з БД), коли прохід по БД вичерпано
+  і лишились лише підвантажені порції;
+- планове оновлення CSRF-токена сесії (SESSION_REFRESH_INTERVAL);
+- обслуговування БД (`maybe_run_maintenance`).
+
+Код мережі та БД синхронний, тож робота виконується в потоках: запит нагороди -
+в окремому потоці, який ніколи не зайнятий іншим; читання та запис стану
+колектора - в одному потоці БД (генератор порцій тримає свою сесію); обхід і
+оновлення сесії - у фонових потоках. Фонова робота лише починається в паузі,
+якщо до слота лишається більше COLLECTOR_IDLE_GUARD с, і запит нагороди
+на неї не чекає.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+
+from application.collector import ResourceCollector
+from mangabuff.reader import process_single_batch
+from utils.network_utils import RATE_LIMITER, renew_session_csrf
+from utils.settings import (
+    BASE_URL, ADD_HISTORY_PATH, DELAY, COLLECTOR_IDLE_GUARD, COLLECTOR_IDLE_CRAWL_WINDOW,
+    COLLECTOR_PREFETCH_BATCHES, SESSION_REFRESH_INTERVAL
+)
+
+# Як часто (с) переглядати фонову роботу протягом паузи
+_IDLE_TICK = 60.0
+
+
+class AsyncResourceCollector(ResourceCollector):
+    """
+    `ResourceCollector`, що не простоює між запитами нагороди. Порядок порцій,
+    облік прогресу та затримки - як у синхронного колектора.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._prefetched: Deque[Dict[str, Any]] = deque()
+        self._batches: Optional[Iterator[Dict[str, Any]]] = None # Лише в потоці БД
+        self._exhausted = False # Поточний прохід по БД вичерпано
+        self._crawled_this_pass = False
+        self._maintenance_due = False
+        # Сесія щойно створена або відновлена зі сховища з дійсним токеном -
+        # перше планове оновлення лише через SESSION_REFRESH_INTERVAL
+        self._last_session_refresh = time.monotonic()
+
+        self._prefetch: Optional[asyncio.Task] = None
+        self._crawl: Optional[asyncio.Future] = None
+        self._session_refresh: Optional[asyncio.Future] = None
+        self._maintenance: Optional[asyncio.Future] = None
+
+        self._reward_executor = ThreadPoolExecutor(1, thread_name_prefix="collector-reward")
+        self._db_executor = ThreadPoolExecutor(1, thread_name_prefix="collector-db")
+        self._background_executor = ThreadPoolExecutor(2, thread_name_prefix="collector-idle")
+
+    # --- Порції з БД (потік БД) ---
+    def _fetch_next_batch(self) -> Optional[Dict[str, Any]]:
+        """Наступна порція поточного проходу; None - прохід вичерпано (наступний виклик почне новий)."""
+        if self._batches is None:
+            self._batches = self._open_batches()
+        batch = next(self._batches, None)
+        if batch is None:
+            self._close_batches()
+        return batch
+
+    def _close_batches(self):
+        if self._batches is not None:
+            self._batches.close()
+            self._batches = None
+
+    async def _prefetch_one(self):
+        loop = asyncio.get_running_loop()
+        try:
+            batch = await loop.run_in_executor(self._db_executor, self._fetch_next_batch)
+        except Exception as e:
+            logging.error(f"Не вдалося підвантажити порцію глав з БД: {e}", exc_info=True)
+            batch = None
+        if batch is None:
+            self._exhausted = True
+        else:
+            self._prefetched.append(batch)
+
+    def _start_prefetch(self) -> asyncio.Task:
+        if self._prefetch is None or self._prefetch.done():
+            self._prefetch = asyncio.create_task(self._prefetch_one())
+        return self._prefetch
+
+    async def _next_batch(self) -> Optional[Dict[str, Any]]:
+        """
+        Наступна порція для запиту нагороди; None - у БД немає необроблених глав.
+        Новий прохід по БД починається, лише коли всі підвантажені порції
+        оброблено, - тож глави, знайдені обходом, не потрапляють у чергу двічі.
+        """
+        restarted = False
+        while not self._prefetched:
+            if self._exhausted:
+                if restarted:
+                    return None
+                self._exhausted = False
+                self._crawled_this_pass = False
+                restarted = True
+            await self._start_prefetch()
+        return self._prefetched.popleft()
+
+    # --- Фонова робота ---
+    def _run_job(self, name: str, func: Callable[[], Any]) -> Any:
+        try:
+            return func()
+        except Exception as e:
+            logging.error(f"Фонова робота '{name}' завершилась помилкою: {e}", exc_info=True)
+            return None
+
+    def _submit_job(self, executor: ThreadPoolExecutor, name: str, func: Callable[[], Any]) -> asyncio.Future:
+        return asyncio.get_running_loop().run_in_executor(executor, self._run_job, name, func)
+
+    def _crawl_catalog(self):
+        self._scrape_new_chapters()
+        self._maintenance_due = True
+
+    def _start_crawl(self) -> asyncio.Future:
+        if self._crawl is None or self._crawl.done():
+            self._crawled_this_pass = True
+            self._crawl = self._submit_job(self._background_executor, "обхід каталогу", self._crawl_catalog)
+        return self._crawl
+
+    def _schedule_idle_work(self, remaining: float):
+        """Запускає фонову роботу, для якої вистачає часу до слота `remaining` (с)."""
+        if remaining <= COLLECTOR_IDLE_GUARD:
+            return
+
+        if not self._exhausted and len(self._prefetched) < COLLECTOR_PREFETCH_BATCHES:
+            self._start_prefetch()
+
+        crawling = self._crawl is not None and not self._crawl.done()
+        if (self._exhausted and not self._crawled_this_pass and not crawling
+                and remaining >= COLLECTOR_IDLE_CRAWL_WINDOW):
+            logging.info(f"У черзі {len(self._prefetched)} порцій з БД - обхід каталогу у фоні.")
+            self._start_crawl()
+            crawling = True
+
+        if ((self._session_refresh is None or self._session_refresh.done())
+                and time.monotonic() - self._last_session_refresh >= SESSION_REFRESH_INTERVAL):
+            self._last_session_refresh = time.monotonic()
+            self._session_refresh = self._submit_job(
+                self._background_executor, "оновлення сесії", partial(renew_session_csrf, self.session)
+            )
+
+        # Обслуговування БД не запускається разом із записами обходу
+        if self._maintenance_due and not crawling and (self._maintenance is None or self._maintenance.done()):
+            self._maintenance_due = False
+            self._maintenance = self._submit_job(
+                self._db_executor, "обслуговування БД", self.db_manager.maybe_run_maintenance
+            )
+
+    def _pending_jobs(self) -> set:
+        jobs = (self._prefetch, self._crawl, self._session_refresh, self._maintenance)
+        return {job for job in jobs if job is not None and not job.done()}
+
+    async def _idle_until_slot(self, url: str, delay: float):
+        """Чекає на слот запиту (без резервування), виконуючи фонову роботу."""
+        remaining = RATE_LIMITER.time_until(url, delay)
+        if remaining > 0:
+            logging.info(f"⏳ До запиту нагороди {remaining:.1f} сек. - фонова робота.")
+        while remaining > 0:
+            self._schedule_idle_work(remaining)
+            timeout = min(remaining, _IDLE_TICK)
+            pending = self._pending_jobs()
+            if pending:
+                # Завершена робота звільняє місце для наступної
+                await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            else:
+                await asyncio.sleep(timeout)
+            remaining = RATE_LIMITER.time_until(url, delay)
+
+    # --- Основний цикл ---
+    def _send_batch(self, batch: Dict[str, Any], delay: float) -> Dict[str, Any]:
+        """Запит нагороди (потік нагород: стан до запиту пишеться тут, а не в зайнятому потоці БД)."""
+        self._start_batch(batch)
+        return process_single_batch(self.session, BASE_URL, batch["items"], delay=delay, ledger=self.ledger)
+
+    async def _collect_async(self):
+        loop = asyncio.get_running_loop()
+        url = f"{BASE_URL}{ADD_HISTORY_PATH}"
+        current_delay = DELAY
+
+        while not self.is_target_reached():
+            batch = await self._next_batch()
+            if batch is None:
+                logging.warning("Всі доступні глави в БД оброблено. Запускаю обхід каталогу.")
+                await self._start_crawl()
+                logging.info("Скрейпінг завершено. Пауза 10 секунд...")
+                await asyncio.sleep(10)
+                continue
+
+            self.cursor = batch.get("last_cursor")
+            batch_payload = batch.get("items", [])
+            if not batch_payload:
+                continue
+
+            await self._idle_until_slot(url, current_delay)
+            # Слот уже настав: `make_request` лише резервує його, без сну
+            raw_result = await loop.run_in_executor(
+                self._reward_executor, self._send_batch, batch, current_delay
+            )
+
+            batch_result = await loop.run_in_executor(
+                self._db_executor, self._finish_batch, batch, raw_result
+            )
+            self._maintenance_due = True
+            current_delay = self._next_delay(current_delay, batch_result)
+
+            logging.info(
+                f"Прогрес: {self.progress_info}. Наступна затримка: {current_delay} с. "
+                f"Підвантажено порцій: {len(self._prefetched)}."
+            )
+
+    def _collect(self):
+        asyncio.run(self._collect_async())
+
+    def _finish(self):
+        if self._crawl is not None and not self._crawl.done():
+            logging.info("Чекаю завершення фонового обходу каталогу...")
+        self._background_executor.shutdown(wait=True, cancel_futures=True)
+        self._reward_executor.shutdown(wait=True, cancel_futures=True)
+        self._db_executor.submit(self._close_batches).result()
+        self._db_executor.shutdown(wait=True)
+        super()._finish()
@@ -0,0 +1,146 @@
+# file: application/backfill.py
+
+"""
+Відновлення даних з архіву сторінок (utils/page_archive.py) без мережевих
+запитів: останні збережені версії сторінок розбираються поточними парсерами,
+а результат записується в БД з оновленням існуючих рядків
+(`upsert_manga_data`). Потрібно після виправлення селекторів чи помилки
+парсингу - замість повторного обходу сайту.
+
+Запуск з кореня репозиторію:
+    python -m application.backfill [--as-of TIMESTAMP] [--dry-run]
+"""
+
+import argparse
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from db.manager import DBManager
+from db.manga_service import upsert_manga_data
+from mangabuff.data_models import MangaData, ChapterData
+from mangabuff.scraper import parse_manga_list, parse_chapters_from_html
+from utils.enums import ArchiveEntry, BackfillReport, PageKind
+from utils.logging import setup_logging
+from utils.page_archive import PAGE_ARCHIVE, PageArchive
+from utils.settings import DB_URL, SQLITE_PRAGMAS, BACKFILL_BATCH
+
+def _write_batch(db: DBManager, batch: Dict[str, MangaData], dry_run: bool) -> Tuple[int, int, int]:
+    """Записує порцію і очищує її; `dry_run` - лише підрахунок розібраного."""
+    if dry_run:
+        result = (len(batch), sum(len(manga.get("chapters", [])) for manga in batch.values()), 0)
+    else:
+        result = upsert_manga_data(db, batch) if batch else (0, 0, 0)
+    batch.clear()
+    return result
+
+def run_backfill(
+    db: DBManager,
+    archive: PageArchive = PAGE_ARCHIVE,
+    as_of: Optional[int] = None,
+    batch_size: int = BACKFILL_BATCH,
+    dry_run: bool = False
+) -> BackfillReport:
+    """
+    Розбирає останні версії сторінок архіву (завантажені не пізніше `as_of`)
+    і записує манги та глави в БД порціями по `batch_size` манг.
+
+    Сегменти читаються послідовно. Глави манги записуються, щойно розібрано
+    всі її сторінки (сторінку манги та /chapters/load), тож у пам'яті лише
+    розібрані дані незавершених манг, а не HTML. `dry_run` - лише парсинг:
+    у звіті тоді кількість розібраних манг і глав, а не записаних.
+    """
+    entries = archive.latest_entries(as_of)
+    if not entries:
+        logging.warning(f"Архів сторінок {archive.directory} порожній.")
+        return BackfillReport(0, 0, 0, 0, 0)
+
+    # Скільки сторінок глав ще чекає кожна манга
+    remaining: Dict[str, int] = defaultdict(int)
+    for entry in entries:
+        if entry.kind != PageKind.LIST.value and entry.manga_id:
+            remaining[entry.manga_id] += 1
+
+    cards: Dict[str, MangaData] = {}
+    # Глави за типом сторінки: сторінка манги йде першою, як при скрейпінгу
+    chapter_parts: Dict[str, Dict[str, List[ChapterData]]] = defaultdict(dict)
+    batch: Dict[str, MangaData] = {}
+    pages_read = pages_failed = mangas_written = chapters_written = chapters_skipped = 0
+
+    def _flush():
+        nonlocal mangas_written, chapters_written, chapters_skipped
+        new_mangas, new_chapters, skipped = _write_batch(db, batch, dry_run)
+        mangas_written += new_mangas
+        chapters_written += new_chapters
+        chapters_skipped += skipped
+
+    # 1. Картки з каталогу: манги без сторінок глав в архіві пишуться одразу, решта - разом з главами
+    list_entries = [entry for entry in entries if entry.kind == PageKind.LIST.value]
+    for entry, html in archive.iter_pages(list_entries):
+        if html is None:
+            pages_failed += 1
+            continue
+        pages_read += 1
+        cards.update(parse_manga_list(html))
+    for manga_id, card in cards.items():
+        if manga_id not in remaining:
+            batch[manga_id] = card
+            if len(batch) >= batch_size:
+                _flush()
+
+    # 2. Глави: манга потрапляє в порцію, коли розібрано всі її сторінки
+    chapter_entries: List[ArchiveEntry] = [
+        entry for entry in entries if entry.kind != PageKind.LIST.value and entry.manga_id
+    ]
+    for entry, html in archive.iter_pages(chapter_entries):
+        manga_id = entry.manga_id
+        if html is None:
+            pages_failed += 1
+            chapters: List[ChapterData] = []
+        else:
+            pages_read += 1
+            chapters = parse_chapters_from_html(html)
+        chapter_parts[manga_id][entry.kind] = chapters
+
+        remaining[manga_id] -= 1
+        if remaining[manga_id] > 0:
+            continue
+        parts = chapter_parts.pop(manga_id)
+        # Та сама глава може бути і на сторінці манги, і в /chapters/load
+        unique: Dict[str, ChapterData] = {}
+        for kind in (PageKind.MANGA.value, PageKind.CHAPTERS.value):
+            for chapter in parts.get(kind, []):
+                unique.setdefault(chapter["data_id"], chapter)
+        manga = cards.get(manga_id) or {"id": manga_id, "chapters": []}
+        batch[manga_id] = {**manga, "chapters": list(unique.values())}
+        if len(batch) >= batch_size:
+            _flush()
+    _flush()
+
+    report = BackfillReport(pages_read, pages_failed, mangas_written, chapters_written, chapters_skipped)
+    logging.info(
+        f"Відновлення з архіву{' (без запису)' if dry_run else ''}: сторінок {pages_read}, "
+        f"пошкоджених {pages_failed}; записано манг {mangas_written}, глав {chapters_written}, "
+        f"пропущено глав {chapters_skipped}."
+    )
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Повторний парсинг архіву сторінок і запис у БД без мережі.")
+    parser.add_argument("--archive", default=None, help="Тека архіву (за замовчуванням PAGE_ARCHIVE_DIR)")
+    parser.add_argument("--as-of", type=int, default=None, help="Брати версії сторінок не пізніше цього часу (unix)")
+    parser.add_argument("--batch", type=int, default=BACKFILL_BATCH, help="Манг на одну транзакцію")
+    parser.add_argument("--dry-run", action="store_true", help="Лише розібрати сторінки, без запису в БД")
+    args = parser.parse_args()
+
+    setup_logging()
+    db_manager = DBManager(DB_URL, sqlite_pragmas=SQLITE_PRAGMAS)
+    try:
+        db_manager.init_models()
+        archive = PageArchive(args.archive) if args.archive else PAGE_ARCHIVE
+        run_backfill(db_manager, archive, args.as_of, args.batch, args.dry_run)
+    finally:
+        db_manager.dispose()
+
+if __name__ == "__main__":
+    main()
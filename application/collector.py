@@ -1,16 +1,28 @@
-import math
 import time
 import logging
-from typing import Optional
+from typing import Any, Dict, Iterator, Optional
 import requests
 
 from db.manager import DBManager
-from db.manga_service import get_last_manga_db_id, yield_chapters_in_batches
+from db.manga_service import (
+    ChapterCursor, yield_chapters_in_batches,
+    get_cursor_from_combined_offset, load_reading_cursor, save_reading_cursor,
+    load_last_request_time, save_last_request_time,
+    mark_chapters_processed, has_processed_chapters, mark_chapters_processed_up_to
+)
+from db.reward_service import RewardLedgerWriter, get_last_event_time
 from mangabuff.reader import process_single_batch 
-from mangabuff.scraper import run_scraper
-from utils.file import save_txt_data, load_txt_data
-from utils.enums import CollectMode, BatchResult
-from utils.settings import BASE_URL, LAST_READED, SCRAPER_MANGA_PER_PAGE, BATCH_SIZE, DELAY
+from mangabuff.scraper import crawl_catalog, refresh_tracked_mangas
+from utils.file import load_txt_data
+from utils.enums import CollectMode, BatchResult, ChapterWalkMode, ChapterOutcome, RewardEndpoint
+from utils.http_cache import HTTP_CACHE
+from utils.page_archive import PAGE_ARCHIVE
+from utils.network_utils import RATE_LIMITER, RETRY_METRICS
+from utils.time import get_current_timestamp
+from utils.settings import (
+    BASE_URL, ADD_HISTORY_PATH, LAST_READED, READING_CURSOR_NAME, CRAWL_PAGES_PER_RUN, BATCH_SIZE, DELAY,
+    LEDGER_FLUSH_SIZE, LEDGER_FLUSH_INTERVAL, LEDGER_FLUSH_ENDPOINTS, TRACKED_REFRESH_INTERVAL, TRACKED_REFRESH_LIMIT
+)
 
 class ResourceCollector:
     """
@@ -20,15 +32,22 @@ class ResourceCollector:
                  session: requests.Session, 
                  db_manager: DBManager, 
                  target_amount: int, 
-                 mode: CollectMode = CollectMode.CANDY):
+                 mode: CollectMode = CollectMode.CANDY,
+                 walk_mode: ChapterWalkMode = ChapterWalkMode.UNREAD):
         
         self.session = session
         self.db_manager = db_manager
         self.target_amount = target_amount
         self.mode = mode
+        self.walk_mode = walk_mode
+        self.ledger = RewardLedgerWriter(
+            db_manager, flush_size=LEDGER_FLUSH_SIZE, flush_interval=LEDGER_FLUSH_INTERVAL,
+            flush_endpoints=[RewardEndpoint(endpoint) for endpoint in LEDGER_FLUSH_ENDPOINTS]
+        )
         
         self.items_collected: int = 0
-        self.last_processed_offset: Optional[str] = None
+        self.cursor: Optional[ChapterCursor] = None
+        self._last_tracked_refresh: Optional[float] = None
 
     @property
     def progress_info(self) -> str:
@@ -37,13 +56,61 @@ class ResourceCollector:
         return f"{self.items_collected}/{self.target_amount} ({item_name})"
 
     def _load_state(self):
-        self.last_processed_offset = load_txt_data(LAST_READED) or None
-        logging.info(f"Стан завантажено. Остання позиція: {self.last_processed_offset or 'немає'}")
+        self.cursor = load_reading_cursor(self.db_manager, READING_CURSOR_NAME)
+
+        if self.cursor is None:
+            # Одноразовий перехід зі старого формату "номер_манги.зміщення_глави"
+            legacy_offset = load_txt_data(LAST_READED).strip()
+            if legacy_offset:
+                self.cursor = get_cursor_from_combined_offset(self.db_manager, legacy_offset)
+                logging.info(f"Стару позицію '{legacy_offset}' перенесено у курсор БД.")
+                self._save_state()
+
+        if self.walk_mode == ChapterWalkMode.UNREAD and self.cursor and not has_processed_chapters(self.db_manager):
+            # Перший запуск зі станами глав: усе до старого курсора вже надсилалось
+            mark_chapters_processed_up_to(self.db_manager, self.cursor)
+
+        # DELAY - інтервал між запитами /addHistory, тож відлічуємо його від
+        # останнього запиту (журнал або час, збережений перед запитом; без історії -
+        # від поточного моменту, як раніше)
+        last_history_at = max(filter(None, (
+            get_last_event_time(self.db_manager, RewardEndpoint.ADD_HISTORY),
+            load_last_request_time(self.db_manager, READING_CURSOR_NAME),
+        )), default=None)
+        seconds_ago = get_current_timestamp() - last_history_at if last_history_at else 0.0
+        RATE_LIMITER.note_request(f"{BASE_URL}{ADD_HISTORY_PATH}", seconds_ago)
+
+        logging.info(f"Стан завантажено. Остання позиція: {self.cursor or 'немає'}")
 
     def _save_state(self):
-        if self.last_processed_offset:
-            save_txt_data(self.last_processed_offset, LAST_READED)
-            logging.info(f"Стан збережено. Остання позиція: {self.last_processed_offset}")
+        if self.cursor:
+            save_reading_cursor(self.db_manager, READING_CURSOR_NAME, self.cursor)
+            logging.info(f"Стан збережено. Остання позиція: {self.cursor}")
+
+    def _wait_for_slot(self, delay: float):
+        """Чекає, доки настане час запиту /addHistory (слот резервує сам запит)."""
+        url = f"{BASE_URL}{ADD_HISTORY_PATH}"
+        wait = RATE_LIMITER.time_until(url, delay)
+        if wait > 0:
+            logging.info(f"⏳ Чекаємо {wait:.1f} сек. перед запитом до {url}")
+            time.sleep(wait)
+
+    def _save_request_time(self):
+        """
+        Зберігає час запиту /addHistory до його відправки: після аварійного
+        завершення DELAY відлічується від нього, а не від останнього запису журналу.
+        """
+        if self.cursor:
+            save_last_request_time(self.db_manager, READING_CURSOR_NAME, get_current_timestamp(), self.cursor)
+
+    def _start_batch(self, batch: Dict[str, Any]):
+        """
+        Записує стан до відправки порції: час запиту та глави як SENT. Якщо
+        процес зупиниться до `_finish_batch`, сервер міг уже врахувати запит,
+        тож після перезапуску ці глави не надсилаються знову.
+        """
+        self._save_request_time()
+        mark_chapters_processed(self.db_manager, batch.get("chapter_db_ids", []), ChapterOutcome.SENT)
 
     def _update_progress(self, result: BatchResult):
         """Оновлює лічильник залежно від обраного режиму."""
@@ -59,49 +126,75 @@ class ResourceCollector:
         self.items_collected += added
         return added
 
-    def _process_chapters_from_db(self) -> bool:
-        chapters_found = False
-        chapter_generator = yield_chapters_in_batches(
+    def _finish_batch(self, batch: Dict[str, Any], raw_result: Dict[str, Any]) -> BatchResult:
+        """
+        Враховує результат порції: прогрес, стани її глав та позицію читання.
+        Глави порції з ERROR повертаються в чергу (див. `mark_chapters_processed`).
+        """
+        batch_result = BatchResult(
+            candies=raw_result.get('candies', 0),
+            cards_found=raw_result.get('cards', 0)
+        )
+
+        self._update_progress(batch_result)
+        mark_chapters_processed(
+            self.db_manager,
+            batch.get("chapter_db_ids", []),
+            raw_result.get('outcome', ChapterOutcome.EMPTY)
+        )
+        self._save_state()
+        return batch_result
+
+    @staticmethod
+    def _next_delay(current_delay: float, batch_result: BatchResult) -> float:
+        """Затримка перед наступним /addHistory."""
+        # Якщо ми чекали більше 1.5 годин (5400 с) І знайшли цукерку/гарбуз
+        if current_delay >= 5400 and batch_result.candies > 0:
+            logging.info("⚡️ Довге очікування принесло цукерку! Наступний запит виконуємо МИТТЄВО.")
+            return 10.0
+        return DELAY
+
+    def _open_batches(self) -> Iterator[Dict[str, Any]]:
+        """Новий прохід по главах з БД від поточної позиції."""
+        return yield_chapters_in_batches(
             db_manager=self.db_manager,
             batch_size=BATCH_SIZE,
-            start_offset=self.last_processed_offset
+            mode=self.walk_mode,
+            # У режимі UNREAD черга визначається станами глав, а не позицією
+            start_cursor=None if self.walk_mode == ChapterWalkMode.UNREAD else self.cursor
         )
 
+    def _process_chapters_from_db(self) -> bool:
+        chapters_found = False
+        chapter_generator = self._open_batches()
+
         # Початкова затримка (можна брати з конфігу або стандартну)
         current_delay = DELAY
 
         for batch in chapter_generator:
             chapters_found = True
             
-            self.last_processed_offset = batch.get("last_processed_offset")
+            self.cursor = batch.get("last_cursor")
             batch_payload = batch.get("items", [])
             
             if not batch_payload:
                 continue
 
+            self._wait_for_slot(current_delay)
+            self._start_batch(batch)
+
             # --- ВИКЛИК З ДИНАМІЧНОЮ ЗАТРИМКОЮ ---
             raw_result = process_single_batch(
                 self.session, 
                 BASE_URL, 
                 batch_payload, 
-                delay=current_delay  # Передаємо поточну затримку
+                delay=current_delay,  # Передаємо поточну затримку
+                ledger=self.ledger
             )
             
-            batch_result = BatchResult(
-                candies=raw_result.get('candies', 0),
-                cards_found=raw_result.get('cards', 0)
-            )
-
-            self._update_progress(batch_result)
-            
-            # --- ЛОГІКА КЕРУВАННЯ НАСТУПНОЮ ЗАТРИМКОЮ ---
-            
-            # Якщо ми чекали більше 1.5 годин (5400 с) І знайшли цукерку/гарбуз
-            if current_delay >= 5400 and batch_result.candies > 0:
-                logging.info("⚡️ Довге очікування принесло цукерку! Наступний запит виконуємо МИТТЄВО.")
-                current_delay = 10.0
-            else:
-                current_delay = DELAY
+            batch_result = self._finish_batch(batch, raw_result)
+            self.db_manager.maybe_run_maintenance()
+            current_delay = self._next_delay(current_delay, batch_result)
 
             logging.info(f"Прогрес: {self.progress_info}. Наступна затримка: {current_delay} с.")
 
@@ -110,12 +203,28 @@ class ResourceCollector:
         
         return chapters_found
 
+    def _scrape_new_chapters(self) -> int:
+        """
+        Обхід каталогу. Якщо він не дав нових глав - пошук нових глав уже
+        відомих манг (`refresh_tracked_mangas`), не частіше TRACKED_REFRESH_INTERVAL.
+        Повертає кількість нових глав.
+        """
+        # Наступні сторінки визначає фронтир обходу, а не оцінка за кількістю манг у БД
+        report = crawl_catalog(self.session, self.db_manager, max_pages=CRAWL_PAGES_PER_RUN)
+        if report.chapters_added:
+            return report.chapters_added
+        if (self._last_tracked_refresh is not None
+                and time.monotonic() - self._last_tracked_refresh < TRACKED_REFRESH_INTERVAL):
+            return 0
+        self._last_tracked_refresh = time.monotonic()
+        logging.info("Обхід каталогу не дав нових глав. Оновлюю глави манг з БД.")
+        _, added_chapters = refresh_tracked_mangas(self.session, self.db_manager, limit=TRACKED_REFRESH_LIMIT)
+        return added_chapters
+
     def _run_scraping_if_needed(self):
-        logging.warning("Всі доступні глави в БД оброблено. Запускаю скрейпер.")
-        last_id = get_last_manga_db_id(self.db_manager) or 0
-        page_to_scrape = math.ceil((last_id + 1) / SCRAPER_MANGA_PER_PAGE)
-        
-        run_scraper(self.session, self.db_manager, page_num=page_to_scrape)
+        logging.warning("Всі доступні глави в БД оброблено. Запускаю обхід каталогу.")
+        self._scrape_new_chapters()
+        self.db_manager.maybe_run_maintenance()
         
         logging.info("Скрейпінг завершено. Пауза 10 секунд...")
         time.sleep(10)
@@ -129,18 +238,31 @@ class ResourceCollector:
                      f"{'цукерок' if self.mode == CollectMode.CANDY else 'карток'} ---")
 
         try:
-            while not self.is_target_reached():
-                logging.info("="*50)
-                logging.info(f"Новий цикл. Прогрес: {self.progress_info}")
-
-                chapters_were_found = self._process_chapters_from_db()
-
-                if self.is_target_reached():
-                    break
-                
-                if not chapters_were_found:
-                    self._run_scraping_if_needed()
+            self._collect()
         finally:
+            self._finish()
+
+    def _collect(self):
+        while not self.is_target_reached():
             logging.info("="*50)
-            logging.info(f"--- Завершення. Всього зібрано: {self.progress_info} ---")
-            self._save_state()
+            logging.info(f"Новий цикл. Прогрес: {self.progress_info}")
+
+            chapters_were_found = self._process_chapters_from_db()
+
+            if self.is_target_reached():
+                break
+            
+            if not chapters_were_found:
+                self._run_scraping_if_needed()
+
+    def _finish(self):
+        logging.info("="*50)
+        logging.info(f"--- Завершення. Всього зібрано: {self.progress_info} ---")
+        self._save_state()
+        self.ledger.close()
+        RATE_LIMITER.log_stats()
+        RETRY_METRICS.log_metrics()
+        HTTP_CACHE.log_stats()
+        PAGE_ARCHIVE.log_stats()
+        if getattr(self.session, "proxy_pool", None):
+            self.session.proxy_pool.log_stats()
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+
+"""
+Бенчмарк шару БД (db.manga_service) на синтетичних SQLite-базах.
+
+Бази будуються через справжні моделі `Manga`/`Chapter` з фіксованим seed,
+тож результати відтворювані між версіями. Для кожної операції звітуються
+перцентилі затримки, кількість SQL-запитів на виклик та пік пам'яті
+(tracemalloc) у форматі JSON.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.db_benchmark --sizes 1k,100k,1M --output bench.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from itertools import batched, islice
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import sqlalchemy
+from sqlalchemy import event, insert
+
+from db.manager import DBManager
+from db.manga_service import (
+    get_cursor_from_combined_offset, get_manga_by_id, get_mangas_stats, get_next_chapter_offset,
+    save_manga_data_incrementally, verify_chapter_stats, yield_chapters_in_batches,
+)
+from db.models import Chapter, Manga
+from utils.enums import ChapterWalkMode
+from utils.settings import SQLITE_PRAGMAS
+
+SIZES = {"1k": 1_000, "100k": 100_000, "1M": 1_000_000}
+CHAPTERS_PER_MANGA = 100
+PAGE_MANGAS = 30 # Як одна сторінка каталогу скрейпера
+INSERT_CHUNK = 5_000
+
+# ==============================================================================
+# 1. СИНТЕТИЧНІ ДАНІ
+# ==============================================================================
+
+def _manga_chapter_rows(rnd: random.Random, manga_id: str, count: int) -> Iterator[Dict[str, Any]]:
+    """Глави однієї манги: томи по 10-30 глав, зрідка без тому/номера (NULL)."""
+    volume, in_volume, per_volume = 1, 0, rnd.randint(10, 30)
+    for num in range(1, count + 1):
+        if in_volume == per_volume:
+            volume, in_volume, per_volume = volume + 1, 0, rnd.randint(10, 30)
+        in_volume += 1
+        chapter_volume = None if rnd.random() < 0.01 else volume
+        chapter_num = None if rnd.random() < 0.005 else num
+        yield {
+            "data_id": f"{manga_id}-{num}",
+            "manga_id": manga_id,
+            "volume": chapter_volume,
+            "chapter_num": chapter_num,
+            "date": "01.01.2024",
+            "url": f"/manga/{manga_id}/{chapter_volume}/{chapter_num}",
+        }
+
+def _chapter_counts(rnd: random.Random, total_chapters: int) -> List[int]:
+    """Розбиває `total_chapters` на манги по 20-180 глав (у середньому CHAPTERS_PER_MANGA)."""
+    counts: List[int] = []
+    left = total_chapters
+    while left > 0:
+        count = min(left, rnd.randint(CHAPTERS_PER_MANGA // 5, CHAPTERS_PER_MANGA * 9 // 5))
+        counts.append(count)
+        left -= count
+    return counts
+
+def build_database(path: str, total_chapters: int, seed: int, use_pragmas: bool) -> DBManager:
+    if os.path.exists(path):
+        os.remove(path)
+    db = DBManager(f"sqlite:///{path}", sqlite_pragmas=SQLITE_PRAGMAS if use_pragmas else None)
+    db.init_models()
+
+    rnd = random.Random(seed)
+    counts = _chapter_counts(rnd, total_chapters)
+
+    def _chapter_rows() -> Iterator[Dict[str, Any]]:
+        for index, count in enumerate(counts):
+            yield from _manga_chapter_rows(rnd, f"m{index}", count)
+
+    with db.session() as session:
+        session.execute(insert(Manga), [
+            {"id": f"m{index}", "url": f"/manga/m{index}", "name": f"Manga {rnd.random():.8f}"}
+            for index in range(len(counts))
+        ])
+        for chunk in batched(_chapter_rows(), INSERT_CHUNK):
+            session.execute(insert(Chapter), list(chunk))
+
+    # Денормалізовану статистику заповнюємо так само, як при старті програми
+    verify_chapter_stats(db)
+    db.run_maintenance()
+    return db
+
+def _page_data(rnd: random.Random, manga_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Сторінка скрейпера у форматі save_manga_data_incrementally (глави - у форматі парсера).
+    ID глав детерміновані, тож для вже відомих манг більшість глав - дублікати.
+    """
+    return {
+        manga_id: {
+            "url": f"/manga/{manga_id}",
+            "name": manga_id,
+            "chapters": [
+                {**row, "chapter": row["chapter_num"]}
+                for row in _manga_chapter_rows(rnd, manga_id, CHAPTERS_PER_MANGA)
+            ],
+        }
+        for manga_id in manga_ids
+    }
+
+# ==============================================================================
+# 2. ВИМІРЮВАННЯ
+# ==============================================================================
+
+class QueryCounter:
+    def __init__(self, db: DBManager) -> None:
+        self.count = 0
+        event.listen(db.engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args: Any) -> None:
+        self.count += 1
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def measure(counter: QueryCounter, samples: int, fn: Callable[[int], Any]) -> Dict[str, Any]:
+    """
+    Виконує `fn(i)` для i у [0, samples) (samples >= 2) і повертає затримки (мс), запити на виклик
+    та пік пам'яті. Перший виклик іде під tracemalloc лише для виміру пам'яті
+    і в затримки не входить (tracemalloc суттєво сповільнює виконання).
+    """
+    tracemalloc.start()
+    try:
+        fn(0)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latencies: List[float] = []
+    queries: List[int] = []
+    for i in range(1, samples):
+        counter.count = 0
+        started = time.perf_counter()
+        fn(i)
+        latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(counter.count)
+
+    latencies.sort()
+    return {
+        "samples": len(latencies),
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 0.50), 3),
+            "p90": round(_percentile(latencies, 0.90), 3),
+            "p99": round(_percentile(latencies, 0.99), 3),
+            "max": round(latencies[-1], 3),
+            "mean": round(statistics.fmean(latencies), 3),
+        },
+        "queries_per_call": round(statistics.fmean(queries), 2),
+        "peak_memory_kib": round(peak / 1024, 1),
+    }
+
+def _walk(db: DBManager, batch_size: int, limit: Optional[int] = None, **kwargs: Any) -> int:
+    batches = yield_chapters_in_batches(db, batch_size, **kwargs)
+    return sum(len(batch["items"]) for batch in islice(batches, limit))
+
+def run_suite(db: DBManager, args: argparse.Namespace, total_chapters: int) -> Dict[str, Any]:
+    rnd = random.Random(args.seed + 1)
+    counter = QueryCounter(db)
+    stats = get_mangas_stats(db)
+    mangas_count = len(stats)
+    manga_ids = [row["id"] for row in stats]
+    results: Dict[str, Any] = {}
+
+    # Повний прохід черги. OFFSET-режим квадратичний за кількістю манг, тому обмежений.
+    for mode in ChapterWalkMode:
+        if mode == ChapterWalkMode.OFFSET and total_chapters > args.offset_walk_limit:
+            continue
+        results[f"walk_full_{mode.value}"] = measure(
+            counter, args.walk_samples, lambda _, m=mode: _walk(db, args.batch_size, mode=m)
+        )
+
+    # Відновлення з глибоких позицій: час до перших `resume_batches` порцій
+    deep_orders = [max(1, int(mangas_count * fraction)) for fraction in (0.5, 0.9, 0.99)]
+    results["walk_resume_offset"] = measure(
+        counter, args.samples,
+        lambda i: _walk(db, args.batch_size, args.resume_batches,
+                        start_offset=f"{deep_orders[i % len(deep_orders)]}.5", mode=ChapterWalkMode.OFFSET),
+    )
+    deep_cursors = [get_cursor_from_combined_offset(db, f"{order}.5") for order in deep_orders]
+    results["walk_resume_keyset"] = measure(
+        counter, args.samples,
+        lambda i: _walk(db, args.batch_size, args.resume_batches,
+                        start_cursor=deep_cursors[i % len(deep_cursors)], mode=ChapterWalkMode.KEYSET),
+    )
+
+    # Зміщення "N.M" всередині та на межі манг
+    offsets = [
+        f"{rnd.randint(1, mangas_count)}.{rnd.choice((0, 10, CHAPTERS_PER_MANGA // 5 - 1))}"
+        for _ in range(args.samples)
+    ]
+    results["get_next_chapter_offset"] = measure(
+        counter, args.samples, lambda i: get_next_chapter_offset(db, offsets[i])
+    )
+
+    lookup_ids = [rnd.choice(manga_ids) for _ in range(args.samples)]
+    results["get_manga_by_id"] = measure(
+        counter, args.samples, lambda i: get_manga_by_id(db, lookup_ids[i])
+    )
+
+    results["get_mangas_stats"] = measure(
+        counter, args.walk_samples, lambda _: get_mangas_stats(db)
+    )
+
+    # Збереження: повністю нова сторінка та сторінка з 1 новою мангою серед відомих
+    new_pages = [
+        _page_data(rnd, [f"new{i}-{j}" for j in range(PAGE_MANGAS)])
+        for i in range(args.save_samples)
+    ]
+    results["save_new_page"] = measure(
+        counter, args.save_samples, lambda i: save_manga_data_incrementally(db, new_pages[i])
+    )
+    duplicate_pages = [
+        _page_data(rnd, rnd.sample(manga_ids, min(PAGE_MANGAS - 1, mangas_count)) + [f"dup{i}"])
+        for i in range(args.save_samples)
+    ]
+    results["save_duplicate_page"] = measure(
+        counter, args.save_samples, lambda i: save_manga_data_incrementally(db, duplicate_pages[i])
+    )
+
+    results["_dataset"] = {"chapters": total_chapters, "mangas": mangas_count}
+    return results
+
+# ==============================================================================
+# 3. ТОЧКА ВХОДУ
+# ==============================================================================
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарк db.manga_service на синтетичних даних.")
+    parser.add_argument("--sizes", default="1k,100k,1M", help=f"Розміри через кому: {', '.join(SIZES)}")
+    parser.add_argument("--workdir", default=None, help="Тека для баз (за замовчуванням - тимчасова)")
+    parser.add_argument("--output", default=None, help="Файл для JSON-звіту (за замовчуванням - stdout)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=2)
+    parser.add_argument("--samples", type=int, default=200, help="Вибірка для точкових запитів")
+    parser.add_argument("--walk-samples", type=int, default=3, help="Повторів повного проходу та статистики")
+    parser.add_argument("--save-samples", type=int, default=10)
+    parser.add_argument("--resume-batches", type=int, default=10)
+    parser.add_argument("--offset-walk-limit", type=int, default=100_000,
+                        help="Максимум глав для повного проходу в режимі offset")
+    parser.add_argument("--no-pragmas", action="store_true", help="Без профілю SQLITE_PRAGMAS")
+    parser.add_argument("--keep", action="store_true", help="Не видаляти згенеровані бази")
+    args = parser.parse_args(argv)
+    # Перший виклик кожної операції йде лише на вимір пам'яті - потрібно хоча б 2
+    args.samples, args.walk_samples, args.save_samples = (
+        max(2, n) for n in (args.samples, args.walk_samples, args.save_samples)
+    )
+    return args
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    # Без WARNING: verify_chapter_stats попереджає про "розбіжності" щойно заповненої бази
+    logging.basicConfig(level=logging.ERROR)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="db_benchmark_")
+    os.makedirs(workdir, exist_ok=True)
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "created_at": int(time.time()),
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "sqlite": sqlite3.sqlite_version,
+            "pragmas": not args.no_pragmas,
+            "seed": args.seed,
+            "batch_size": args.batch_size,
+        },
+        "results": {},
+    }
+
+    for size_name in args.sizes.split(","):
+        total_chapters = SIZES[size_name.strip()]
+        path = os.path.join(workdir, f"bench_{size_name.strip()}.db")
+
+        started = time.perf_counter()
+        db = build_database(path, total_chapters, args.seed, not args.no_pragmas)
+        build_seconds = time.perf_counter() - started
+        print(f"[{size_name}] база побудована за {build_seconds:.1f} с", file=sys.stderr)
+
+        try:
+            results = run_suite(db, args, total_chapters)
+            results["_dataset"]["build_seconds"] = round(build_seconds, 2)
+            report["results"][size_name] = results
+        finally:
+            db.dispose()
+            if not args.keep:
+                for suffix in ("", "-wal", "-shm"):
+                    if os.path.exists(path + suffix):
+                        os.remove(path + suffix)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
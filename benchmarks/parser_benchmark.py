@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+
+"""
+Бенчмарк бекендів HTML-парсингу (mangabuff.parsers) з перевіркою відповідності.
+
+Кожен документ корпусу розбирається всіма бекендами: спершу перевіряється,
+що `parse_manga_list` та `parse_chapters` дають однакові MangaData/ChapterData
+(розбіжності - у звіті, код виходу 1), потім міряється час. Звіт - JSON з
+часом по типах сторінок та прискоренням відносно bs4.
+
+Варіант "<бекенд>+stream" - потоковий режим (HTML_PARSE_STREAMING); для
+нього додатково міряється пік пам'яті Python (tracemalloc) на найбільшому
+документі. Пам'ять libxml2 tracemalloc не бачить, тож для lxml пік
+показує лише об'єкти Python.
+
+З --processes N додатково міряється пропускна здатність ParsePool
+(mangabuff/parse_pool.py) з 1..N процесами на всьому корпусі - для вибору
+PARSE_PROCESSES; старт процесів у замір не входить.
+
+Корпус - тека з *.html (сторінки каталогу визначаються за a.cards__item).
+Без --corpus генерується синтетичний корпус у розмітці сайту з фіксованим
+seed; --write-corpus зберігає його для повторних запусків.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.parser_benchmark --list-pages 50 --chapter-pages 1000 --output parsers.json
+"""
+
+import argparse
+import html
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional, Tuple
+
+from mangabuff.parse_pool import ParsePool
+from mangabuff.parsers import PARSER_BACKENDS, get_parser_backend, lxml
+
+KIND_LIST = "list"
+KIND_CHAPTERS = "chapters"
+STREAM_SUFFIX = "+stream"
+
+def get_variant(spec: str):
+    """Бекенд за назвою варіанта: "lxml", "bs4+stream" тощо."""
+    return get_parser_backend(spec.removesuffix(STREAM_SUFFIX), streaming=spec.endswith(STREAM_SUFFIX))
+
+# ==============================================================================
+# 1. СИНТЕТИЧНИЙ КОРПУС
+# ==============================================================================
+
+_NAMES = ["Повернення мисливця", "Sword & Magic", "Тінь <монарха>", "Dungeon's 100th floor", "Academy\n  Genius"]
+
+def _page_shell(rnd: random.Random, body: str) -> str:
+    """Обгортка сторінки: head зі стилями/скриптами, меню, футер - як на сайті."""
+    scripts = "".join(
+        f'<script>window.__data{i} = {json.dumps({"k": "v" * rnd.randint(50, 400)})};</script>' for i in range(6)
+    )
+    styles = "<style>" + ".c{color:red}" * rnd.randint(200, 800) + "</style>"
+    menu = '<div class="menu"><div class="menu__name"> Reader </div>' + '<a href="/x">пункт</a>' * 40 + "</div>"
+    footer = "<footer>" + "<p>Текст футера &copy; 2024</p>" * 30 + "</footer>"
+    return (
+        '<!DOCTYPE html><html lang="ru"><head><meta charset="utf-8">'
+        f'<meta name="csrf-token" content="tok{rnd.randint(0, 10**9)}">{styles}{scripts}</head>'
+        f"<body>{menu}<main>{body}</main>{footer}</body></html>"
+    )
+
+def _card(rnd: random.Random, index: int) -> str:
+    data_id = rnd.randint(1, 10**6)
+    name = html.escape(rnd.choice(_NAMES))
+    parts = [
+        f'<a class="cards__item card" href="/manga/m{data_id}" data-id="{data_id}">',
+        f'<div class="cards__img" style="background-image: url(\'/img/{data_id}.jpg\')"></div>'
+        if rnd.random() > 0.05 else "",
+        f'<div class="cards__name">\n  {name} </div>',
+        f'<div class="cards__rating"><span>{rnd.uniform(5, 10):.1f}</span></div>',
+        "" if index % 17 == 16 else f'<div class="cards__info">Манхва, {rnd.randint(2010, 2024)}</div>',
+        "</a>",
+    ]
+    if index % 23 == 22:
+        parts[0] = '<a class="cards__item" href="/manga/no-id">' # Без data-id - пропускається
+    return "".join(parts)
+
+def make_list_page(rnd: random.Random, cards: int = 30) -> str:
+    body = '<div class="cards">' + "".join(_card(rnd, i) for i in range(cards)) + "</div>"
+    return _page_shell(rnd, body)
+
+def _chapter(rnd: random.Random, manga: int, volume: int, number: int) -> str:
+    href = f"/manga/m{manga}/{volume}/{number}" if rnd.random() > 0.02 else f"/manga/m{manga}/extra"
+    date_attr = f' data-chapter-date="{rnd.randint(1, 28):02d}.0{rnd.randint(1, 9)}.2024"' if rnd.random() > 0.3 else ""
+    button = (
+        f'<button class="favourite-send-btn chapters__like" data-id="{manga}-{volume}-{number}"></button>'
+        if rnd.random() > 0.02 else '<button class="favourite-send-btn"></button>'
+    )
+    return (
+        f'<a class="chapters__item" href="{href}"{date_attr}>'
+        f'<div class="chapters__volume">Том {volume}</div><div class="chapters__value">Глава {number}</div>'
+        f'<div class="chapters__add-date"> <span>{rnd.randint(1, 28)}</span>.05.2024 </div>{button}</a>'
+    )
+
+def make_chapter_pages(rnd: random.Random, chapters: int) -> Tuple[str, str]:
+    """Сторінка манги з першими главами та фрагмент відповіді /chapters/load з рештою."""
+    manga = rnd.randint(1, 10**6)
+    items = [_chapter(rnd, manga, 1 + number // 20, number) for number in range(chapters, 0, -1)]
+    description = "<div class='manga__description'>" + "<p>Опис манги. </p>" * rnd.randint(20, 80) + "</div>"
+    comments = "".join(
+        f'<div class="comment"><div class="comment__text">Коментар {i} &amp; ще</div></div>' for i in range(rnd.randint(10, 60))
+    )
+    page = _page_shell(rnd, description + '<div class="chapters">' + "".join(items[:20]) + "</div>" + comments)
+    return page, "".join(items[20:])
+
+def build_corpus(seed: int, list_pages: int, chapter_pages: int) -> List[Tuple[str, str, str]]:
+    """Синтетичний корпус: (назва, тип, HTML)."""
+    rnd = random.Random(seed)
+    corpus = [(f"list_{i:04d}.html", KIND_LIST, make_list_page(rnd)) for i in range(list_pages)]
+    for i in range(chapter_pages):
+        page, load_more = make_chapter_pages(rnd, rnd.choice((10, 40, 120, 400, 1500)))
+        corpus.append((f"manga_{i:04d}.html", KIND_CHAPTERS, page))
+        if load_more:
+            corpus.append((f"manga_{i:04d}_load.html", KIND_CHAPTERS, load_more))
+    return corpus
+
+def load_corpus(directory: str) -> List[Tuple[str, str, str]]:
+    corpus = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".html"):
+            with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                text = f.read()
+            corpus.append((name, KIND_LIST if "cards__item" in text else KIND_CHAPTERS, text))
+    return corpus
+
+def write_corpus(directory: str, corpus: List[Tuple[str, str, str]]) -> None:
+    os.makedirs(directory, exist_ok=True)
+    for name, _, text in corpus:
+        with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+# ==============================================================================
+# 2. ВІДПОВІДНІСТЬ ТА ЗАМІРИ
+# ==============================================================================
+
+def check_conformance(corpus: List[Tuple[str, str, str]], backends: List[str]) -> Dict[str, Any]:
+    """Порівнює результати всіх бекендів з першим (еталонним) на кожному документі."""
+    reference = get_variant(backends[0])
+    mismatches: List[Dict[str, Any]] = []
+    items = 0
+    for name, _, text in corpus:
+        expected = (reference.parse_manga_list(text), reference.parse_chapters(text))
+        items += len(expected[0]) + len(expected[1])
+        for backend_name in backends[1:]:
+            backend = get_variant(backend_name)
+            actual = (backend.parse_manga_list(text), backend.parse_chapters(text))
+            for label, want, got in zip(("mangas", "chapters"), expected, actual):
+                if want != got:
+                    mismatches.append({"document": name, "backend": backend_name, "field": label})
+    return {
+        "documents": len(corpus),
+        "items_compared": items,
+        "identical": not mismatches,
+        "mismatches": mismatches[:20],
+    }
+
+def measure(corpus: List[Tuple[str, str, str]], backend_name: str, repeat: int) -> Dict[str, Any]:
+    backend = get_variant(backend_name)
+    parse = {KIND_LIST: backend.parse_manga_list, KIND_CHAPTERS: backend.parse_chapters}
+    report: Dict[str, Any] = {}
+    for kind in (KIND_LIST, KIND_CHAPTERS):
+        documents = [text for _, doc_kind, text in corpus if doc_kind == kind]
+        if not documents:
+            continue
+        per_document: List[float] = []
+        totals: List[float] = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for text in documents:
+                doc_started = time.perf_counter()
+                parse[kind](text)
+                per_document.append(time.perf_counter() - doc_started)
+            totals.append(time.perf_counter() - started)
+        per_document.sort()
+        report[kind] = {
+            "documents": len(documents),
+            "mb": round(sum(len(text.encode("utf-8")) for text in documents) / 1024 / 1024, 2),
+            "total_s": round(min(totals), 4),
+            "p50_ms": round(per_document[len(per_document) // 2] * 1000, 3),
+            "p95_ms": round(per_document[int(len(per_document) * 0.95)] * 1000, 3),
+            "mean_ms": round(statistics.fmean(per_document) * 1000, 3),
+            "largest_doc_py_peak_kb": _peak_memory_kb(parse[kind], max(documents, key=len)),
+        }
+    return report
+
+def _peak_memory_kb(parse, text: str) -> int:
+    """Пік пам'яті Python під час розбору одного документа."""
+    tracemalloc.start()
+    try:
+        parse(text)
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+def measure_pool(corpus: List[Tuple[str, str, str]], backend_name: str, processes: int) -> Dict[str, Any]:
+    """Час розбору всього корпусу через ParsePool (усі документи відправляються одразу)."""
+    pool = ParsePool(
+        processes, backend_name.removesuffix(STREAM_SUFFIX), streaming=backend_name.endswith(STREAM_SUFFIX)
+    )
+    try:
+        # Прогрів: запуск процесів та імпорт парсерів
+        for future in [pool.submit_chapters("<a></a>") for _ in range(processes)]:
+            future.result()
+        started = time.perf_counter()
+        futures = [
+            pool.submit_manga_list(text) if kind == KIND_LIST else pool.submit_chapters(text)
+            for _, kind, text in corpus
+        ]
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - started
+    finally:
+        pool.close()
+    return {"total_s": round(elapsed, 4), "docs_per_s": round(len(corpus) / elapsed, 1)}
+
+# ==============================================================================
+# 3. ЗАПУСК
+# ==============================================================================
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Відповідність та швидкість бекендів mangabuff.parsers.")
+    parser.add_argument("--corpus", default=None, help="Тека зі збереженими *.html (інакше - синтетичний корпус)")
+    parser.add_argument("--write-corpus", default=None, help="Зберегти синтетичний корпус у теку")
+    parser.add_argument("--list-pages", type=int, default=50)
+    parser.add_argument("--chapter-pages", type=int, default=1000)
+    parser.add_argument(
+        "--backends",
+        default=",".join([*PARSER_BACKENDS, *(name + STREAM_SUFFIX for name in PARSER_BACKENDS)]),
+        help="Через кому, перший - еталон; суфікс +stream - потоковий режим",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Повторів заміру (береться найкращий)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--processes", type=int, default=0, help="Заміряти ParsePool з 1..N процесами")
+    parser.add_argument("--output", default=None, help="Файл для JSON-звіту (за замовчуванням - stdout)")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    # Попередження про пошкоджені картки очікувані (їх містить корпус) - не засмічуємо вивід
+    logging.basicConfig(level=logging.ERROR)
+
+    backends = [name.strip() for name in args.backends.split(",") if name.strip()]
+    if lxml is None and any(name.startswith("lxml") for name in backends):
+        print("lxml не встановлено (pip install .[fast]) - бекенд пропущено.", file=sys.stderr)
+        backends = [name for name in backends if not name.startswith("lxml")]
+
+    if args.corpus:
+        corpus = load_corpus(args.corpus)
+    else:
+        corpus = build_corpus(args.seed, args.list_pages, args.chapter_pages)
+        if args.write_corpus:
+            write_corpus(args.write_corpus, corpus)
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "python": platform.python_version(),
+            "lxml": ".".join(map(str, lxml.etree.LXML_VERSION)) if lxml is not None else None,
+            "corpus": args.corpus or f"synthetic(seed={args.seed})",
+            "repeat": args.repeat,
+        },
+        "conformance": check_conformance(corpus, backends),
+        "backends": {name: measure(corpus, name, args.repeat) for name in backends},
+    }
+
+    baseline = report["backends"].get("bs4", {})
+    report["speedup_vs_bs4"] = {
+        name: {
+            kind: round(baseline[kind]["total_s"] / stats["total_s"], 2)
+            for kind, stats in results.items() if kind in baseline and stats["total_s"]
+        }
+        for name, results in report["backends"].items() if name != "bs4"
+    }
+
+    if args.processes > 0:
+        # Пул - для бекенду, що використовувався б за замовчуванням (останній у списку з lxml, якщо є)
+        pool_backend = backends[-1]
+        report["parse_pool"] = {
+            "backend": pool_backend,
+            "processes": {
+                str(processes): measure_pool(corpus, pool_backend, processes)
+                for processes in range(1, args.processes + 1)
+            },
+        }
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+    if not report["conformance"]["identical"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import logging
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+from sqlalchemy import Row, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from utils.enums import CrawlStatus
+from utils.time import get_current_timestamp
+from .models import CrawlPage
+from .manager import DBManager
+
+def get_filter_hash(params: Mapping[str, Any]) -> str:
+    """Стабільний хеш параметрів фільтра каталогу (не залежить від порядку ключів)."""
+    canonical = json.dumps(params, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+def load_crawl_frontier(db_manager: DBManager, filter_hash: str) -> Dict[int, Row[Any]]:
+    """
+    Стан усіх сторінок фільтра.
+
+    Returns:
+        Словник page_num -> рядок (page_num, status, content_hash, updated_at).
+    """
+    try:
+        def _load(session: Session) -> Dict[int, Row[Any]]:
+            rows = session.execute(
+                select(CrawlPage.page_num, CrawlPage.status, CrawlPage.content_hash, CrawlPage.updated_at)
+                .where(CrawlPage.filter_hash == filter_hash)
+                .order_by(CrawlPage.page_num)
+            )
+            return {row.page_num: row for row in rows}
+        return db_manager.run_readonly(_load)
+    except Exception as e:
+        logging.error(f"Помилка читання фронтиру обходу: {e}")
+        return {}
+
+def save_crawl_page(
+    db_manager: DBManager,
+    filter_hash: str,
+    page_num: int,
+    status: CrawlStatus,
+    *,
+    item_ids: Optional[Iterable[str]] = None,
+    content_hash: Optional[str] = None,
+    error: Optional[str] = None,
+) -> bool:
+    """
+    Записує стан сторінки (INSERT ... ON CONFLICT DO UPDATE).
+    Кожен перехід у IN_PROGRESS збільшує лічильник спроб; item_ids та
+    content_hash оновлюються лише якщо передані.
+    """
+    try:
+        def _save(session: Session) -> bool:
+            values: Dict[str, Any] = {
+                "filter_hash": filter_hash,
+                "page_num": page_num,
+                "status": status.value,
+                "error": error,
+                "updated_at": get_current_timestamp(),
+                "attempts": 1 if status == CrawlStatus.IN_PROGRESS else 0,
+            }
+            if item_ids is not None:
+                values["item_ids"] = ",".join(item_ids)
+            if content_hash is not None:
+                values["content_hash"] = content_hash
+
+            stmt = sqlite_insert(CrawlPage.__table__).values(**values)
+            updates = {key: stmt.excluded[key] for key in values if key not in ("filter_hash", "page_num", "attempts")}
+            updates["attempts"] = CrawlPage.__table__.c.attempts + stmt.excluded.attempts
+            session.execute(stmt.on_conflict_do_update(
+                index_elements=[CrawlPage.filter_hash, CrawlPage.page_num],
+                set_=updates,
+            ))
+            return True
+        return db_manager.run_in_tx(_save)
+    except Exception as e:
+        logging.error(f"Помилка запису стану сторінки {page_num} у фронтир: {e}")
+        return False
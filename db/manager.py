@@ -1,12 +1,15 @@
 # database/manager.py
 from __future__ import annotations
 
+import logging
+import time
 from contextlib import contextmanager
 from typing import (
-    Iterator, Callable, TypeVar
+    Any, Iterator, Callable, Mapping, Optional, TypeVar
 )
 
-from sqlalchemy import create_engine
+from sqlalchemy import MetaData, create_engine, event, inspect, text
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.orm import sessionmaker, Session
 
 T = TypeVar("T")
@@ -19,12 +22,26 @@ class DBManager:
         echo: bool = False,
         pool_pre_ping: bool = True,
         expire_on_commit: bool = False,
+        sqlite_pragmas: Optional[Mapping[str, Any]] = None,
+        maintenance_interval: Optional[float] = None,
+        incremental_vacuum_pages: int = 0,
     ) -> None:
         self.engine = create_engine(
             url,
             echo=echo,
             pool_pre_ping=pool_pre_ping,
         )
+        self.is_sqlite = self.engine.dialect.name == "sqlite"
+
+        # Профіль продуктивності SQLite: PRAGMA виконуються для кожного нового з'єднання
+        self.sqlite_pragmas = dict(sqlite_pragmas or {})
+        if self.is_sqlite and self.sqlite_pragmas:
+            event.listen(self.engine, "connect", self._apply_sqlite_pragmas)
+
+        self.maintenance_interval = maintenance_interval
+        self.incremental_vacuum_pages = incremental_vacuum_pages
+        self._last_maintenance = time.monotonic()
+
         self.SessionLocal: sessionmaker[Session] = sessionmaker(
             bind=self.engine,
             autoflush=False,
@@ -35,10 +52,80 @@ class DBManager:
     def init_models(self) -> None:
         from . import models
         models.Base.metadata.create_all(self.engine)
+        self._ensure_columns(models.Base.metadata)
+        self._ensure_indexes(models.Base.metadata)
+
+    def _ensure_columns(self, metadata: MetaData) -> None:
+        # create_all не змінює вже існуючі таблиці, тому нові колонки додаємо через ALTER TABLE.
+        # Колонка має бути nullable або мати server_default, інакше SQLite її не додасть.
+        inspector = inspect(self.engine)
+        with self.engine.begin() as conn:
+            for table in metadata.sorted_tables:
+                if not inspector.has_table(table.name):
+                    continue
+                existing = {column["name"] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existing:
+                        continue
+                    column_ddl = CreateColumn(column).compile(dialect=self.engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+
+    def _ensure_indexes(self, metadata: MetaData) -> None:
+        # create_all пропускає вже існуючі таблиці разом з їхніми індексами,
+        # тому нові індекси для старих БД створюємо окремо.
+        for table in metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(self.engine, checkfirst=True)
 
     def dispose(self) -> None:
+        if self.is_sqlite:
+            # Рекомендовано документацією SQLite перед закриттям з'єднань
+            self._execute_pragmas("PRAGMA optimize")
         self.engine.dispose()
 
+    # --- SQLite: PRAGMA та обслуговування ---
+    def _apply_sqlite_pragmas(self, dbapi_connection: Any, connection_record: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in self.sqlite_pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    def _execute_pragmas(self, *statements: str) -> None:
+        try:
+            with self.engine.connect() as conn:
+                for statement in statements:
+                    conn.exec_driver_sql(statement)
+                conn.commit()
+        except Exception as e:
+            logging.error(f"Помилка обслуговування БД ({statements}): {e}")
+
+    def run_maintenance(self) -> None:
+        """
+        Обслуговування SQLite: оновлення статистики планувальника
+        (ANALYZE з обмеженням analysis_limit + PRAGMA optimize) та повернення
+        вільних сторінок (incremental_vacuum, діє лише з auto_vacuum=INCREMENTAL).
+        """
+        if not self.is_sqlite:
+            return
+        started = time.monotonic()
+        statements = ["PRAGMA analysis_limit=1000", "ANALYZE", "PRAGMA optimize"]
+        if self.incremental_vacuum_pages > 0:
+            statements.append(f"PRAGMA incremental_vacuum({self.incremental_vacuum_pages})")
+        self._execute_pragmas(*statements)
+        self._last_maintenance = time.monotonic()
+        logging.info(f"Обслуговування БД завершено за {self._last_maintenance - started:.2f} с.")
+
+    def maybe_run_maintenance(self) -> bool:
+        """Запускає `run_maintenance`, якщо з попереднього запуску минуло `maintenance_interval` секунд."""
+        if self.maintenance_interval is None:
+            return False
+        if time.monotonic() - self._last_maintenance < self.maintenance_interval:
+            return False
+        self.run_maintenance()
+        return True
+
     # --- Сесії ---
     @contextmanager
     def session(self) -> Iterator[Session]:
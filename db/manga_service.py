@@ -1,38 +1,118 @@
 # pyright: ignore[reportUnknownArgumentType]
 # pyright: ignore[reportUnknownMemberType]
 import logging
-from typing import Any, Dict, Generator, List, Optional, Type, Union
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import batched, chain
+from typing import Any, Dict, Generator, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Type, Union
 
-from sqlalchemy import func
-from sqlalchemy.orm import Session, joinedload
-from .models import Manga, Chapter
+from sqlalchemy import ColumnElement, Row, Select, and_, bindparam, event, func, literal, or_, select, union_all
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from utils.enums import ChapterOutcome, ChapterWalkMode
+from utils.time import get_current_timestamp
+from .models import Manga, Chapter, ReadingCursor
 from .manager import DBManager
 
+class ChapterCursor(NamedTuple):
+    """
+    Позиція в черзі глав за реальними ключами: манга (db_id), том, номер глави
+    та db_id глави. Вказує на останню оброблену главу.
+    """
+    manga_db_id: int
+    volume: Optional[int]
+    chapter_num: Optional[int]
+    chapter_db_id: int
+
+    @classmethod
+    def before_manga(cls, manga_db_id: int) -> "ChapterCursor":
+        """Курсор, що стоїть перед першою главою манги `manga_db_id`."""
+        return cls(manga_db_id, None, None, 0)
+
+# Порядок читання глав у межах манги: том, номер (NULL-и першими), db_id.
+# Повністю покривається індексом ix_chapters_manga_volume_chapter.
+CHAPTER_READING_ORDER = (
+    Chapter.volume.asc().nullsfirst(),
+    Chapter.chapter_num.asc().nullsfirst(),
+    Chapter.db_id.asc(),
+)
+
+# Зворотний порядок читання: першим іде остання глава манги.
+CHAPTER_LATEST_ORDER = (
+    Chapter.volume.desc().nullslast(),
+    Chapter.chapter_num.desc().nullslast(),
+    Chapter.db_id.desc(),
+)
+
+def _chapter_stats_values() -> Dict[str, Any]:
+    """
+    Статистика глав манги як корельовані підзапити по `Manga.id`:
+    кожен - короткий прохід по ix_chapters_manga_volume_chapter.
+    """
+    def _latest(column: Any) -> Any:
+        return (
+            select(column)
+            .where(Chapter.manga_id == Manga.id)
+            .order_by(*CHAPTER_LATEST_ORDER)
+            .limit(1)
+            .scalar_subquery()
+        )
+    return {
+        "chapters_count": (
+            select(func.count(Chapter.db_id))
+            .where(Chapter.manga_id == Manga.id)
+            .scalar_subquery()
+        ),
+        "latest_chapter_db_id": _latest(Chapter.db_id),
+        "latest_volume": _latest(Chapter.volume),
+        "latest_chapter_num": _latest(Chapter.chapter_num),
+    }
+
+@lru_cache(maxsize=None)
+def _refresh_chapter_stats_statement() -> Any:
+    mangas = Manga.__table__
+    return (
+        mangas.update()
+        .where(mangas.c.id == bindparam("b_manga_id"))
+        .values(**_chapter_stats_values())
+    )
+
+def _refresh_chapter_stats(session: Session, manga_ids: Iterable[str]) -> int:
+    """
+    Перераховує статистику глав лише для вказаних манг (одним executemany).
+    Повертає кількість манг, для яких виконано перерахунок.
+    """
+    params = [{"b_manga_id": manga_id} for manga_id in set(manga_ids)]
+    if params:
+        session.execute(_refresh_chapter_stats_statement(), params)
+    return len(params)
+
 def get_mangas_stats(db_manager: DBManager) -> List[Dict[str, Any]]:
     """
     Отримує статистику по всіх манхвах.
     
-    Оскільки поле `is_read` відсутнє, статистика включає загальну 
-    кількість глав для кожної манхви.
+    Кількість глав та остання глава зберігаються в самій таблиці манг,
+    тож це простий прохід по індексу назви - без JOIN та GROUP BY по главах.
     
     Returns:
         Список словників, де кожен словник містить:
         - 'id': зовнішній ID манхви
         - 'name': назва манхви
         - 'total_chapters': загальна кількість глав
+        - 'latest_volume', 'latest_chapter': том і номер останньої глави (або None)
     """
     try:
         def _get_stats(session: Session) -> List[Dict[str, Any]]:
-            stats_query = (
-                session.query(
+            stats_query = session.execute(
+                select(
                     Manga.id,
                     Manga.name,
-                    func.count(Chapter.db_id).label("total_chapters"),
+                    Manga.chapters_count,
+                    Manga.latest_volume,
+                    Manga.latest_chapter_num,
                 )
-                .outerjoin(Chapter, Manga.id == Chapter.manga_id) # outerjoin, щоб включити манхви з 0 глав
-                .group_by(Manga.id, Manga.name) # Групуємо, щоб count працював для кожної манхви
-                .order_by(Manga.name) # Сортуємо для зручності
-                .all()
+                .order_by(Manga.name) # Сортуємо для зручності (ix_mangas_name)
             )
             
             # Конвертуємо результат (список Row-об'єктів) у список словників
@@ -40,7 +120,9 @@ def get_mangas_stats(db_manager: DBManager) -> List[Dict[str, Any]]:
                 {
                     "id": row.id,
                     "name": row.name,
-                    "total_chapters": row.total_chapters,
+                    "total_chapters": row.chapters_count,
+                    "latest_volume": row.latest_volume,
+                    "latest_chapter": row.latest_chapter_num,
                 }
                 for row in stats_query
             ]
@@ -55,40 +137,29 @@ def get_mangas_stats(db_manager: DBManager) -> List[Dict[str, Any]]:
 def get_manga_by_id(db_manager: DBManager, manga_external_id: str) -> Optional[Dict[str, Any]]:
     try:
         def _get_by_id(session: Session) -> Optional[Dict[str, Any]]:
-            # Завантажуємо манхву разом з главами
-            manga = session.query(Manga).filter_by(id=manga_external_id).options(joinedload(Manga.chapters)).first()
+            manga = session.execute(
+                select(
+                    Manga.db_id, Manga.id, Manga.url, Manga.name,
+                    Manga.rating, Manga.info, Manga.image,
+                ).where(Manga.id == manga_external_id)
+            ).first()
             
             if not manga:
                 return None
             
-            # --- ВИПРАВЛЕННЯ: Явне сортування глав ---
-            # Сортуємо спочатку за Томом (volume), потім за Номером глави (chapter_num).
-            # Використовуємо (x.volume or 0), щоб None (відсутність тому) не викликало помилку.
-            sorted_chapters = sorted(
-                manga.chapters, 
-                key=lambda x: (x.volume if x.volume is not None else -1, x.chapter_num if x.chapter_num is not None else -1.0)
+            # Глави одразу у порядку читання (том, номер глави) - сортує SQLite по індексу
+            chapters = session.execute(
+                select(
+                    Chapter.db_id, Chapter.data_id, Chapter.volume,
+                    Chapter.chapter_num, Chapter.date, Chapter.url,
+                )
+                .where(Chapter.manga_id == manga_external_id)
+                .order_by(*CHAPTER_READING_ORDER)
             )
             
-            chapters_list: list[dict[str, Any]] = []
-            for chapter in sorted_chapters:
-                chapters_list.append({
-                    "db_id": chapter.db_id,
-                    "data_id": chapter.data_id,
-                    "volume": chapter.volume,
-                    "chapter_num": chapter.chapter_num,
-                    "date": chapter.date,
-                    "url": chapter.url,
-                })
-            
             return {
-                "db_id": manga.db_id,
-                "id": manga.id,
-                "url": manga.url,
-                "name": manga.name,
-                "rating": manga.rating,
-                "info": manga.info,
-                "image": manga.image,
-                "chapters": chapters_list
+                **manga._asdict(),
+                "chapters": [chapter._asdict() for chapter in chapters]
             }
 
         return db_manager.run_readonly(_get_by_id)
@@ -137,6 +208,7 @@ def update_manga(
                 logging.warning("Не передано жодного поля для оновлення")
                 return False
             
+            _invalidate_manga_order_cache_on_commit(session)
             logging.info(f"Манхву {manga_external_id} успішно оновлено")
             return True
         
@@ -179,6 +251,8 @@ def add_chapter(
                 url=url,
             )
             session.add(new_chapter)
+            session.flush()
+            _refresh_chapter_stats(session, [manga_external_id])
             logging.info(f"Главу {chapter_external_id} для манхви {manga_external_id} успішно додано")
             return True
         
@@ -191,6 +265,7 @@ def add_chapter(
 def delete_manga(db_manager: DBManager, manga_external_id: str) -> bool:
     """
     Видаляє манхву та всі її глави з БД за її зовнішнім ID, використовуючи DBManager.
+    Статистика глав зберігається в рядку манги, тож видаляється разом з ним.
     """
     try:
         def _delete(session: Session) -> bool:
@@ -200,6 +275,7 @@ def delete_manga(db_manager: DBManager, manga_external_id: str) -> bool:
                 return False
             
             session.delete(manga)
+            _invalidate_manga_order_cache_on_commit(session)
             logging.info(f"Манхву {manga_external_id} успішно видалено (включаючи глави).")
             return True
         
@@ -220,7 +296,10 @@ def delete_chapter(db_manager: DBManager, chapter_external_id: str) -> bool:
                 logging.warning(f"Главу з ID {chapter_external_id} не знайдено")
                 return False
             
+            manga_external_id = chapter.manga_id
             session.delete(chapter)
+            session.flush()
+            _refresh_chapter_stats(session, [manga_external_id])
             logging.info(f"Главу {chapter_external_id} успішно видалено.")
             return True
         
@@ -230,6 +309,49 @@ def delete_chapter(db_manager: DBManager, chapter_external_id: str) -> bool:
         logging.error(f"Помилка видалення глави: {e}")
         return False
 
+def verify_chapter_stats(db_manager: DBManager, repair: bool = True) -> Dict[str, int]:
+    """
+    Перераховує статистику глав усіх манг з нуля і звіряє зі збереженою.
+
+    Args:
+        db_manager: Екземпляр DBManager.
+        repair: Якщо True, розбіжності одразу виправляються.
+
+    Returns:
+        Словник: 'checked' (перевірено манг), 'drifted' (з розбіжностями),
+        'repaired' (виправлено).
+    """
+    stats_columns = ("chapters_count", "latest_chapter_db_id", "latest_volume", "latest_chapter_num")
+    try:
+        def _verify(session: Session) -> Dict[str, int]:
+            expected = _chapter_stats_values()
+            rows = session.execute(
+                select(
+                    Manga.id,
+                    *(getattr(Manga, name) for name in stats_columns),
+                    *(expected[name].label(f"expected_{name}") for name in stats_columns),
+                )
+            ).all()
+
+            drifted = [
+                row.id for row in rows
+                if any(getattr(row, name) != getattr(row, f"expected_{name}") for name in stats_columns)
+            ]
+            if drifted:
+                logging.warning(
+                    f"Статистика глав розійшлася для {len(drifted)} манг "
+                    f"(наприклад: {', '.join(drifted[:5])})."
+                )
+            repaired = _refresh_chapter_stats(session, drifted) if repair else 0
+            return {"checked": len(rows), "drifted": len(drifted), "repaired": repaired}
+
+        if repair:
+            return db_manager.run_in_tx(_verify)
+        return db_manager.run_readonly(_verify)
+    except Exception as e:
+        logging.error(f"Помилка перевірки статистики глав: {e}", exc_info=True)
+        return {"checked": 0, "drifted": 0, "repaired": 0}
+
 def get_last_db_id(
     db_manager: DBManager,
     model_class: Type[Union[Manga, Chapter]]
@@ -284,49 +406,218 @@ def get_total_mangas_count(db_manager: DBManager) -> int:
         logging.error(f"Помилка підрахунку манг: {e}")
         return 0
 
-def get_manga_by_order_number(db_manager: DBManager, order_num: int) -> Optional[Manga]:
+@lru_cache(maxsize=None)
+def _latest_chapter_ids_statement() -> Select[Any]:
+    return (
+        select(Chapter.data_id)
+        .where(Chapter.manga_id == bindparam("b_manga_id"))
+        .order_by(*CHAPTER_LATEST_ORDER)
+        .limit(bindparam("b_limit"))
+    )
+
+def get_latest_chapter_ids(
+    db_manager: DBManager,
+    manga_external_ids: Iterable[str],
+    per_manga: int = 3
+) -> Dict[str, List[str]]:
+    """
+    data_id до `per_manga` найновіших збережених глав кожної манги зі списку
+    (від найновішої). Манги без глав у результат не потрапляють.
+    Кожна манга - короткий прохід по ix_chapters_manga_volume_chapter.
+    """
+    try:
+        def _load(session: Session) -> Dict[str, List[str]]:
+            statement = _latest_chapter_ids_statement()
+            latest: Dict[str, List[str]] = {}
+            for manga_id in manga_external_ids:
+                data_ids = list(session.scalars(statement, {"b_manga_id": manga_id, "b_limit": per_manga}))
+                if data_ids:
+                    latest[manga_id] = data_ids
+            return latest
+        return db_manager.run_readonly(_load)
+    except Exception as e:
+        logging.error(f"Помилка отримання останніх глав манг: {e}")
+        return {}
+
+def get_tracked_mangas(db_manager: DBManager, limit: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Манги з БД у форматі скрейпера (id -> {id, url, name, rating, info, image,
+    chapters: []}) у порядку db_id - для оновлення їхніх глав.
+    """
+    try:
+        def _load(session: Session) -> Dict[str, Dict[str, Any]]:
+            rows = session.execute(
+                select(Manga.id, Manga.url, Manga.name, Manga.rating, Manga.info, Manga.image)
+                .order_by(Manga.db_id)
+                .limit(limit)
+            )
+            return {row.id: {**row._asdict(), "chapters": []} for row in rows}
+        return db_manager.run_readonly(_load)
+    except Exception as e:
+        logging.error(f"Помилка отримання манг для оновлення: {e}")
+        return {}
+
+class _MangaOrderCache:
+    """
+    LRU-кеш "порядковий номер манги (за db_id) -> (db_id, id, name, url)".
+
+    Ключ містить engine, тож кілька DBManager в одному процесі не змішуються.
+    Порядкові номери зсуваються при додаванні/видаленні манг, тому кеш
+    повністю скидається через `invalidate_manga_order_cache`. Лічильник
+    поколінь не дає записати в кеш результат запиту, що почався до скидання.
+    """
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self._data: OrderedDict[Tuple[Any, int], Optional[Row[Any]]] = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, session: Session, order_num: int) -> Optional[Row[Any]]:
+        if order_num < 1:
+            return None
+        engine = session.get_bind()
+        with self._lock:
+            key = (engine, order_num)
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key]
+            generation = self._generation
+
+        # Промах: беремо одразу і наступну мангу - її майже завжди запитують слідом
+        rows = session.execute(
+            select(Manga.db_id, Manga.id, Manga.name, Manga.url)
+            .order_by(Manga.db_id)
+            .offset(order_num - 1)
+            .limit(2)
+        ).all()
+
+        with self._lock:
+            if generation == self._generation:
+                for i in range(2):
+                    self._data[(engine, order_num + i)] = rows[i] if i < len(rows) else None
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+        return rows[0] if rows else None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._generation += 1
+
+_MANGA_ORDER_CACHE = _MangaOrderCache()
+
+def invalidate_manga_order_cache() -> None:
+    """Скидає кеш порядкових номерів манг (після додавання/видалення/оновлення манг)."""
+    _MANGA_ORDER_CACHE.invalidate()
+
+def _invalidate_manga_order_cache_on_commit(session: Session) -> None:
+    """
+    Скидає кеш порядкових номерів, щойно транзакція `session` закомічена.
+    До коміту інші потоки ще читають старі рядки і записали б їх у кеш
+    уже нового покоління; після відкату скидати нічого.
+    """
+    event.listen(session, "after_commit", lambda _: invalidate_manga_order_cache(), once=True)
+
+def get_manga_by_order_number(db_manager: DBManager, order_num: int) -> Optional[Row[Any]]:
     """
     Повертає манхву за її порядковим номером (db_id).
     Сортування повернуто до оригінального (за ID в базі).
+    Результат - рядок з полями db_id, id, name, url.
     """
     try:
-        def _get_manga(session: Session) -> Optional[Manga]:
-            return (
-                session.query(Manga)
-                .order_by(Manga.db_id)  # <-- ПОВЕРНУВ ЯК БУЛО (порядок додавання)
-                .offset(order_num - 1)
-                .limit(1)
-                .first()
-            )
+        def _get_manga(session: Session) -> Optional[Row[Any]]:
+            return _MANGA_ORDER_CACHE.get(session, order_num)
         return db_manager.run_readonly(_get_manga)
     except Exception as e:
         logging.error(f"Помилка отримання манхви №{order_num}: {e}")
         return None
 
+_OFFSET_CHAPTER_COLUMNS = (
+    Chapter.db_id, Chapter.data_id, Chapter.chapter_num,
+    Chapter.volume, Chapter.date, Chapter.url,
+)
+
+@lru_cache(maxsize=None)
+def _offset_resolution_statement() -> Select[Any]:
+    """
+    Один запит на позицію "N.M": до двох глав манги N, починаючи зі зміщення M
+    (сама глава та ознака наявності наступної), плюс перша глава манги N+1.
+    Останній стовпець `part` розрізняє частини (0 - манга N, 1 - манга N+1),
+    тож позиційні поля рядка збігаються з колонками глави.
+    """
+    def _part(part: int, manga_id: Any, offset: Any, limit: int) -> Select[Any]:
+        chapters = (
+            select(*_OFFSET_CHAPTER_COLUMNS)
+            .where(Chapter.manga_id == manga_id)
+            .order_by(*CHAPTER_READING_ORDER)
+            .offset(offset)
+            .limit(limit)
+            .subquery()
+        )
+        return select(*chapters.c, literal(part).label("part"))
+
+    resolution = union_all(
+        _part(0, bindparam("manga_id"), bindparam("chapter_offset"), 2),
+        _part(1, bindparam("next_manga_id"), 0, 1),
+    ).subquery()
+    return select(resolution).order_by(
+        resolution.c.part,
+        resolution.c.volume.asc().nullsfirst(),
+        resolution.c.chapter_num.asc().nullsfirst(),
+        resolution.c.db_id,
+    )
+
+def _resolve_offset(
+    session: Session,
+    manga_order_num: int,
+    chapter_offset: int
+) -> Tuple[Optional[Row[Any]], Optional[Row[Any]], Optional[str]]:
+    """
+    Розв'язує позицію "N.M" в межах однієї сесії одним запитом до глав
+    (номери манг беруться з LRU-кешу).
+
+    Returns:
+        Кортеж (манга N, глава на позиції M, наступна позиція або None).
+    """
+    manga = _MANGA_ORDER_CACHE.get(session, manga_order_num)
+    if not manga:
+        return None, None, None
+    next_manga = _MANGA_ORDER_CACHE.get(session, manga_order_num + 1)
+
+    rows = session.execute(
+        _offset_resolution_statement(),
+        {
+            "manga_id": manga.id,
+            "chapter_offset": chapter_offset,
+            "next_manga_id": next_manga.id if next_manga else None,
+        },
+    ).all()
+    current_part = [row for row in rows if row.part == 0]
+    next_part = [row for row in rows if row.part == 1]
+
+    chapter = current_part[0] if current_part else None
+    if len(current_part) > 1:
+        next_offset = f"{manga_order_num}.{chapter_offset + 1}"
+    elif next_part:
+        next_offset = f"{manga_order_num + 1}.0"
+    else:
+        next_offset = None
+    return manga, chapter, next_offset
+
+def _parse_combined_offset(combined_offset: str) -> Tuple[int, int]:
+    parts = combined_offset.split('.')
+    if len(parts) != 2:
+        raise ValueError("Неправильний формат зміщення. Очікується 'номер_манги.номер_глави'.")
+    return int(parts[0]), int(parts[1])
+
 def get_chapter_by_manga_and_offset(
     db_manager: DBManager, 
     manga_order_num: int, 
     chapter_offset: int
-) -> Optional[Chapter]:
+) -> Optional[Row[Any]]:
     try:
-        def _get_chapter(session: Session) -> Optional[Chapter]:
-            # Використовує get_manga_by_order_number (сортування за db_id)
-            manga = get_manga_by_order_number(db_manager, manga_order_num)
-            if not manga:
-                return None
-            
-            # Глави від 1 до N
-            chapter = (
-                session.query(Chapter)
-                .filter_by(manga_id=manga.id)
-                .order_by(
-                    Chapter.volume.asc().nullsfirst(), 
-                    Chapter.chapter_num.asc()
-                )
-                .offset(chapter_offset) # offset 0 = перша глава
-                .limit(1)
-                .first()
-            )
+        def _get_chapter(session: Session) -> Optional[Row[Any]]:
+            _, chapter, _ = _resolve_offset(session, manga_order_num, chapter_offset)
             return chapter
         return db_manager.run_readonly(_get_chapter)
     except Exception as e:
@@ -342,39 +633,23 @@ def get_chapter_by_combined_offset(
     Повертає словник з деталями глави та манхви.
     """
     try:
-        parts = combined_offset.split('.')
-        if len(parts) != 2:
-            raise ValueError("Неправильний формат зміщення. Очікується 'номер_манги.номер_глави'.")
-        
-        manga_order_num = int(parts[0])
-        chapter_offset = int(parts[1])
+        manga_order_num, chapter_offset = _parse_combined_offset(combined_offset)
 
         def _get_chapter_details(session: Session) -> Optional[Dict[str, Any]]:
-            manga_obj = get_manga_by_order_number(db_manager, manga_order_num) # Отримуємо об'єкт Manga
+            manga_obj, chapter_obj, _ = _resolve_offset(session, manga_order_num, chapter_offset)
             if not manga_obj:
                 logging.warning(f"Манхву за порядковим номером {manga_order_num} не знайдено.")
                 return None
             
-            chapter_obj = get_chapter_by_manga_and_offset(db_manager, manga_order_num, chapter_offset)
             if not chapter_obj:
                 logging.warning(f"Главу за зміщенням {chapter_offset} для манхви {manga_order_num} не знайдено.")
                 return None
 
+            chapter_details = chapter_obj._asdict()
+            chapter_details.pop("part")
             return {
-                "manga": {
-                    "db_id": manga_obj.db_id,
-                    "id": manga_obj.id,
-                    "name": manga_obj.name,
-                    "url": manga_obj.url,
-                },
-                "chapter": {
-                    "db_id": chapter_obj.db_id,
-                    "data_id": chapter_obj.data_id,
-                    "chapter_num": chapter_obj.chapter_num,
-                    "volume": chapter_obj.volume,
-                    "date": chapter_obj.date,
-                    "url": chapter_obj.url,
-                }
+                "manga": manga_obj._asdict(),
+                "chapter": chapter_details,
             }
         
         return db_manager.run_readonly(_get_chapter_details)
@@ -389,51 +664,277 @@ def get_chapter_by_combined_offset(
 
 def get_next_chapter_offset(db_manager: DBManager, current_offset: str) -> Optional[str]:
     try:
-        parts = current_offset.split('.')
-        curr_manga_order = int(parts[0])
-        curr_chap_offset = int(parts[1])
+        curr_manga_order, curr_chap_offset = _parse_combined_offset(current_offset)
 
         def _get_next(session: Session) -> Optional[str]:
-            manga = get_manga_by_order_number(db_manager, curr_manga_order)
-            if not manga: return None
-            
-            # Наступна глава в цій манзі (порядок asc)
-            next_chap_exists = (
-                session.query(Chapter.db_id)
-                .filter_by(manga_id=manga.id)
-                .order_by(Chapter.volume.asc().nullsfirst(), Chapter.chapter_num.asc())
-                .offset(curr_chap_offset + 1)
-                .limit(1)
-                .first()
-            )
-
-            if next_chap_exists:
-                return f"{curr_manga_order}.{curr_chap_offset + 1}"
-            
-            # Наступна манга (за db_id)
-            next_manga_order = curr_manga_order + 1
-            next_manga = get_manga_by_order_number(db_manager, next_manga_order)
-            
-            if next_manga:
-                # Перша глава наступної манги
-                has_chap = session.query(Chapter).filter_by(manga_id=next_manga.id).first()
-                if has_chap:
-                    return f"{next_manga_order}.0"
-            
-            return None
+            _, _, next_offset = _resolve_offset(session, curr_manga_order, curr_chap_offset)
+            return next_offset
 
         return db_manager.run_readonly(_get_next)
     except Exception:
         return None
 
 
+def get_cursor_from_combined_offset(db_manager: DBManager, combined_offset: str) -> Optional[ChapterCursor]:
+    """
+    Перетворює старий рядок "номер_манги.зміщення_глави" (наступна глава до
+    обробки) на ChapterCursor (остання оброблена глава). Потрібно лише один раз
+    для переходу зі стану у файлі LAST_READED.
+    """
+    try:
+        parts = combined_offset.split('.')
+        manga_order_num = int(parts[0])
+        chapter_offset = int(parts[1]) if len(parts) >= 2 else 0
+
+        def _convert(session: Session) -> ChapterCursor:
+            manga = _MANGA_ORDER_CACHE.get(session, max(manga_order_num, 1))
+            if not manga:
+                # Позиція за межами черги: усі наявні манги вже оброблено
+                last_id = session.query(func.max(Manga.db_id)).scalar() or 0
+                return ChapterCursor.before_manga(last_id + 1)
+
+            if chapter_offset > 0:
+                chapter = (
+                    session.query(Chapter.db_id, Chapter.volume, Chapter.chapter_num)
+                    .filter_by(manga_id=manga.id)
+                    .order_by(*CHAPTER_READING_ORDER)
+                    .offset(chapter_offset - 1)
+                    .limit(1)
+                    .first()
+                )
+                if chapter:
+                    return ChapterCursor(manga.db_id, chapter.volume, chapter.chapter_num, chapter.db_id)
+
+            return ChapterCursor.before_manga(manga.db_id)
+
+        return db_manager.run_readonly(_convert)
+
+    except (ValueError, IndexError) as ve:
+        logging.error(f"Помилка парсингу зміщення '{combined_offset}': {ve}")
+        return None
+    except Exception as e:
+        logging.error(f"Помилка перетворення зміщення '{combined_offset}' на курсор: {e}")
+        return None
+
+def load_reading_cursor(db_manager: DBManager, name: str) -> Optional[ChapterCursor]:
+    """
+    Повертає збережений курсор читання або None, якщо його ще немає.
+    """
+    try:
+        def _load(session: Session) -> Optional[ChapterCursor]:
+            row = session.get(ReadingCursor, name)
+            if not row:
+                return None
+            return ChapterCursor(row.manga_db_id, row.volume, row.chapter_num, row.chapter_db_id)
+        return db_manager.run_readonly(_load)
+    except Exception as e:
+        logging.error(f"Помилка завантаження курсора '{name}': {e}")
+        return None
+
+def save_reading_cursor(db_manager: DBManager, name: str, cursor: ChapterCursor) -> bool:
+    """
+    Зберігає (або перезаписує) курсор читання.
+    """
+    try:
+        def _save(session: Session) -> bool:
+            session.merge(ReadingCursor(
+                name=name,
+                manga_db_id=cursor.manga_db_id,
+                volume=cursor.volume,
+                chapter_num=cursor.chapter_num,
+                chapter_db_id=cursor.chapter_db_id,
+                updated_at=get_current_timestamp(),
+            ))
+            return True
+        return db_manager.run_in_tx(_save)
+    except Exception as e:
+        logging.error(f"Помилка збереження курсора '{name}': {e}")
+        return False
+
+def save_last_request_time(db_manager: DBManager, name: str, timestamp: int, cursor: ChapterCursor) -> bool:
+    """
+    Записує час останнього запиту черги `name`. Позиція курсора не змінюється;
+    `cursor` потрібен лише для першого запису, коли курсора ще немає.
+    """
+    try:
+        def _save(session: Session) -> bool:
+            row = session.get(ReadingCursor, name)
+            if row is None:
+                row = ReadingCursor(
+                    name=name,
+                    manga_db_id=cursor.manga_db_id,
+                    volume=cursor.volume,
+                    chapter_num=cursor.chapter_num,
+                    chapter_db_id=cursor.chapter_db_id,
+                    updated_at=timestamp,
+                )
+                session.add(row)
+            row.last_request_at = timestamp
+            return True
+        return db_manager.run_in_tx(_save)
+    except Exception as e:
+        logging.error(f"Помилка збереження часу запиту курсора '{name}': {e}")
+        return False
+
+def load_last_request_time(db_manager: DBManager, name: str) -> Optional[int]:
+    """Час (unix) останнього запиту черги `name` або None."""
+    try:
+        def _load(session: Session) -> Optional[int]:
+            row = session.get(ReadingCursor, name)
+            return row.last_request_at if row else None
+        return db_manager.run_readonly(_load)
+    except Exception as e:
+        logging.error(f"Помилка завантаження часу запиту курсора '{name}': {e}")
+        return None
+
+
+def mark_chapters_processed(
+    db_manager: DBManager,
+    chapter_db_ids: List[int],
+    outcome: ChapterOutcome
+) -> int:
+    """
+    Позначає глави як надіслані в /addHistory з вказаним результатом.
+    ERROR лишає глави необробленими (processed_at = NULL): у режимі UNREAD
+    вони знову потрапляють у чергу. Повертає кількість оновлених рядків.
+    """
+    if not chapter_db_ids:
+        return 0
+    processed_at = None if outcome == ChapterOutcome.ERROR else get_current_timestamp()
+    try:
+        def _mark(session: Session) -> int:
+            return (
+                session.query(Chapter)
+                .filter(Chapter.db_id.in_(chapter_db_ids))
+                .update(
+                    {Chapter.processed_at: processed_at, Chapter.outcome: outcome.value},
+                    synchronize_session=False,
+                )
+            )
+        return db_manager.run_in_tx(_mark)
+    except Exception as e:
+        logging.error(f"Помилка позначення глав {chapter_db_ids} як оброблених: {e}")
+        return 0
+
+def has_processed_chapters(db_manager: DBManager) -> bool:
+    """
+    Перевіряє, чи є в БД хоч одна глава з записаним станом обробки.
+    """
+    try:
+        def _exists(session: Session) -> bool:
+            return session.query(
+                session.query(Chapter.db_id).filter(Chapter.processed_at.is_not(None)).exists()
+            ).scalar()
+        return db_manager.run_readonly(_exists)
+    except Exception as e:
+        logging.error(f"Помилка перевірки стану обробки глав: {e}")
+        return False
+
+def mark_chapters_processed_up_to(
+    db_manager: DBManager,
+    cursor: ChapterCursor,
+    outcome: ChapterOutcome = ChapterOutcome.LEGACY
+) -> int:
+    """
+    Позначає як оброблені всі ще не позначені глави до курсора включно.
+    Використовується для переходу зі старого курсора на стани глав.
+    """
+    try:
+        def _mark(session: Session) -> int:
+            earlier_mangas = session.query(Manga.id).filter(Manga.db_id < cursor.manga_db_id)
+            cursor_manga = session.query(Manga.id).filter(Manga.db_id == cursor.manga_db_id)
+            # Глави манги курсора, що стоять після нього (їх не чіпаємо)
+            chapters_after = session.query(Chapter.db_id).filter(
+                Chapter.manga_id.in_(cursor_manga),
+                _after_cursor_condition(cursor),
+            )
+            return (
+                session.query(Chapter)
+                .filter(
+                    Chapter.processed_at.is_(None),
+                    or_(
+                        Chapter.manga_id.in_(earlier_mangas),
+                        and_(Chapter.manga_id.in_(cursor_manga), Chapter.db_id.not_in(chapters_after)),
+                    ),
+                )
+                .update(
+                    {Chapter.processed_at: get_current_timestamp(), Chapter.outcome: outcome.value},
+                    synchronize_session=False,
+                )
+            )
+        marked = db_manager.run_in_tx(_mark)
+        logging.info(f"Позначено як оброблені {marked} глав до курсора {cursor}.")
+        return marked
+    except Exception as e:
+        logging.error(f"Помилка позначення глав до курсора {cursor}: {e}")
+        return 0
+
+
+# Ліміт змінних у одному SQL-запиті для старих збірок SQLite (SQLITE_MAX_VARIABLE_NUMBER)
+SQLITE_MAX_VARIABLES = 999
+
+def _iter_manga_rows(mangas_data: Dict[str, Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    for manga_external_id, manga_data in mangas_data.items():
+        yield {
+            "id": manga_external_id,
+            "url": manga_data.get("url", ""),
+            "name": manga_data.get("name", ""),
+            "rating": manga_data.get("rating", ""),
+            "info": manga_data.get("info", ""),
+            "image": manga_data.get("image", "")
+        }
+
+def _iter_chapter_rows(mangas_data: Dict[str, Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    for manga_external_id, manga_data in mangas_data.items():
+        for chapter_data in manga_data.get("chapters", []):
+            if chapter_data.get("data_id"):
+                yield {
+                    "data_id": chapter_data["data_id"],
+                    "manga_id": manga_external_id,
+                    "volume": chapter_data.get("volume"),
+                    "chapter_num": chapter_data.get("chapter"), # chapter_num - назва поля в моделі
+                    "date": chapter_data.get("date"),
+                    "url": chapter_data.get("url", "")
+                }
+
+def _insert_ignoring_existing(
+    session: Session,
+    model: Type[Union[Manga, Chapter]],
+    conflict_column: Any,
+    rows: Iterator[Dict[str, Any]],
+    returning_column: Any,
+) -> List[Any]:
+    """
+    Вставляє рядки порціями через `INSERT ... ON CONFLICT DO NOTHING RETURNING`.
+    Розмір порції обмежений лімітом змінних SQLite, тож пам'ять і кількість
+    параметрів на запит не залежать від загальної кількості рядків.
+    Повертає значення `returning_column` лише для реально вставлених рядків.
+    """
+    first_row = next(rows, None)
+    if first_row is None:
+        return []
+    chunk_size = max(1, SQLITE_MAX_VARIABLES // len(first_row))
+
+    # Вставка через таблицю (Core), а не ORM-модель: ORM-шлях групує рядки
+    # за набором не-NULL значень і розбиває порцію на багато дрібних INSERT.
+    stmt = (
+        sqlite_insert(model.__table__)
+        .on_conflict_do_nothing(index_elements=[conflict_column])
+        .returning(returning_column)
+    )
+    inserted: List[Any] = []
+    for chunk in batched(chain((first_row,), rows), chunk_size):
+        inserted.extend(session.execute(stmt, list(chunk)).scalars())
+    return inserted
+
 def save_manga_data_incrementally(
     db_manager: DBManager, 
     mangas_data: Dict[str, Dict[str, Any]]
 ) -> tuple[int, int]:
     """
-    ОПТИМІЗОВАНА версія для інкрементного збереження даних, що використовує
-    масові (bulk) операції для максимальної продуктивності.
+    Інкрементне збереження даних через `INSERT ... ON CONFLICT DO NOTHING`
+    порціями обмеженого розміру: без попередньої перевірки існуючих ID
+    і без гігантських `IN (...)`.
     
     Правила роботи:
     1. Нові манхви додаються разом з усіма їхніми главами.
@@ -441,84 +942,29 @@ def save_manga_data_incrementally(
     3. Для існуючих манг додаються тільки нові глави.
     
     Returns:
-        Кортеж (new_mangas_added, new_chapters_added).
+        Кортеж (new_mangas_added, new_chapters_added) - точна кількість
+        вставлених рядків (за RETURNING).
     """
     try:
         def _save_bulk_incremental(session: Session) -> tuple[int, int]:
             if not mangas_data:
                 return 0, 0
 
-            # --- Етап 1: Отримуємо всі існуючі ID одним запитом (без змін, це ефективно) ---
-            
-            incoming_manga_ids = list(mangas_data.keys())
-            existing_mangas_q = session.query(Manga.id).filter(Manga.id.in_(incoming_manga_ids)).all()
-            existing_manga_ids = {row.id for row in existing_mangas_q}
-
-            all_incoming_chapter_ids = [
-                chap.get('data_id') for data in mangas_data.values() for chap in data.get('chapters', [])
-            ]
-            # Фільтруємо None, якщо 'data_id' може бути відсутнім
-            all_incoming_chapter_ids = [cid for cid in all_incoming_chapter_ids if cid]
-            
-            existing_chapters_q = session.query(Chapter.data_id).filter(Chapter.data_id.in_(all_incoming_chapter_ids)).all()
-            existing_chapter_ids = {row.data_id for row in existing_chapters_q}
+            # Манги вставляємо першими: глави посилаються на них зовнішнім ключем
+            inserted_mangas = _insert_ignoring_existing(
+                session, Manga, Manga.id, _iter_manga_rows(mangas_data), Manga.id
+            )
+            inserted_chapters = _insert_ignoring_existing(
+                session, Chapter, Chapter.data_id, _iter_chapter_rows(mangas_data), Chapter.manga_id
+            )
 
-            # --- Етап 2: Готуємо списки словників для масової вставки ---
-            
-            new_mangas_mappings = []
-            new_chapters_mappings = []
-            
-            for manga_external_id, manga_data in mangas_data.items():
-                
-                # --- Сценарій 1: Нова манхва ---
-                if manga_external_id not in existing_manga_ids:
-                    # Готуємо словник для нової манхви
-                    new_mangas_mappings.append({
-                        "id": manga_external_id,
-                        "url": manga_data.get("url", ""),
-                        "name": manga_data.get("name", ""),
-                        "rating": manga_data.get("rating", ""),
-                        "info": manga_data.get("info", ""),
-                        "image": manga_data.get("image", "")
-                    })
-                    
-                    # Готуємо словники для ВСІХ її глав
-                    for chapter_data in manga_data.get("chapters", []):
-                        if chapter_data.get("data_id"):
-                            new_chapters_mappings.append({
-                                "data_id": chapter_data["data_id"],
-                                "manga_id": manga_external_id,
-                                "volume": chapter_data.get("volume"),
-                                "chapter_num": chapter_data.get("chapter"), # chapter_num - назва поля в моделі
-                                "date": chapter_data.get("date"),
-                                "url": chapter_data.get("url", "")
-                            })
-                
-                # --- Сценарій 2: Існуюча манхва ---
-                else:
-                    # Готуємо словники тільки для НОВИХ глав
-                    for chapter_data in manga_data.get("chapters", []):
-                        chapter_external_id = chapter_data.get("data_id")
-                        if chapter_external_id and chapter_external_id not in existing_chapter_ids:
-                            new_chapters_mappings.append({
-                                "data_id": chapter_external_id,
-                                "manga_id": manga_external_id,
-                                "volume": chapter_data.get("volume"),
-                                "chapter_num": chapter_data.get("chapter"),
-                                "date": chapter_data.get("date"),
-                                "url": chapter_data.get("url", "")
-                            })
-
-            # --- Етап 3: Виконуємо масові вставки (якщо є що вставляти) ---
-            
-            if new_mangas_mappings:
-                session.bulk_insert_mappings(Manga, new_mangas_mappings)
-            
-            if new_chapters_mappings:
-                session.bulk_insert_mappings(Chapter, new_chapters_mappings)
+            # Статистику перераховуємо лише для манг, що отримали нові глави
+            _refresh_chapter_stats(session, inserted_chapters)
 
-            new_mangas_added = len(new_mangas_mappings)
-            new_chapters_added = len(new_chapters_mappings)
+            new_mangas_added = len(inserted_mangas)
+            new_chapters_added = len(inserted_chapters)
+            if new_mangas_added:
+                _invalidate_manga_order_cache_on_commit(session)
 
             logging.info(f"Оптимізоване збереження завершено. Додано нових манг: {new_mangas_added}, нових глав: {new_chapters_added}.")
             return new_mangas_added, new_chapters_added
@@ -530,75 +976,334 @@ def save_manga_data_incrementally(
         return 0, 0
 
 
-def yield_chapters_in_batches(
-    db_manager: DBManager, 
+def _upsert_changed(
+    session: Session,
+    model: Type[Union[Manga, Chapter]],
+    conflict_column: Any,
+    rows: Iterator[Dict[str, Any]],
+    returning_column: Any,
+) -> List[Any]:
+    """
+    `INSERT ... ON CONFLICT DO UPDATE ... WHERE <змінилось> RETURNING` порціями,
+    як `_insert_ignoring_existing`. Оновлюються всі передані колонки, але лише
+    у рядках, де значення відрізняються. Повертає `returning_column` вставлених
+    та оновлених рядків.
+    """
+    first_row = next(rows, None)
+    if first_row is None:
+        return []
+    chunk_size = max(1, SQLITE_MAX_VARIABLES // len(first_row))
+
+    table = model.__table__
+    stmt = sqlite_insert(table)
+    columns = [name for name in first_row if name != conflict_column.key]
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[conflict_column],
+        set_={name: stmt.excluded[name] for name in columns},
+        where=or_(*(table.c[name].is_distinct_from(stmt.excluded[name]) for name in columns)),
+    ).returning(returning_column)
+    written: List[Any] = []
+    for chunk in batched(chain((first_row,), rows), chunk_size):
+        written.extend(session.execute(stmt, list(chunk)).scalars())
+    return written
+
+def _existing_manga_ids(session: Session, manga_ids: Iterable[str]) -> set[str]:
+    existing: set[str] = set()
+    for chunk in batched(manga_ids, SQLITE_MAX_VARIABLES):
+        existing.update(session.execute(select(Manga.id).where(Manga.id.in_(chunk))).scalars())
+    return existing
+
+def upsert_manga_data(
+    db_manager: DBManager,
+    mangas_data: Dict[str, Dict[str, Any]]
+) -> Tuple[int, int, int]:
+    """
+    Запис результатів повторного парсингу (див. application/backfill.py):
+    на відміну від `save_manga_data_incrementally`, існуючі манги та глави
+    оновлюються, якщо розібрані значення відрізняються від збережених.
+
+    - Манга без картки (немає "name" - відомі лише глави) не записується.
+    - Глави манг, яких немає в БД, пропускаються.
+    - db_id та стан обробки глав (processed_at, outcome) не змінюються.
+
+    Returns:
+        Кортеж (манг записано, глав записано, глав пропущено).
+    """
+    try:
+        def _upsert(session: Session) -> Tuple[int, int, int]:
+            cards = {manga_id: data for manga_id, data in mangas_data.items() if data.get("name")}
+            written_mangas = _upsert_changed(session, Manga, Manga.id, _iter_manga_rows(cards), Manga.id)
+
+            known = _existing_manga_ids(session, (manga_id for manga_id in mangas_data if manga_id not in cards))
+            known.update(cards)
+            with_manga = {manga_id: data for manga_id, data in mangas_data.items() if manga_id in known}
+            skipped = sum(
+                len(data.get("chapters", [])) for manga_id, data in mangas_data.items() if manga_id not in known
+            )
+            written_chapters = _upsert_changed(
+                session, Chapter, Chapter.data_id, _iter_chapter_rows(with_manga), Chapter.manga_id
+            )
+
+            # Том/номер глави могли змінитись - перераховуємо статистику цих манг
+            _refresh_chapter_stats(session, written_chapters)
+            if written_mangas:
+                _invalidate_manga_order_cache_on_commit(session)
+            return len(written_mangas), len(written_chapters), skipped
+
+        return db_manager.run_in_tx(_upsert)
+
+    except Exception as e:
+        logging.error(f"Помилка запису даних повторного парсингу в БД: {e}", exc_info=True)
+        return 0, 0, 0
+
+
+def _after_position_condition(
+    volume: Any,
+    chapter_num: Any,
+    chapter_db_id: Any,
+    volume_is_null: bool,
+    chapter_num_is_null: bool,
+) -> ColumnElement[bool]:
+    """
+    Умова "глава стоїть після позиції (том, глава, db_id)" в межах однієї манги.
+
+    Порядок: том ASC NULLS FIRST, глава ASC NULLS FIRST, db_id ASC. Кортежне
+    порівняння SQL не підходить через NULL, тому умова розписана вручну, а
+    надлишковий діапазон `volume >= v` дає SQLite змогу почати пошук по індексу
+    одразу з потрібного тому. Значення можуть бути як літералами, так і
+    `bindparam` - форма умови залежить лише від прапорців `*_is_null`.
+    """
+    def _gt(column: Any, value: Any, is_null: bool) -> ColumnElement[bool]:
+        return column.is_not(None) if is_null else column > value
+
+    def _eq(column: Any, value: Any, is_null: bool) -> ColumnElement[bool]:
+        return column.is_(None) if is_null else column == value
+
+    condition = or_(
+        _gt(Chapter.volume, volume, volume_is_null),
+        and_(
+            _eq(Chapter.volume, volume, volume_is_null),
+            or_(
+                _gt(Chapter.chapter_num, chapter_num, chapter_num_is_null),
+                and_(
+                    _eq(Chapter.chapter_num, chapter_num, chapter_num_is_null),
+                    Chapter.db_id > chapter_db_id,
+                ),
+            ),
+        ),
+    )
+    if not volume_is_null:
+        condition = and_(Chapter.volume >= volume, condition)
+    return condition
+
+
+def _after_cursor_condition(cursor: ChapterCursor) -> ColumnElement[bool]:
+    """Умова "глава стоїть після курсора" в межах манги курсора."""
+    return _after_position_condition(
+        cursor.volume, cursor.chapter_num, cursor.chapter_db_id,
+        cursor.volume is None, cursor.chapter_num is None,
+    )
+
+
+@lru_cache(maxsize=None)
+def _keyset_manga_statement(inclusive: bool, unread_only: bool) -> Select[Any]:
+    """Наступна манга після `:manga_db_id` (або з ним включно)."""
+    manga_db_id = bindparam("manga_db_id")
+    stmt = select(Manga.db_id, Manga.id).where(
+        Manga.db_id >= manga_db_id if inclusive else Manga.db_id > manga_db_id
+    )
+    if unread_only:
+        # Манги без необроблених глав пропускаються тим самим запитом
+        stmt = stmt.where(
+            select(Chapter.db_id)
+            .where(Chapter.manga_id == Manga.id, Chapter.processed_at.is_(None))
+            .exists()
+        )
+    return stmt.order_by(Manga.db_id).limit(1)
+
+
+@lru_cache(maxsize=None)
+def _keyset_chapters_statement(volume_is_null: bool, chapter_num_is_null: bool, unread_only: bool) -> Select[Any]:
+    """
+    Порція глав манги `:manga_id` після позиції курсора. Готові запити
+    кешуються за формою умови, тож на кожну порцію лише підставляються параметри.
+    """
+    stmt = (
+        select(
+            Chapter.db_id, Chapter.manga_id, Chapter.data_id,
+            Chapter.volume, Chapter.chapter_num,
+        )
+        .where(
+            Chapter.manga_id == bindparam("manga_id"),
+            _after_position_condition(
+                bindparam("volume"), bindparam("chapter_num"), bindparam("chapter_db_id"),
+                volume_is_null, chapter_num_is_null,
+            ),
+        )
+    )
+    if unread_only:
+        stmt = stmt.where(Chapter.processed_at.is_(None))
+    return stmt.order_by(*CHAPTER_READING_ORDER).limit(bindparam("limit"))
+
+
+def _yield_chapters_by_offset(
+    session: Session,
     batch_size: int,
     start_offset: Optional[str] = None
 ) -> Generator[Dict[str, Any], None, None]:
-    session: Optional[Session] = None
-    try:
-        session = db_manager.SessionLocal()
+    start_manga_order = 1
+    start_chapter_offset_in_manga = 0
+
+    if start_offset:
+        try:
+            parts = start_offset.split('.')
+            if len(parts) >= 1: start_manga_order = int(parts[0])
+            if len(parts) >= 2: start_chapter_offset_in_manga = int(parts[1])
+        except ValueError:
+            pass
+
+    current_manga_order = start_manga_order
+    
+    while True:
+        # 1. Манги беремо за db_id (старий порядок)
+        current_manga = session.execute(
+            select(Manga.id)
+            .order_by(Manga.db_id) # <-- ПОВЕРНУВ ЯК БУЛО
+            .offset(current_manga_order - 1)
+            .limit(1)
+        ).first()
         
-        start_manga_order = 1
-        start_chapter_offset_in_manga = 0
-
-        if start_offset:
-            try:
-                parts = start_offset.split('.')
-                if len(parts) >= 1: start_manga_order = int(parts[0])
-                if len(parts) >= 2: start_chapter_offset_in_manga = int(parts[1])
-            except ValueError:
-                pass
-
-        current_manga_order = start_manga_order
+        if not current_manga:
+            break
+
+        current_chapter_offset = start_chapter_offset_in_manga if current_manga_order == start_manga_order else 0
+
+        while True:
+            # 2. Глави сортуємо нормально: Том 1, Глава 1 -> Глава 2 -> ...
+            chapters_query = session.execute(
+                select(Chapter.db_id, Chapter.manga_id, Chapter.data_id)
+                .where(Chapter.manga_id == current_manga.id)
+                .order_by(*CHAPTER_READING_ORDER) # Том 1, Глава 1 -> Глава 2 -> ...
+                .offset(current_chapter_offset)
+                .limit(batch_size)
+            ).all()
+
+            if not chapters_query:
+                break
+
+            yield {
+                "items": [
+                    {"manga_id": ch.manga_id, "chapter_id": ch.data_id}
+                    for ch in chapters_query
+                ],
+                "chapter_db_ids": [ch.db_id for ch in chapters_query],
+                "last_processed_offset": f"{current_manga_order}.{current_chapter_offset + len(chapters_query)}"
+            }
+
+            current_chapter_offset += len(chapters_query)
+            if len(chapters_query) < batch_size:
+                break
         
+        current_manga_order += 1
+
+
+def _yield_chapters_by_keyset(
+    session: Session,
+    batch_size: int,
+    start_cursor: Optional[ChapterCursor] = None,
+    unread_only: bool = False
+) -> Generator[Dict[str, Any], None, None]:
+    """
+    Обходить глави пошуком за ключем замість OFFSET: кожна порція - це один
+    пошук по первинному ключу манги та один по індексу
+    `ix_chapters_manga_volume_chapter`, тож її вартість не залежить від того,
+    наскільки далеко від початку черги ми знаходимось.
+
+    З `unread_only=True` беруться лише глави з `processed_at IS NULL`
+    (частковий індекс `ix_chapters_unprocessed`), а манги без таких глав
+    пропускаються тим самим запитом, що шукає наступну мангу.
+    """
+    cursor = start_cursor or ChapterCursor.before_manga(0)
+    # Першу мангу беремо включно: курсор може стояти посередині її глав
+    inclusive = True
+
+    while True:
+        current_manga = session.execute(
+            _keyset_manga_statement(inclusive, unread_only),
+            {"manga_db_id": cursor.manga_db_id},
+        ).first()
+
+        if not current_manga:
+            break
+
+        if current_manga.db_id != cursor.manga_db_id:
+            cursor = ChapterCursor.before_manga(current_manga.db_id)
+
         while True:
-            # 1. Манги беремо за db_id (старий порядок)
-            current_manga = (
-                session.query(Manga)
-                .order_by(Manga.db_id) # <-- ПОВЕРНУВ ЯК БУЛО
-                .offset(current_manga_order - 1)
-                .limit(1)
-                .first()
-            )
-            
-            if not current_manga:
+            chapters_query = session.execute(
+                _keyset_chapters_statement(cursor.volume is None, cursor.chapter_num is None, unread_only),
+                {
+                    "manga_id": current_manga.id,
+                    "volume": cursor.volume,
+                    "chapter_num": cursor.chapter_num,
+                    "chapter_db_id": cursor.chapter_db_id,
+                    "limit": batch_size,
+                },
+            ).all()
+
+            if not chapters_query:
                 break
 
-            current_chapter_offset = start_chapter_offset_in_manga if current_manga_order == start_manga_order else 0
-
-            while True:
-                # 2. Глави сортуємо нормально: Том 1, Глава 1 -> Глава 2 -> ...
-                chapters_query = (
-                    session.query(Chapter)
-                    .filter(Chapter.manga_id == current_manga.id)
-                    .order_by(
-                        Chapter.volume.asc().nullsfirst(), # Спочатку за томом (1, 2...)
-                        Chapter.chapter_num.asc()          # Потім за номером (1, 2, 3...)
-                    )
-                    .offset(current_chapter_offset)
-                    .limit(batch_size)
-                    .all()
-                )
+            last = chapters_query[-1]
+            cursor = ChapterCursor(current_manga.db_id, last.volume, last.chapter_num, last.db_id)
 
-                if not chapters_query:
-                    break
+            yield {
+                "items": [
+                    {"manga_id": ch.manga_id, "chapter_id": ch.data_id}
+                    for ch in chapters_query
+                ],
+                "chapter_db_ids": [ch.db_id for ch in chapters_query],
+                "last_cursor": cursor,
+            }
 
-                yield {
-                    "items": [
-                        {"manga_id": ch.manga_id, "chapter_id": ch.data_id}
-                        for ch in chapters_query
-                    ],
-                    "last_processed_offset": f"{current_manga_order}.{current_chapter_offset + len(chapters_query)}"
-                }
+            if len(chapters_query) < batch_size:
+                break
 
-                current_chapter_offset += len(chapters_query)
-                if len(chapters_query) < batch_size:
-                    break
-            
-            current_manga_order += 1
+        cursor = ChapterCursor.before_manga(current_manga.db_id)
+        inclusive = False
+
+
+def yield_chapters_in_batches(
+    db_manager: DBManager, 
+    batch_size: int,
+    start_offset: Optional[str] = None,
+    mode: ChapterWalkMode = ChapterWalkMode.OFFSET,
+    start_cursor: Optional[ChapterCursor] = None
+) -> Generator[Dict[str, Any], None, None]:
+    """
+    Віддає глави порціями у порядку читання.
+
+    Режими:
+    - OFFSET: позиція задається рядком "номер_манги.зміщення_глави"
+      (`start_offset`), кожна порція містить `last_processed_offset`.
+    - KEYSET: позиція задається `start_cursor` (None - з самого початку),
+      кожна порція містить `last_cursor` - курсор останньої відданої глави.
+    - UNREAD: як KEYSET, але лише глави, які ще не позначені як оброблені
+      (див. `mark_chapters_processed`).
+
+    Кожна порція також містить `chapter_db_ids` - db_id відданих глав.
+    """
+    session: Optional[Session] = None
+    try:
+        session = db_manager.SessionLocal()
+
+        if mode in (ChapterWalkMode.KEYSET, ChapterWalkMode.UNREAD):
+            unread_only = mode == ChapterWalkMode.UNREAD
+            yield from _yield_chapters_by_keyset(session, batch_size, start_cursor, unread_only)
+        else:
+            yield from _yield_chapters_by_offset(session, batch_size, start_offset)
             
     except Exception as e:
         logging.error(f"Error: {e}", exc_info=True)
     finally:
-        if session: session.close()
\ No newline at end of file
+        if session: session.close()
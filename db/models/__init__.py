@@ -1,9 +1,15 @@
 from .base import Base
 from .chapter import Chapter
+from .crawl_page import CrawlPage
 from .manga import Manga
+from .reading_cursor import ReadingCursor
+from .reward_event import RewardEvent
 
 __all__ = [
     "Base",
     "Chapter",
-    "Manga"
-]
\ No newline at end of file
+    "CrawlPage",
+    "Manga",
+    "ReadingCursor",
+    "RewardEvent"
+]
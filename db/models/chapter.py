@@ -1,10 +1,15 @@
-from sqlalchemy import Column, Sequence, String, Integer, ForeignKey
+from sqlalchemy import Column, Index, Sequence, String, Integer, ForeignKey
 from sqlalchemy.orm import relationship
 
 from .base import Base
 
 class Chapter(Base):
     __tablename__ = "chapters"
+    __table_args__ = (
+        # Складений індекс під порядок читання (manga_id, том, глава, db_id):
+        # db_id (rowid) SQLite неявно зберігає в кожному записі індексу.
+        Index("ix_chapters_manga_volume_chapter", "manga_id", "volume", "chapter_num"),
+    )
 
     # Автоінкрементоване цілочисельне ID
     db_id = Column(Integer, Sequence('chapter_db_id_seq'), primary_key=True)
@@ -22,7 +27,22 @@ class Chapter(Base):
     date = Column(String, nullable=True) 
     url = Column(String, nullable=False)
 
+    # Стан обробки колектором: коли главу надіслано в /addHistory і з яким
+    # результатом (значення ChapterOutcome). NULL - глава ще не надсилалась.
+    processed_at = Column(Integer, nullable=True)
+    outcome = Column(String, nullable=True)
+
     manga = relationship("Manga", back_populates="chapters")
 
     def __repr__(self):
-        return f"<Chapter(db_id={self.db_id}, data_id='{self.data_id}', manga_id='{self.manga_id}', chapter_num='{self.chapter_num}')>"
\ No newline at end of file
+        return f"<Chapter(db_id={self.db_id}, data_id='{self.data_id}', manga_id='{self.manga_id}', chapter_num='{self.chapter_num}')>"
+
+# Частковий індекс лише по необроблених главах: черга "ще не надіслане"
+# читається з нього без перегляду вже оброблених рядків. processed_at входить
+# у ключ, щоб перевірка "чи є в манзі необроблені глави" була покривною
+# (без звернень до таблиці) - інакше планувальник SQLite обирає повний індекс.
+Index(
+    "ix_chapters_unprocessed",
+    Chapter.manga_id, Chapter.volume, Chapter.chapter_num, Chapter.processed_at,
+    sqlite_where=Chapter.processed_at.is_(None),
+)
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, Sequence, String, UniqueConstraint
+
+from .base import Base
+
+class CrawlPage(Base):
+    """Фронтир обходу каталогу: стан кожної сторінки списку манг для певного фільтра."""
+    __tablename__ = "crawl_frontier"
+    __table_args__ = (
+        UniqueConstraint("filter_hash", "page_num", name="uq_crawl_frontier_filter_page"),
+    )
+
+    db_id = Column(Integer, Sequence('crawl_page_db_id_seq'), primary_key=True)
+
+    # Хеш параметрів фільтра каталогу (PARAMS) - різні фільтри мають окремі фронтири
+    filter_hash = Column(String, nullable=False)
+    page_num = Column(Integer, nullable=False)
+
+    status = Column(String, nullable=False) # Значення CrawlStatus
+    # ID манг на сторінці (через кому) та хеш її вмісту - для пропуску незмінених сторінок
+    item_ids = Column(String, nullable=True)
+    content_hash = Column(String, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    error = Column(String, nullable=True)
+
+    updated_at = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<CrawlPage(filter_hash='{self.filter_hash}', page_num={self.page_num}, status='{self.status}')>"
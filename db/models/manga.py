@@ -15,11 +15,19 @@ class Manga(Base):
     id = Column(String, index=True, unique=True, nullable=False) 
 
     url = Column(String, nullable=False)
-    name = Column(String, nullable=False)
+    name = Column(String, nullable=False, index=True) # Індекс під сортування статистики за назвою
     rating = Column(String, default="")
     info = Column(String, default="")
     image = Column(String, default="")
 
+    # Денормалізована статистика глав: підтримується при збереженні/додаванні/
+    # видаленні глав (див. db.manga_service) і звіряється `verify_chapter_stats`.
+    # Остання глава - остання в порядку читання (том, номер, db_id).
+    chapters_count = Column(Integer, nullable=False, default=0, server_default="0")
+    latest_chapter_db_id = Column(Integer, nullable=True)
+    latest_volume = Column(Integer, nullable=True)
+    latest_chapter_num = Column(Integer, nullable=True)
+
     chapters = relationship("Chapter", back_populates="manga", cascade="all, delete-orphan", order_by="Chapter.chapter_num")
 
     def __repr__(self):
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String
+
+from .base import Base
+
+class ReadingCursor(Base):
+    __tablename__ = "reading_cursors"
+
+    # Назва курсора (наприклад, "collector"), щоб можна було вести кілька черг
+    name = Column(String, primary_key=True)
+
+    # Ключ останньої обробленої глави: порядок (manga db_id, том, глава, db_id глави).
+    # Том і номер зберігаються копією, тож курсор лишається коректним,
+    # навіть якщо саму главу буде видалено.
+    manga_db_id = Column(Integer, nullable=False)
+    volume = Column(Integer, nullable=True)
+    chapter_num = Column(Integer, nullable=True)
+    chapter_db_id = Column(Integer, nullable=False)
+
+    updated_at = Column(Integer, nullable=False)
+
+    # Час (unix) останнього запиту /addHistory цієї черги: від нього після
+    # перезапуску відлічується DELAY, навіть якщо журнал нагород не встиг записатись
+    last_request_at = Column(Integer, nullable=True)
+
+    def __repr__(self):
+        return (f"<ReadingCursor(name='{self.name}', manga_db_id={self.manga_db_id}, "
+                f"volume={self.volume}, chapter_num={self.chapter_num}, chapter_db_id={self.chapter_db_id})>")
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Float, Integer, Sequence, String
+
+from .base import Base
+
+class RewardEvent(Base):
+    __tablename__ = "reward_ledger"
+
+    db_id = Column(Integer, Sequence('reward_event_db_id_seq'), primary_key=True)
+
+    # Час запиту (UTC timestamp у секундах) - за ним рахуються агрегати по годинах
+    created_at = Column(Integer, index=True, nullable=False)
+
+    # Ендпоінт: значення RewardEndpoint ("addHistory" / "takeCandy")
+    endpoint = Column(String, nullable=False)
+
+    # Зовнішній ID манхви та data_id глав з порції (через кому)
+    manga_id = Column(String, index=True, nullable=True)
+    chapter_ids = Column(String, default="")
+
+    # Затримка перед запитом, с
+    delay = Column(Float, nullable=True)
+
+    # Результат: значення ChapterOutcome ("candy", "pumpkin", "card", "empty", "error")
+    reward_type = Column(String, nullable=False)
+    card_id = Column(String, nullable=True)
+    card_name = Column(String, nullable=True)
+
+    def __repr__(self):
+        return f"<RewardEvent(db_id={self.db_id}, endpoint='{self.endpoint}', reward_type='{self.reward_type}')>"
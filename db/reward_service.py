@@ -0,0 +1,215 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import Integer, case, cast, func, insert, select
+from sqlalchemy.orm import Session
+
+from utils.enums import ChapterOutcome, RewardEndpoint
+from utils.time import get_current_timestamp
+from .models import Manga, RewardEvent
+from .manager import DBManager
+
+class RewardLedgerWriter:
+    """
+    Буферизований запис журналу нагород.
+
+    `record` лише додає рядок у пам'ять; у БД рядки потрапляють одним
+    масовим INSERT в одній транзакції, коли буфер досягає `flush_size`, минуло
+    `flush_interval` секунд з останнього скидання або викликано `flush`/`close`.
+    Подія ендпоінта з `flush_endpoints` скидає буфер одразу - такі події
+    не губляться при аварійному завершенні процесу.
+    """
+    def __init__(
+        self,
+        db_manager: DBManager,
+        flush_size: int = 50,
+        flush_interval: Optional[float] = None,
+        flush_endpoints: Iterable[RewardEndpoint] = (),
+    ) -> None:
+        self.db_manager = db_manager
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.flush_endpoints = frozenset(flush_endpoints)
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def record(
+        self,
+        endpoint: RewardEndpoint,
+        reward_type: ChapterOutcome,
+        *,
+        manga_id: Optional[str] = None,
+        chapter_ids: Iterable[str] = (),
+        delay: Optional[float] = None,
+        card_id: Optional[str] = None,
+        card_name: Optional[str] = None,
+    ) -> None:
+        row = {
+            "created_at": get_current_timestamp(),
+            "endpoint": endpoint.value,
+            "manga_id": manga_id,
+            "chapter_ids": ",".join(str(cid) for cid in chapter_ids),
+            "delay": delay,
+            "reward_type": reward_type.value,
+            "card_id": card_id,
+            "card_name": card_name,
+        }
+        with self._lock:
+            self._buffer.append(row)
+            should_flush = endpoint in self.flush_endpoints or len(self._buffer) >= self.flush_size or (
+                self.flush_interval is not None
+                and time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if should_flush:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Записує буфер у БД. Повертає кількість записаних рядків.
+        У разі помилки рядки лишаються в буфері до наступної спроби.
+        """
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+
+        if not rows:
+            return 0
+
+        try:
+            def _insert(session: Session) -> int:
+                session.execute(insert(RewardEvent), rows)
+                return len(rows)
+            written = self.db_manager.run_in_tx(_insert)
+            logging.debug(f"Журнал нагород: записано {written} подій.")
+            return written
+        except Exception as e:
+            logging.error(f"Помилка запису журналу нагород ({len(rows)} подій): {e}")
+            with self._lock:
+                self._buffer[:0] = rows
+            return 0
+
+    def close(self) -> None:
+        self.flush()
+
+
+def get_last_event_time(db_manager: DBManager, endpoint: RewardEndpoint) -> Optional[int]:
+    """Час (unix) останньої події ендпоінта в журналі або None, якщо подій не було."""
+    try:
+        def _query(session: Session) -> Optional[int]:
+            return session.execute(
+                select(func.max(RewardEvent.created_at))
+                .where(RewardEvent.endpoint == endpoint.value)
+            ).scalar()
+        return db_manager.run_readonly(_query)
+    except Exception as e:
+        logging.error(f"Помилка читання журналу нагород: {e}")
+        return None
+
+
+# --- Агрегати (рахуються в SQL) ---
+
+def _reward_columns() -> List[Any]:
+    """Спільні агрегати: кількість запитів, цукерок (гарбуз = 3) та карток."""
+    return [
+        func.count(RewardEvent.db_id).label("requests"),
+        func.coalesce(func.sum(case(
+            (RewardEvent.reward_type == ChapterOutcome.CANDY.value, 1),
+            (RewardEvent.reward_type == ChapterOutcome.PUMPKIN.value, 3),
+            else_=0,
+        )), 0).label("candies"),
+        func.coalesce(func.sum(case(
+            (RewardEvent.reward_type == ChapterOutcome.CARD.value, 1),
+            else_=0,
+        )), 0).label("cards"),
+        func.coalesce(func.sum(case(
+            (RewardEvent.reward_type == ChapterOutcome.ERROR.value, 1),
+            else_=0,
+        )), 0).label("errors"),
+    ]
+
+def _history_filters(since: Optional[int]) -> List[Any]:
+    filters: List[Any] = [RewardEvent.endpoint == RewardEndpoint.ADD_HISTORY.value]
+    if since is not None:
+        filters.append(RewardEvent.created_at >= since)
+    return filters
+
+def get_rewards_per_hour(db_manager: DBManager, since: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Нагороди з /addHistory по годинах (UTC).
+
+    Returns:
+        Список словників: 'hour' ("YYYY-MM-DD HH:00"), 'requests', 'candies', 'cards', 'errors'.
+    """
+    try:
+        def _query(session: Session) -> List[Dict[str, Any]]:
+            hour = func.strftime("%Y-%m-%d %H:00", RewardEvent.created_at, "unixepoch").label("hour")
+            rows = (
+                session.query(hour, *_reward_columns())
+                .filter(*_history_filters(since))
+                .group_by(hour)
+                .order_by(hour)
+                .all()
+            )
+            return [dict(row._mapping) for row in rows]
+        return db_manager.run_readonly(_query)
+    except Exception as e:
+        logging.error(f"Помилка агрегації нагород по годинах: {e}", exc_info=True)
+        return []
+
+def get_rewards_per_delay_bucket(
+    db_manager: DBManager,
+    bucket_seconds: float = 600.0,
+    since: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Нагороди з /addHistory, згруповані за затримкою перед запитом
+    (кошики по `bucket_seconds`).
+
+    Returns:
+        Список словників: 'delay_from' (нижня межа кошика, с), 'requests', 'candies', 'cards', 'errors'.
+    """
+    try:
+        def _query(session: Session) -> List[Dict[str, Any]]:
+            bucket = (
+                cast(func.coalesce(RewardEvent.delay, 0) / bucket_seconds, Integer) * bucket_seconds
+            ).label("delay_from")
+            rows = (
+                session.query(bucket, *_reward_columns())
+                .filter(*_history_filters(since))
+                .group_by(bucket)
+                .order_by(bucket)
+                .all()
+            )
+            return [dict(row._mapping) for row in rows]
+        return db_manager.run_readonly(_query)
+    except Exception as e:
+        logging.error(f"Помилка агрегації нагород за затримкою: {e}", exc_info=True)
+        return []
+
+def get_rewards_per_manga(db_manager: DBManager, since: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Нагороди з /addHistory по манхвах, від найприбутковіших.
+
+    Returns:
+        Список словників: 'manga_id', 'name', 'requests', 'candies', 'cards', 'errors'.
+    """
+    try:
+        def _query(session: Session) -> List[Dict[str, Any]]:
+            reward_columns = _reward_columns()
+            rows = (
+                session.query(RewardEvent.manga_id, Manga.name, *reward_columns)
+                .outerjoin(Manga, Manga.id == RewardEvent.manga_id)
+                .filter(*_history_filters(since))
+                .group_by(RewardEvent.manga_id, Manga.name)
+                .order_by(reward_columns[1].desc(), reward_columns[2].desc())
+                .all()
+            )
+            return [dict(row._mapping) for row in rows]
+        return db_manager.run_readonly(_query)
+    except Exception as e:
+        logging.error(f"Помилка агрегації нагород по манхвах: {e}", exc_info=True)
+        return []
@@ -1,14 +1,23 @@
 # file: main.py
 
 import logging
+from functools import partial
+
 import requests
 
+from application.async_collector import AsyncResourceCollector
 from application.collector import ResourceCollector, CollectMode
+from utils.enums import ChapterWalkMode
 from db.manager import DBManager
-from mangabuff.register import get_valide_config
+from db.manga_service import verify_chapter_stats
+from mangabuff.register import get_valide_config, relogin_session
+from mangabuff.scraper import SCRAPER_PARSE_POOL
 from utils.logging import setup_logging
-from utils.network_utils import create_mangabuff_session
-from utils.settings import DB_URL, TARGET_COUNT, MODE
+from utils.network_utils import create_mangabuff_session, persist_session
+from utils.settings import (
+    DB_URL, SQLITE_PRAGMAS, DB_MAINTENANCE_INTERVAL, DB_INCREMENTAL_VACUUM_PAGES,
+    TARGET_COUNT, MODE, WALK_MODE, VERIFY_CHAPTER_STATS, SESSION_STORE_FILE, COLLECTOR_ASYNC
+)
 
 def setup_dependencies() -> tuple[DBManager, requests.Session]:
     """
@@ -16,16 +25,29 @@ def setup_dependencies() -> tuple[DBManager, requests.Session]:
     - З'єднання з БД.
     - HTTP-сесію з валідною конфігурацією.
     """
-    db_manager = DBManager(DB_URL)
+    db_manager = DBManager(
+        DB_URL,
+        sqlite_pragmas=SQLITE_PRAGMAS,
+        maintenance_interval=DB_MAINTENANCE_INTERVAL,
+        incremental_vacuum_pages=DB_INCREMENTAL_VACUUM_PAGES,
+    )
     db_manager.init_models()
+    if VERIFY_CHAPTER_STATS:
+        report = verify_chapter_stats(db_manager)
+        logging.info(
+            f"Статистика глав: перевірено {report['checked']} манг, "
+            f"розбіжностей {report['drifted']}, виправлено {report['repaired']}."
+        )
     
     config = get_valide_config()
     if not config:
         raise RuntimeError("Не вдалося отримати конфігурацію.")
     
-    session = create_mangabuff_session(config)
+    session = create_mangabuff_session(config, store_path=SESSION_STORE_FILE)
     if not session:
         raise RuntimeError("Не вдалося ініціалізувати HTTP сесію.")
+    # Сесія сайту може сплисти під час довгого запуску: 401 -> вхід заново
+    session.reauthenticate = partial(relogin_session, config)
         
     return db_manager, session
 
@@ -38,11 +60,14 @@ def main():
     try:
         db_manager, session = setup_dependencies()
         
-        collector = ResourceCollector(
+        # Асинхронний колектор використовує паузи між запитами нагороди для фонової роботи
+        collector_class = AsyncResourceCollector if COLLECTOR_ASYNC else ResourceCollector
+        collector = collector_class(
             session=session, 
             db_manager=db_manager, 
             target_amount=TARGET_COUNT,
-            mode=CollectMode(MODE)
+            mode=CollectMode(MODE),
+            walk_mode=ChapterWalkMode(WALK_MODE)
         )
         collector.run()
 
@@ -52,9 +77,12 @@ def main():
         logging.critical(f"Виникла критична помилка: {e}", exc_info=True)
     finally:
         if session:
+            persist_session(session) # Cookies, оновлені сайтом за час роботи
             session.close()
         if db_manager:
             db_manager.dispose()
+        if SCRAPER_PARSE_POOL:
+            SCRAPER_PARSE_POOL.close()
         logging.info("Скрипт завершив роботу.")
 
 if __name__ == "__main__":
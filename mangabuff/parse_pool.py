@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+"""
+Пул процесів для HTML-парсингу скрейпера.
+
+Парсинг - робота для процесора під GIL: у потоках він чергується із
+завантаженням і займає одне ядро. `ParsePool` виносить його в окремі
+процеси: туди передаються байти відповідей як вони прийшли з мережі
+(`RawBody`, декодуються лише в дочірньому процесі), назад - компактні
+кортежі полів замість словників. MangaData/ChapterData збираються вже
+в основному процесі. Рядки (вміст з HTTP-кешу, обрізані фрагменти
+інкрементального режиму) передаються в UTF-8.
+
+Процеси стартують методом "spawn" (fork процесу з робочими потоками та
+відкритими з'єднаннями може заблокуватись) і лише з першим завданням.
+"""
+
+import json
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from utils.enums import RawBody
+from utils.settings import HTML_PARSER, HTML_PARSE_STREAMING, PARSE_PROCESSES
+from .data_models import MangaData, ChapterData
+from .parsers import get_parser_backend
+
+# (id, url, name, rating, info, image)
+MangaRow = Tuple[str, str, str, str, str, str]
+# (data_id, url, volume, chapter, date)
+ChapterRow = Tuple[str, str, Optional[int], Optional[int], Optional[str]]
+
+# Сторінка для дочірнього процесу: відповідь з мережі або рядок у UTF-8
+Page = Union[RawBody, bytes]
+
+# Сурогати можуть прийти з JSON-відповіді /chapters/load - передаємо їх як є
+_ENCODING_ERRORS = "surrogatepass"
+
+# ==============================================================================
+# 1. ЗАВДАННЯ В ДОЧІРНІХ ПРОЦЕСАХ
+# ==============================================================================
+
+def _init_worker(log_level: int) -> None:
+    # Дочірній процес "spawn" не успадковує налаштувань логування
+    logging.getLogger().setLevel(log_level)
+
+def _decode_page(page: Page) -> str:
+    """HTML сторінки: єдине декодування байтів (та JSON для /chapters/load)."""
+    if isinstance(page, RawBody):
+        if page.html_field is not None:
+            return json.loads(page.data)[page.html_field]
+        return page.data.decode(page.encoding, "replace")
+    return page.decode("utf-8", _ENCODING_ERRORS)
+
+def _parse_manga_list_job(page: Page, backend: str, streaming: bool) -> List[MangaRow]:
+    mangas = get_parser_backend(backend, streaming).parse_manga_list(_decode_page(page))
+    return [(m["id"], m["url"], m["name"], m["rating"], m["info"], m["image"]) for m in mangas.values()]
+
+def _parse_chapters_job(fragments: Tuple[Page, ...], backend: str, streaming: bool) -> List[ChapterRow]:
+    parser = get_parser_backend(backend, streaming)
+    rows: List[ChapterRow] = []
+    for fragment in fragments:
+        rows.extend(
+            (c["data_id"], c["url"], c["volume"], c["chapter"], c["date"])
+            for c in parser.parse_chapters(_decode_page(fragment))
+        )
+    return rows
+
+# ==============================================================================
+# 2. ПУЛ
+# ==============================================================================
+
+def mangas_from_rows(rows: Sequence[MangaRow]) -> Dict[str, MangaData]:
+    return {
+        row[0]: {
+            "id": row[0], "url": row[1], "name": row[2], "rating": row[3],
+            "info": row[4], "image": row[5], "chapters": []
+        }
+        for row in rows
+    }
+
+def chapters_from_rows(rows: Sequence[ChapterRow]) -> List[ChapterData]:
+    return [
+        {"data_id": row[0], "url": row[1], "volume": row[2], "chapter": row[3], "date": row[4]}
+        for row in rows
+    ]
+
+class ParsePool:
+    """
+    Потокобезпечна обгортка над ProcessPoolExecutor з `processes` процесами.
+    `submit_*` повертають Future з кортежами (див. `*_from_rows`), `parse_*` -
+    блокуючі аналоги функцій скрейпера. Зламаний пул (процес завершився
+    аварійно) перезапускається з наступним завданням.
+    """
+    def __init__(
+        self,
+        processes: int = PARSE_PROCESSES,
+        backend: Optional[str] = None,
+        streaming: Optional[bool] = None
+    ) -> None:
+        self.processes = max(1, processes)
+        self.backend = backend or HTML_PARSER
+        self.streaming = HTML_PARSE_STREAMING if streaming is None else streaming
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _submit(self, job, payload) -> Future:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    self.processes, mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker, initargs=(logging.getLogger().getEffectiveLevel(),)
+                )
+                logging.info(f"Запущено пул парсингу: {self.processes} процесів ({self.backend}).")
+            executor = self._executor
+        try:
+            return executor.submit(job, payload, self.backend, self.streaming)
+        except BrokenProcessPool:
+            logging.error("Пул парсингу зламано - перезапуск.")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            return self._submit(job, payload)
+
+    @staticmethod
+    def _page(html: Union[str, RawBody]) -> Page:
+        # Байти з мережі передаються як є, без копії та перекодування
+        return html if isinstance(html, RawBody) else html.encode("utf-8", _ENCODING_ERRORS)
+
+    def submit_manga_list(self, html: Union[str, RawBody]) -> "Future[List[MangaRow]]":
+        return self._submit(_parse_manga_list_job, self._page(html))
+
+    def submit_chapters(self, *fragments: Union[str, RawBody]) -> "Future[List[ChapterRow]]":
+        return self._submit(
+            _parse_chapters_job, tuple(self._page(html) for html in fragments if html)
+        )
+
+    def parse_manga_list(self, html: Union[str, RawBody]) -> Dict[str, MangaData]:
+        return mangas_from_rows(self.submit_manga_list(html).result())
+
+    def parse_chapters(self, *fragments: Union[str, RawBody]) -> List[ChapterData]:
+        return chapters_from_rows(self.submit_chapters(*fragments).result())
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
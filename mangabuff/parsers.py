@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+
+"""
+Бекенди HTML-парсингу скрейпера.
+
+- "bs4"  - BeautifulSoup з "html.parser" (чистий Python, завжди доступний);
+- "lxml" - швидкий C-парсер libxml2 з XPath-запитами, потребує додаткової
+  залежності: `pip install .[fast]`.
+
+Обидва бекенди повертають однакові `MangaData`/`ChapterData` (перевірка
+відповідності та заміри - `python -m benchmarks.parser_benchmark`).
+Бекенд обирається налаштуванням HTML_PARSER; якщо lxml не встановлено,
+використовується bs4.
+
+Потоковий режим (HTML_PARSE_STREAMING) розбирає лише ділянку сторінки від
+першого до останнього елемента a.cards__item / a.chapters__item: шапка,
+скрипти, опис і коментарі в дерево не потрапляють. Пам'ять парсингу тоді
+росте з кількістю карток/глав, а не з розміром сторінки.
+"""
+
+import logging
+import re
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup, Tag
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+from utils.settings import HTML_PARSER, HTML_PARSE_STREAMING
+from .data_models import MangaData, ChapterData
+
+# ==============================================================================
+# 1. СПІЛЬНІ ДОПОМІЖНІ ФУНКЦІЇ
+# ==============================================================================
+
+def _parse_vol_chap_from_url(url: str) -> Tuple[Optional[int], Optional[int]]:
+    """Витягує номер тому та глави з URL."""
+    try:
+        path_parts = urlparse(url).path.strip("/").split("/")
+        # Припускаємо, що структура /.../volume/chapter
+        return int(path_parts[-2]), int(path_parts[-1])
+    except (ValueError, IndexError):
+        logging.debug(f"Не вдалося визначити том/главу з URL: {url}")
+        return None, None
+
+def _image_from_style(style: Optional[str]) -> str:
+    """URL з `background-image: url(...)` або порожній рядок."""
+    if style and "url(" in style:
+        return style.split("url(")[1].split(")")[0].strip("'\"")
+    return ""
+
+def _manga_data(data_id: str, url: str, name: str, rating: str, info: str, image: str) -> MangaData:
+    return {
+        "id": str(data_id),
+        "url": url,
+        "name": name.strip(),
+        "rating": rating.strip(),
+        "info": info.strip(),
+        "image": image,
+        "chapters": []
+    }
+
+def _chapter_data(data_id: str, href: str, date: Optional[str]) -> ChapterData:
+    volume, chapter = _parse_vol_chap_from_url(href)
+    return {
+        "data_id": data_id,
+        "url": href,
+        "volume": volume,
+        "chapter": chapter,
+        "date": date,
+    }
+
+# ==============================================================================
+# 2. BEAUTIFULSOUP (html.parser)
+# ==============================================================================
+
+def _parse_single_manga_item(item: Tag) -> Optional[MangaData]:
+    """Парсить дані однієї манхви з HTML-тегу <a>."""
+    if not (data_id := item.get("data-id")) or not (url := item.get("href")):
+        return None
+
+    try:
+        img_tag = item.select_one(".cards__img")
+        img_url = _image_from_style(img_tag.get("style")) if img_tag else ""
+
+        return _manga_data(
+            data_id, url,
+            item.select_one(".cards__name").text,
+            item.select_one(".cards__rating").text,
+            item.select_one(".cards__info").text,
+            img_url,
+        )
+    except AttributeError as e:
+        logging.warning(f"Не вдалося розпарсити елемент манхви (id: {data_id}): {e}")
+        return None
+
+def _parse_single_chapter_item(item: Tag) -> Optional[ChapterData]:
+    """Парсить дані однієї глави з HTML-тегу <a>."""
+    if not (href := item.get("href")):
+        return None
+
+    like_button = item.select_one("button.favourite-send-btn[data-id]")
+    if not like_button or not (chapter_data_id := like_button.get("data-id")):
+        return None
+
+    date_tag = item.select_one(".chapters__add-date")
+    date = item.get("data-chapter-date") or (date_tag.get_text(strip=True) if date_tag else None)
+    return _chapter_data(chapter_data_id, href, date)
+
+MANGA_ITEM_CLASS = "cards__item"
+CHAPTER_ITEM_CLASS = "chapters__item"
+
+_ITEM_TAG_RES: Dict[str, "re.Pattern[str]"] = {
+    item_class: re.compile(rf"""<a\s[^>]*?class\s*=\s*["']?[^"'>]*?(?<![\w-]){item_class}(?![\w-])""", re.IGNORECASE)
+    for item_class in (MANGA_ITEM_CLASS, CHAPTER_ITEM_CLASS)
+}
+_CLOSE_A_RE = re.compile(r"</a\s*>", re.IGNORECASE)
+
+def _items_span(html: str, item_class: str) -> str:
+    """
+    Частина HTML від тегу першого до кінця останнього елемента <a class="`item_class`">
+    (пошук по сирому тексту, як `_known_chapter_offset` у скрейпері) або "", якщо
+    таких елементів немає. Шапка, скрипти, опис та коментарі не потрапляють у парсер.
+    """
+    tag_re = _ITEM_TAG_RES[item_class]
+    first = tag_re.search(html)
+    if first is None:
+        return ""
+    last = first
+    for last in tag_re.finditer(html, last.end()):
+        pass
+    close = _CLOSE_A_RE.search(html, last.end())
+    return html[first.start():close.end() if close else len(html)]
+
+class HtmlParserBackend(ABC):
+    """
+    Інтерфейс бекенду: HTML сторінки -> дані скрейпера.
+    `streaming=True` - розбирати лише елементи карток/глав (див. опис модуля).
+    Бекенд без реалізації якогось із методів не створиться взагалі.
+    """
+    name = "base"
+
+    def __init__(self, streaming: bool = False) -> None:
+        self.streaming = streaming
+
+    @abstractmethod
+    def parse_manga_list(self, html: str) -> Dict[str, MangaData]:
+        """Манги зі сторінки каталогу (a.cards__item) у порядку сторінки."""
+
+    @abstractmethod
+    def parse_chapters(self, html: str) -> List[ChapterData]:
+        """Глави зі сторінки манги або відповіді /chapters/load (a.chapters__item)."""
+
+class Bs4ParserBackend(HtmlParserBackend):
+    name = "bs4"
+
+    def _soup(self, html: str, item_class: str) -> BeautifulSoup:
+        return BeautifulSoup(_items_span(html, item_class) if self.streaming else html, "html.parser")
+
+    def parse_manga_list(self, html: str) -> Dict[str, MangaData]:
+        soup = self._soup(html, MANGA_ITEM_CLASS)
+        mangas: Dict[str, MangaData] = {}
+        for item in soup.select("a.cards__item"):
+            if isinstance(item, Tag) and (manga_data := _parse_single_manga_item(item)):
+                mangas[manga_data["id"]] = manga_data
+        return mangas
+
+    def parse_chapters(self, html: str) -> List[ChapterData]:
+        soup = self._soup(html, CHAPTER_ITEM_CLASS)
+        chapters: List[ChapterData] = []
+        for item in soup.select("a.chapters__item"):
+            if isinstance(item, Tag) and (chapter_data := _parse_single_chapter_item(item)):
+                chapters.append(chapter_data)
+        return chapters
+
+# ==============================================================================
+# 3. LXML (libxml2 + XPath)
+# ==============================================================================
+
+def _has_class(name: str) -> str:
+    """XPath-умова "клас `name` серед класів елемента" (як `.name` у CSS)."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+class LxmlParserBackend(HtmlParserBackend):
+    """
+    Ті самі селектори, що й у bs4-бекенді, як скомпільовані XPath-вирази.
+    Текст елемента - як `.text` у bs4 (усі нащадки), дата - як
+    `get_text(strip=True)` (кожен текстовий вузол без пробілів по краях).
+    """
+    name = "lxml"
+
+    def __init__(self, streaming: bool = False) -> None:
+        if lxml is None:
+            raise RuntimeError("Для бекенду lxml потрібен пакет lxml: pip install .[fast]")
+        super().__init__(streaming)
+        self._cards = etree.XPath(f"//a[{_has_class(MANGA_ITEM_CLASS)}]")
+        self._card_img = etree.XPath(f".//*[{_has_class('cards__img')}]")
+        self._card_name = etree.XPath(f".//*[{_has_class('cards__name')}]")
+        self._card_rating = etree.XPath(f".//*[{_has_class('cards__rating')}]")
+        self._card_info = etree.XPath(f".//*[{_has_class('cards__info')}]")
+        self._chapters = etree.XPath(f"//a[{_has_class(CHAPTER_ITEM_CLASS)}]")
+        self._like_button = etree.XPath(f".//button[{_has_class('favourite-send-btn')}][@data-id]")
+        self._add_date = etree.XPath(f".//*[{_has_class('chapters__add-date')}]")
+
+    @staticmethod
+    def _document(html: str) -> Optional["etree._Element"]:
+        if not html or not html.strip():
+            return None
+        try:
+            return lxml.html.document_fromstring(html)
+        except etree.ParserError:
+            return None
+
+    @staticmethod
+    def _first(query: "etree.XPath", item: "etree._Element") -> Optional["etree._Element"]:
+        found = query(item)
+        return found[0] if found else None
+
+    def _parse_manga_item(self, item: "etree._Element") -> Optional[MangaData]:
+        if not (data_id := item.get("data-id")) or not (url := item.get("href")):
+            return None
+
+        name = self._first(self._card_name, item)
+        rating = self._first(self._card_rating, item)
+        info = self._first(self._card_info, item)
+        if name is None or rating is None or info is None:
+            logging.warning(f"Не вдалося розпарсити елемент манхви (id: {data_id}): немає обов'язкового поля")
+            return None
+
+        img_tag = self._first(self._card_img, item)
+        return _manga_data(
+            data_id, url, name.text_content(), rating.text_content(), info.text_content(),
+            _image_from_style(img_tag.get("style")) if img_tag is not None else "",
+        )
+
+    def _parse_chapter_item(self, item: "etree._Element") -> Optional[ChapterData]:
+        if not (href := item.get("href")):
+            return None
+
+        like_button = self._first(self._like_button, item)
+        if like_button is None or not (chapter_data_id := like_button.get("data-id")):
+            return None
+
+        date = item.get("data-chapter-date")
+        if not date:
+            date_tag = self._first(self._add_date, item)
+            date = "".join(text.strip() for text in date_tag.itertext()) if date_tag is not None else None
+        return _chapter_data(chapter_data_id, href, date)
+
+    def parse_manga_list(self, html: str) -> Dict[str, MangaData]:
+        mangas: Dict[str, MangaData] = {}
+        if self.streaming:
+            html = _items_span(html, MANGA_ITEM_CLASS)
+        if (document := self._document(html)) is None:
+            return mangas
+        for item in self._cards(document):
+            if manga_data := self._parse_manga_item(item):
+                mangas[manga_data["id"]] = manga_data
+        return mangas
+
+    def parse_chapters(self, html: str) -> List[ChapterData]:
+        chapters: List[ChapterData] = []
+        if self.streaming:
+            html = _items_span(html, CHAPTER_ITEM_CLASS)
+        if (document := self._document(html)) is None:
+            return chapters
+        for item in self._chapters(document):
+            if chapter_data := self._parse_chapter_item(item):
+                chapters.append(chapter_data)
+        return chapters
+
+# ==============================================================================
+# 4. ВИБІР БЕКЕНДУ
+# ==============================================================================
+
+PARSER_BACKENDS = {
+    Bs4ParserBackend.name: Bs4ParserBackend,
+    LxmlParserBackend.name: LxmlParserBackend,
+}
+_backends = threading.local()
+
+def get_parser_backend(name: Optional[str] = None, streaming: Optional[bool] = None) -> HtmlParserBackend:
+    """
+    Бекенд `name` (за замовчуванням HTML_PARSER) у потоковому режимі чи ні
+    (за замовчуванням HTML_PARSE_STREAMING). Якщо lxml не встановлено,
+    повертається bs4. Екземпляр кешується окремо для кожного потоку:
+    XPath-вирази компілюються раз, але не діляться між потоками.
+    """
+    name = name or HTML_PARSER
+    streaming = HTML_PARSE_STREAMING if streaming is None else streaming
+    if name == LxmlParserBackend.name and lxml is None:
+        name = Bs4ParserBackend.name
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f"Невідомий бекенд парсингу: {name}")
+
+    cache: Dict[Tuple[str, bool], HtmlParserBackend] = _backends.__dict__.setdefault("instances", {})
+    backend = cache.get((name, streaming))
+    if backend is None:
+        backend = cache[(name, streaming)] = PARSER_BACKENDS[name](streaming)
+        logging.debug(f"Бекенд HTML-парсингу: {name}{' (потоковий)' if streaming else ''}")
+    return backend
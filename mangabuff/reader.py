@@ -3,9 +3,13 @@ from typing import Any, Dict, Optional
 
 import requests
 
+from db.reward_service import RewardLedgerWriter
+from utils.enums import ChapterOutcome, RewardEndpoint
 from utils.settings import TAKE_CANDY_PATH, ADD_HISTORY_PATH
 from utils.network_utils import make_request
 
+TAKE_CANDY_DELAY = 3.0
+
 def take_candy(session: requests.Session, base_url: str, candy_token: str) -> Optional[Dict[str, Any]]:
     """
     Виконує запит для отримання цукерки, використовуючи наданий токен.
@@ -18,7 +22,7 @@ def take_candy(session: requests.Session, base_url: str, candy_token: str) -> Op
         session, 
         'POST', 
         url, 
-        delay=3.0,
+        delay=TAKE_CANDY_DELAY,
         data=payload, 
         headers_profile="ajax_post"
     )
@@ -28,14 +32,19 @@ def process_single_batch(
     session: requests.Session, 
     base_url: str, 
     chapters_batch: list[dict[str, Any]], 
-    delay: float = 180.0  # <--- ДОДАНО АРГУМЕНТ ТУТ
-) -> Dict[str, int]:
+    delay: float = 180.0,  # <--- ДОДАНО АРГУМЕНТ ТУТ
+    ledger: Optional[RewardLedgerWriter] = None
+) -> Dict[str, Any]:
     """
     Обробляє одну порцію глав: відправляє історію.
     Приймає динамічний delay.
-    Повертає словник: {'candies': int, 'cards': int}
+    Якщо передано `ledger`, результати /addHistory та /takeCandy записуються в журнал нагород.
+    Повертає словник: {'candies': int, 'cards': int, 'outcome': ChapterOutcome}
     """
     url = f"{base_url}{ADD_HISTORY_PATH}"
+    # Порції з БД не перетинають межі манги, тож беремо ID манги з першої глави
+    manga_id = chapters_batch[0].get("manga_id") if chapters_batch else None
+    chapter_ids = [item.get("chapter_id") for item in chapters_batch]
     
     payload: dict[str, Any] = {}
     for i, item in enumerate(chapters_batch):
@@ -52,34 +61,60 @@ def process_single_batch(
         headers_profile="ajax_post"
     )
     
-    result = {'candies': 0, 'cards': 0}
+    result: Dict[str, Any] = {'candies': 0, 'cards': 0, 'outcome': ChapterOutcome.ERROR}
+    card_id: Optional[str] = None
+    card_name: Optional[str] = None
 
     if not history_response or not isinstance(history_response, dict):
         logging.error("Не отримано валідної відповіді від сервера /addHistory.")
-        return result
 
     # 1. Перевірка на ЦУКЕРКУ
-    candy_token = history_response.get("token")
-    if candy_token:
-        # Забираємо цукерку
-        take_candy(session, base_url, candy_token)
-        
+    elif candy_token := history_response.get("token"):
         candy_type = history_response.get("type")
         if candy_type == "pumpkin":
             result['candies'] = 3
-            logging.info(f"✅ УСПІХ! Знайдено гарбуз! +3.")
+            result['outcome'] = ChapterOutcome.PUMPKIN
         else:
             result['candies'] = 1
+            result['outcome'] = ChapterOutcome.CANDY
+
+        # Забираємо цукерку
+        candy_response = take_candy(session, base_url, candy_token)
+        if ledger:
+            ledger.record(
+                RewardEndpoint.TAKE_CANDY,
+                result['outcome'] if candy_response else ChapterOutcome.ERROR,
+                manga_id=manga_id,
+                chapter_ids=chapter_ids,
+                delay=TAKE_CANDY_DELAY,
+            )
+
+        if candy_type == "pumpkin":
+            logging.info(f"✅ УСПІХ! Знайдено гарбуз! +3.")
+        else:
             logging.info(f"✅ УСПІХ! Взято нову цукерку. +1.")
-            
-        return result
 
     # 2. Перевірка на КАРТКУ
     # Перевіряємо наявність ID та Name, щоб точно знати, що це картка
-    if 'id' in history_response and 'name' in history_response:
+    elif 'id' in history_response and 'name' in history_response:
+        card_id = str(history_response.get('id'))
         card_name = history_response.get('name')
-        logging.info(f"🃏 ЗНАЙДЕНО КАРТКУ: '{card_name}' (ID: {history_response.get('id')})")
+        logging.info(f"🃏 ЗНАЙДЕНО КАРТКУ: '{card_name}' (ID: {card_id})")
         result['cards'] = 1
-        return result
+        result['outcome'] = ChapterOutcome.CARD
+
+    else:
+        result['outcome'] = ChapterOutcome.EMPTY
+
+    if ledger:
+        ledger.record(
+            RewardEndpoint.ADD_HISTORY,
+            result['outcome'],
+            manga_id=manga_id,
+            chapter_ids=chapter_ids,
+            delay=delay,
+            card_id=card_id,
+            card_name=card_name,
+        )
 
     return result
@@ -58,6 +58,25 @@ def login_and_get_updated_config(config: Dict[str, Any], auth_data: Dict[str, st
     save_json_data(config, CONFIG_FILE)
     return config
 
+def relogin_session(config: Dict[str, Any], session: requests.Session) -> bool:
+    """
+    Повторний вхід посеред роботи (сесія сайту сплила): оновлює cookies у
+    конфігу та в робочій сесії. Використовує лише дані входу з конфігу.
+    """
+    auth_data = config.get("auth_data")
+    if not auth_data or not auth_data.get("email") or not auth_data.get("password"):
+        logging.error("Немає даних для повторного входу в конфігурації.")
+        return False
+
+    updated_config = login_and_get_updated_config(config, auth_data)
+    if not updated_config:
+        return False
+
+    session.cookies.clear()
+    session.cookies.update(updated_config["cookies"])
+    logging.info("✅ Повторний вхід виконано.")
+    return True
+
 def get_auth_credentials(config: Dict[str, Any]) -> Optional[Dict[str, str]]:
     """Отримує дані для входу з конфігурації або від користувача."""
     auth_data = config.get("auth_data")
@@ -4,157 +4,183 @@
 Модуль скрейпера для збору даних про манхви та їхні глави з сайту.
 """
 
+import hashlib
 import logging
-from typing import Dict, List, Optional, Tuple
-from urllib.parse import urlparse
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Mapping, Optional, Sequence, Set, Tuple
 
 import requests
-from bs4 import BeautifulSoup, Tag
 from tqdm import tqdm
 
-from utils.settings import BASE_URL, PARAMS
-from utils.network_utils import make_request
+from utils.enums import CachedResponse, CrawlReport, CrawlStatus, PageKind, RawBody
+from utils.settings import (
+    BASE_URL, PARAMS, SCRAPER_WORKERS, SCRAPER_SAVE_BATCH, SCRAPER_QUEUE_SIZE,
+    CRAWL_PAGES_PER_RUN, CRAWL_PAGE_WORKERS, CRAWL_REVISIT_AFTER, HTTP_CACHE_ENABLED,
+    SCRAPER_INCREMENTAL, SCRAPER_KNOWN_CHAPTERS, PARSE_PROCESSES, PAGE_ARCHIVE_ENABLED
+)
+from utils.time import get_current_timestamp
+from utils.http_cache import HTTP_CACHE
+from utils.page_archive import PAGE_ARCHIVE
+from utils.network_utils import make_conditional_request
 from db.manager import DBManager
-from db.manga_service import save_manga_data_incrementally, get_mangas_stats
+from db.crawl_service import get_filter_hash, load_crawl_frontier, save_crawl_page
+from db.manga_service import (
+    save_manga_data_incrementally, get_mangas_stats, get_latest_chapter_ids, get_tracked_mangas
+)
 from .data_models import MangaData, ChapterData
+from .parsers import get_parser_backend
+from .parse_pool import ParsePool, chapters_from_rows
+
+# Умовні запити сторінок (ETag/Last-Modified); None - без кешу
+SCRAPER_HTTP_CACHE = HTTP_CACHE if HTTP_CACHE_ENABLED else None
+# Архів сирих сторінок для повторного парсингу (application/backfill.py); None - без архіву
+SCRAPER_PAGE_ARCHIVE = PAGE_ARCHIVE if PAGE_ARCHIVE_ENABLED else None
+# Парсинг в окремих процесах; None - у потоках скрейпера
+SCRAPER_PARSE_POOL = ParsePool(PARSE_PROCESSES) if PARSE_PROCESSES > 0 else None
 
 # ==============================================================================
-# 1. ДОПОМІЖНІ ФУНКЦІЇ ПАРСИНГУ (HELPERS)
+# 1. ПАРСИНГ (див. mangabuff/parsers.py)
 # ==============================================================================
 
-def _parse_single_manga_item(item: Tag) -> Optional[MangaData]:
-    """Парсить дані однієї манхви з HTML-тегу <a>."""
-    if not (data_id := item.get("data-id")) or not (url := item.get("href")):
-        return None
-    
-    try:
-        img_tag = item.select_one(".cards__img")
-        img_url = ""
-        if img_tag and 'style' in img_tag.attrs and "url(" in (style_attr := img_tag["style"]):
-            img_url = style_attr.split("url(")[1].split(")")[0].strip("'\"")
-
-        return {
-            "id": str(data_id),
-            "url": url,
-            "name": item.select_one(".cards__name").text.strip(),
-            "rating": item.select_one(".cards__rating").text.strip(),
-            "info": item.select_one(".cards__info").text.strip(),
-            "image": img_url,
-            "chapters": []
-        }
-    except AttributeError as e:
-        logging.warning(f"Не вдалося розпарсити елемент манхви (id: {data_id}): {e}")
-        return None
-
-def _parse_vol_chap_from_url(url: str) -> Tuple[Optional[int], Optional[int]]:
-    """Витягує номер тому та глави з URL."""
-    try:
-        path_parts = urlparse(url).path.strip("/").split("/")
-        # Припускаємо, що структура /.../volume/chapter
-        return int(path_parts[-2]), int(path_parts[-1])
-    except (ValueError, IndexError):
-        logging.debug(f"Не вдалося визначити том/главу з URL: {url}")
-        return None, None
-
-def _parse_single_chapter_item(item: Tag) -> Optional[ChapterData]:
-    """Парсить дані однієї глави з HTML-тегу <a>."""
-    if not (href := item.get("href")):
-        return None
+def parse_manga_list(html: str, raw: Optional[RawBody] = None) -> Dict[str, MangaData]:
+    """
+    Парсить список манхв з HTML-коду головної сторінки (у пулі процесів, якщо
+    він є; тоді туди йдуть байти відповіді `raw`, якщо їх передано).
+    """
+    if SCRAPER_PARSE_POOL is not None:
+        return SCRAPER_PARSE_POOL.parse_manga_list(raw or html)
+    return get_parser_backend().parse_manga_list(html)
 
-    like_button = item.select_one("button.favourite-send-btn[data-id]")
-    if not like_button or not (chapter_data_id := like_button.get("data-id")):
-        return None
-        
-    volume, chapter = _parse_vol_chap_from_url(href)
-    
-    date_tag = item.select_one(".chapters__add-date")
-    date = item.get("data-chapter-date") or (date_tag.get_text(strip=True) if date_tag else None)
-    
-    return {
-        "data_id": chapter_data_id,
-        "url": href,
-        "volume": volume, 
-        "chapter": chapter, 
-        "date": date, 
-    }
+def parse_chapters_from_html(*fragments: str) -> List[ChapterData]:
+    """
+    Парсить список глав з HTML-фрагментів (сторінка манхви, відповідь
+    /chapters/load) у їх порядку. Кожен фрагмент розбирається окремо,
+    без склеювання рядків. З пулом процесів виклик лише чекає на результат,
+    тож паралельні виклики з різних потоків займають різні ядра.
+    """
+    if SCRAPER_PARSE_POOL is not None:
+        return SCRAPER_PARSE_POOL.parse_chapters(*fragments)
+    backend = get_parser_backend()
+    chapters: List[ChapterData] = []
+    for html in fragments:
+        if html:
+            chapters.extend(backend.parse_chapters(html))
+    return chapters
 
 # ==============================================================================
-# 2. ОСНОВНІ ФУНКЦІЇ ПАРСИНГУ ТА ЗАВАНТАЖЕННЯ
+# 2. ЗАВАНТАЖЕННЯ
 # ==============================================================================
 
-def parse_manga_list(html: str) -> Dict[str, MangaData]:
-    """Парсить список манхв з HTML-коду головної сторінки."""
-    soup = BeautifulSoup(html, "html.parser")
-    items = soup.select("a.cards__item")
-    
-    mangas: Dict[str, MangaData] = {}
-    for item in items:
-        if isinstance(item, Tag) and (manga_data := _parse_single_manga_item(item)):
-            mangas[manga_data["id"]] = manga_data
-            
-    return mangas
-
-def parse_chapters_from_html(html: str) -> List[ChapterData]:
-    """Парсить список глав з наданого HTML-коду."""
-    soup = BeautifulSoup(html, "html.parser")
-    chapters: List[ChapterData] = []
-    
-    for item in soup.select("a.chapters__item"):
-        if isinstance(item, Tag) and (chapter_data := _parse_single_chapter_item(item)):
-            chapters.append(chapter_data)
-    
-    return chapters
+def _archive_page(kind: PageKind, url: str, body: str, manga_id: Optional[str] = None):
+    """Зберігає сиру відповідь в архів сторінок, якщо він увімкнений."""
+    if SCRAPER_PAGE_ARCHIVE is not None and body:
+        SCRAPER_PAGE_ARCHIVE.append(kind, url, body, manga_id)
+
+def _known_chapter_offset(html: str, known_chapter_ids: Sequence[str]) -> Optional[int]:
+    """
+    Позиція початку тегу першої (в HTML) вже збереженої глави з `known_chapter_ids`
+    або None. Пошук по сирому тексту, без парсингу.
+    """
+    offset: Optional[int] = None
+    for data_id in known_chapter_ids:
+        marker = f'data-id="{data_id}"'
+        pos = html.find(marker)
+        while pos != -1:
+            # data-id має належати кнопці всередині елемента глави
+            item_pos = html.rfind("chapters__item", 0, pos)
+            if item_pos != -1 and "</a>" not in html[item_pos:pos]:
+                tag_start = html.rfind("<", 0, item_pos)
+                offset = tag_start if offset is None else min(offset, tag_start)
+                break
+            pos = html.find(marker, pos + len(marker))
+    return offset
 
-def fetch_chapters_for_manga(session: requests.Session, manga: MangaData, delay: float) -> List[ChapterData]:
-    """Завантажує та парсить всі глави для однієї манхви."""
+def _new_chapters_fragment(html: str, known_chapter_ids: Sequence[str]) -> Tuple[str, bool]:
+    """
+    Частина HTML з главами, новішими за збережені (глави на сайті йдуть від
+    найновішої). Повертає (фрагмент, чи досягнуто збережених глав); якщо
+    збережених глав не знайдено, повертається весь HTML.
+    """
+    offset = _known_chapter_offset(html, known_chapter_ids) if known_chapter_ids else None
+    if offset is None:
+        return html, False
+    first_item = html.find("chapters__item")
+    start = html.rfind("<", 0, first_item) if first_item != -1 else offset
+    return html[min(start, offset):offset], True
+
+def fetch_manga_chapter_pages(
+    session: requests.Session,
+    manga: MangaData,
+    delay: Optional[float],
+    known_chapter_ids: Sequence[str] = ()
+) -> Optional[Tuple[str, str, bool, Tuple[Optional[RawBody], Optional[RawBody]]]]:
+    """
+    Завантажує сирий HTML глав манхви: сторінку манхви та відповідь /chapters/load.
+    `delay` - мінімальний інтервал між запитами до кожного з ендпоінтів (див. RateLimiter).
+    Повертає (page_html, more_chapters_html, unchanged, raw) або None, якщо сторінку
+    чи потрібну відповідь /chapters/load не завантажено. unchanged=True - обидві відповіді такі ж, як у HTTP-кеші.
+    raw - байти кожної з відповідей для пулу парсингу, якщо її HTML
+    використано повністю (None - вміст з кешу або обрізаний фрагмент).
+
+    Інкрементальний режим (`known_chapter_ids` - data_id найновіших збережених
+    глав): HTML обрізається до глав, новіших за збережені, а /chapters/load не
+    запитується, якщо збережені глави є вже на сторінці манхви.
+    """
     # 1. Отримуємо глави, видимі на сторінці манхви
-    page_html = make_request(session, 'GET', manga['url'], delay=delay)
-    if not isinstance(page_html, str):
+    page = make_conditional_request(session, 'GET', manga['url'], SCRAPER_HTTP_CACHE, delay=delay)
+    if page is None or not isinstance(page.content, str):
         logging.error(f"Не вдалося завантажити сторінку для манхви '{manga['name']}'.")
-        return []
+        return None
+
+    _archive_page(PageKind.MANGA, manga['url'], page.content, manga['id'])
+    page_html, reached_known = _new_chapters_fragment(page.content, known_chapter_ids)
+    page_raw = page.raw if page_html is page.content else None
+    if reached_known:
+        logging.debug(f"'{manga['name']}': збережені глави вже на сторінці, /chapters/load пропущено.")
+        return page_html, "", page.unchanged, (page_raw, None)
 
     # 2. Робимо POST-запит, щоб завантажити решту глав
     load_more_url = f"{BASE_URL}/chapters/load"
     post_data = {"manga_id": manga['id']}
-    more_chapters_response = make_request(session, 'POST', load_more_url, delay=delay, data=post_data)
-    
-    more_chapters_html = ""
-    if isinstance(more_chapters_response, dict) and "content" in more_chapters_response:
-        more_chapters_html = more_chapters_response["content"]
-    
-    # 3. Об'єднуємо HTML і парсимо все разом
-    full_html = page_html + more_chapters_html
-    return parse_chapters_from_html(full_html)
+    more_chapters = make_conditional_request(session, 'POST', load_more_url, SCRAPER_HTTP_CACHE, delay=delay, data=post_data)
+    if more_chapters is None or not isinstance(more_chapters.content, dict) or "content" not in more_chapters.content:
+        # Без старших глав не зберігаємо й новіші зі сторінки: інкрементальний
+        # пошук зупиниться на них, і старші глави вже ніколи не завантажаться
+        logging.error(f"Не вдалося завантажити решту глав (/chapters/load) для манхви '{manga['name']}'.")
+        return None
+
+    _archive_page(PageKind.CHAPTERS, load_more_url, more_chapters.content["content"], manga['id'])
+    more_chapters_html, _ = _new_chapters_fragment(more_chapters.content["content"], known_chapter_ids)
+    more_raw: Optional[RawBody] = None
+    if more_chapters.raw is not None and more_chapters_html is more_chapters.content["content"]:
+        more_raw = more_chapters.raw._replace(html_field="content")
+    unchanged = page.unchanged and more_chapters.unchanged
+    return page_html, more_chapters_html, unchanged, (page_raw, more_raw)
 
 # ==============================================================================
 # 3. КЕРУЮЧІ ФУНКЦІЇ (ORCHESTRATORS)
 # ==============================================================================
 
-def fetch_manga_list_page(session: requests.Session, page_num: int) -> Optional[str]:
-    """Завантажує HTML-код сторінки зі списком манг."""
+def _fetch_manga_list_response(session: requests.Session, page_num: int, params: Optional[Dict[str, str]]) -> Optional[CachedResponse]:
+    """Умовний запит сторінки зі списком манг; None, якщо HTML не отримано."""
     url_to_scrape = f"{BASE_URL}/manga?page={page_num}"
     logging.info(f"Завантаження списку манг з: {url_to_scrape}")
     
-    main_page_html = make_request(session, 'GET', url_to_scrape, delay=0, params=PARAMS)
-    if not isinstance(main_page_html, str):
+    params = PARAMS if params is None else params
+    response = make_conditional_request(session, 'GET', url_to_scrape, SCRAPER_HTTP_CACHE, delay=0, params=params)
+    if response is None or not isinstance(response.content, str):
         logging.error("Не вдалося завантажити головну сторінку. Скрейпінг зупинено.")
         return None
-    return main_page_html
-
-def enrich_manga_with_chapters(session: requests.Session, mangas: Dict[str, MangaData], delay: float):
-    """Послідовно завантажує глави для кожної манхви та додає їх до словника."""
-    logging.info(f"Починаємо завантаження глав для {len(mangas)} манг...")
-
-    for manga_id, manga_data in tqdm(mangas.items(), desc="Завантаження глав манг"):
-        try:
-            chapters = fetch_chapters_for_manga(session, manga_data, delay)
-            if chapters:
-                manga_data["chapters"] = chapters
-            else:
-                logging.warning(f"Для '{manga_data['name']}' не знайдено жодної глави.")
-        except Exception as e:
-            # Загальний Exception, щоб скрипт не падав при помилці на одній манзі
-            logging.error(f"Критична помилка при завантаженні глав для {manga_id}: {e}", exc_info=True)
+    _archive_page(PageKind.LIST, requests.Request('GET', url_to_scrape, params=params).prepare().url, response.content)
+    return response
+
+def fetch_manga_list_page(session: requests.Session, page_num: int, params: Optional[Dict[str, str]] = None) -> Optional[str]:
+    """Завантажує HTML-код сторінки зі списком манг (фільтр `params`, за замовчуванням PARAMS)."""
+    response = _fetch_manga_list_response(session, page_num, params)
+    return response.content if response else None
 
 def save_data_to_db(db: DBManager, data: Dict[str, MangaData]) -> Tuple[int, int]:
     """Зберігає зібрані дані в базу даних."""
@@ -166,35 +192,426 @@ def display_db_stats(db: DBManager):
     logging.info("\n" + "="*50 + "\nСТАТИСТИКА ПО МАНХВАМ:\n" + "="*50)
     stats = get_mangas_stats(db) 
     for stat in stats:
-        logging.info(f"- {stat['name']}: всього {stat['total_chapters']} глав.")
+        latest = ""
+        if stat['latest_chapter'] is not None:
+            latest = f" (остання: том {stat['latest_volume']}, глава {stat['latest_chapter']})"
+        logging.info(f"- {stat['name']}: всього {stat['total_chapters']} глав{latest}.")
     logging.info("="*50)
 
-def run_scraper(session: requests.Session, db: DBManager, page_num: int = 1, limit: Optional[int] = None, delay: float = 3, stats: bool = False):
+def run_scraper(
+    session: requests.Session,
+    db: DBManager,
+    page_num: int = 1,
+    limit: Optional[int] = None,
+    delay: float = 3,
+    stats: bool = False,
+    workers: int = SCRAPER_WORKERS
+):
     """
-    Головна функція, що керує повним циклом роботи скрейпера.
+    Головна функція, що керує повним циклом роботи скрейпера для однієї
+    сторінки каталогу (без фронтиру, див. `crawl_catalog`).
     """
     # 1. Отримуємо список манг зі сторінки
-    main_page_html = fetch_manga_list_page(session, page_num)
-    if not main_page_html:
+    response = _fetch_manga_list_response(session, page_num, None)
+    if response is None:
         return
 
-    mangas = parse_manga_list(main_page_html)
+    mangas = parse_manga_list(response.content, response.raw)
     
     # 2. Застосовуємо ліміт, якщо він встановлений
     if limit:
         mangas = {k: v for i, (k, v) in enumerate(mangas.items()) if i < limit}
     
-    # 3. Збагачуємо дані главами
-    if mangas:
-        enrich_manga_with_chapters(session, mangas, delay)
-    else:
+    if not mangas:
         logging.warning("На сторінці не знайдено жодної манхви. Подальша обробка неможлива.")
         return
 
-    # 4. Зберігаємо дані в БД
-    added_mangas, added_chapters = save_data_to_db(db, mangas)
+    # 3-4. Завантажуємо глави та зберігаємо в БД конвеєром
+    added_mangas, added_chapters, _ = run_scrape_pipeline(session, db, mangas, delay, workers)
     logging.info(f"Збереження завершено. Додано нових манг: {added_mangas}, нових глав: {added_chapters}.")
     
     # 5. Виводимо статистику, якщо потрібно
     if stats:
         display_db_stats(db)
+
+# ==============================================================================
+# 4. ПАЙПЛАЙН: ЗАВАНТАЖЕННЯ -> ПАРСИНГ -> ЗАПИС
+# ==============================================================================
+
+_PIPELINE_DONE = object() # Маркер завершення стадії
+
+def _pipeline_fetcher(
+    session: requests.Session,
+    tasks: "queue.SimpleQueue[Any]",
+    raw_queue: "queue.Queue[Any]",
+    delay: Optional[float],
+    known_chapters: Mapping[str, Sequence[str]]
+):
+    """
+    Стадія завантаження: сирий HTML глав кожної манги -> raw_queue.
+    `known_chapters` - найновіші збережені глави (інкрементальний режим).
+    """
+    try:
+        while (task := tasks.get()) is not _PIPELINE_DONE:
+            manga_id, manga_data = task
+            try:
+                pages = fetch_manga_chapter_pages(session, manga_data, delay, known_chapters.get(manga_id, ()))
+            except Exception as e:
+                logging.error(f"Критична помилка при завантаженні глав для {manga_id}: {e}", exc_info=True)
+                pages = None
+            raw_queue.put((manga_id, manga_data, pages))
+    finally:
+        raw_queue.put(_PIPELINE_DONE)
+
+def _pipeline_parser(
+    raw_queue: "queue.Queue[Any]",
+    parsed_queue: "queue.Queue[Any]",
+    fetchers: int,
+    stored_ids: Set[str],
+    parse_pool: Optional[ParsePool] = None
+):
+    """
+    Стадія парсингу: HTML -> (ID, манга з главами, чи не вдалося отримати
+    глави) -> parsed_queue. HTML далі не зберігається. Незмінені (за HTTP-кешем)
+    сторінки манг з `stored_ids`, чиї глави вже в БД, не парсяться.
+
+    З `parse_pool` сторінки лише відправляються в пул процесів: потік не чекає
+    на парсинг і одразу бере наступну сторінку. Готові результати передаються
+    далі в порядку відправки; не більше 2 * processes сторінок одночасно в пулі.
+    """
+    finished = 0
+    pending: Deque[Tuple[str, MangaData, "Future[Any]"]] = deque()
+
+    def _emit(manga_id: str, manga_data: MangaData, chapters: List[ChapterData], failed: bool = False):
+        if not chapters and not failed and manga_id not in stored_ids:
+            logging.warning(f"Для '{manga_data['name']}' не знайдено жодної глави.")
+        parsed_queue.put((manga_id, {**manga_data, "chapters": chapters}, failed))
+
+    def _collect(limit: int):
+        """Передає далі готові результати пулу; чекає на найстаріші, доки в пулі більше `limit` сторінок."""
+        while pending and (len(pending) > limit or pending[0][2].done()):
+            manga_id, manga_data, future = pending.popleft()
+            chapters: List[ChapterData] = []
+            failed = False
+            try:
+                chapters = chapters_from_rows(future.result())
+            except Exception as e:
+                logging.error(f"Помилка парсингу глав для {manga_id}: {e}", exc_info=True)
+                failed = True
+            _emit(manga_id, manga_data, chapters, failed)
+
+    try:
+        while finished < fetchers:
+            try:
+                # Поки пул працює, не блокуємось надовго: готові результати йдуть далі
+                item = raw_queue.get(timeout=0.1 if pending else None)
+            except queue.Empty:
+                _collect(len(pending))
+                continue
+            if item is _PIPELINE_DONE:
+                finished += 1
+                continue
+
+            manga_id, manga_data, pages = item
+            chapters: List[ChapterData] = []
+            failed = pages is None
+            if pages is not None and pages[2] and manga_id in stored_ids:
+                logging.debug(f"Глави '{manga_data['name']}' не змінились. Парсинг пропущено.")
+                parsed_queue.put((manga_id, {**manga_data, "chapters": chapters}, False))
+                continue
+            if pages is not None:
+                try:
+                    page_html, more_chapters_html, _, (page_raw, more_raw) = pages
+                    if parse_pool is not None and (page_html or more_chapters_html):
+                        # Повні відповіді - байтами з мережі, обрізані фрагменти - рядками
+                        future = parse_pool.submit_chapters(
+                            (page_raw or page_html) if page_html else "",
+                            (more_raw or more_chapters_html) if more_chapters_html else ""
+                        )
+                        pending.append((manga_id, manga_data, future))
+                        _collect(2 * parse_pool.processes)
+                        continue
+                    if page_html or more_chapters_html:
+                        chapters = parse_chapters_from_html(page_html, more_chapters_html)
+                except Exception as e:
+                    logging.error(f"Помилка парсингу глав для {manga_id}: {e}", exc_info=True)
+                    failed = True
+            _emit(manga_id, manga_data, chapters, failed)
+        _collect(0)
+    finally:
+        parsed_queue.put(_PIPELINE_DONE)
+
+def run_scrape_pipeline(
+    session: requests.Session,
+    db: DBManager,
+    mangas: Dict[str, MangaData],
+    delay: float,
+    workers: int = SCRAPER_WORKERS,
+    save_batch: int = SCRAPER_SAVE_BATCH,
+    queue_size: int = SCRAPER_QUEUE_SIZE,
+    incremental: bool = SCRAPER_INCREMENTAL
+) -> Tuple[int, int, List[str]]:
+    """
+    Конвеєр скрейпера: `workers` потоків завантаження -> потік парсингу ->
+    запис у БД порціями по `save_batch` манг (у поточному потоці).
+
+    Стадії з'єднані обмеженими чергами (`queue_size`): якщо запис чи парсинг
+    не встигає, завантаження чекає. Манги зберігаються одразу після парсингу,
+    тож збій наприкінці сторінки не губить уже оброблене, а в пам'яті
+    одночасно лише кілька сторінок HTML.
+
+    Самі манги (без глав) записуються першими, в порядку сторінки, - так їхні
+    db_id такі ж, як при послідовному збереженні, незалежно від порядку
+    завершення завантажень.
+
+    З PARSE_PROCESSES > 0 парсинг іде в пулі процесів (SCRAPER_PARSE_POOL),
+    паралельно із завантаженням наступних сторінок.
+
+    Сторінки, що не змінились з попереднього обходу (HTTP-кеш), не парсяться,
+    якщо глави манги вже є в БД. В інкрементальному режимі (`incremental`)
+    для манг із главами в БД парситься лише HTML новіших глав, а /chapters/load
+    не запитується, якщо сторінка манги вже доходить до збережених глав.
+
+    Returns:
+        Кортеж (new_mangas_added, new_chapters_added, failed_ids) - failed_ids:
+        манги, глави яких не вдалося завантажити чи розібрати (записано без них).
+    """
+    added_mangas, added_chapters = save_data_to_db(
+        db, {manga_id: {**manga_data, "chapters": []} for manga_id, manga_data in mangas.items()}
+    )
+    known_chapters = get_latest_chapter_ids(db, mangas, SCRAPER_KNOWN_CHAPTERS)
+    stored_ids = set(known_chapters)
+    if not incremental:
+        known_chapters = {}
+
+    fetchers = max(1, min(workers, len(mangas)))
+    tasks: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+    for item in mangas.items():
+        tasks.put(item)
+    for _ in range(fetchers):
+        tasks.put(_PIPELINE_DONE)
+    raw_queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+    parsed_queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+
+    # Паралельно темп задає лише спільний бюджет RATE_LIMITER, а не інтервал `delay`
+    fetch_delay = delay if fetchers == 1 else None
+    threads = [
+        threading.Thread(
+            target=_pipeline_fetcher, args=(session, tasks, raw_queue, fetch_delay, known_chapters),
+            name=f"scrape-fetch-{i}", daemon=True
+        )
+        for i in range(fetchers)
+    ]
+    threads.append(threading.Thread(
+        target=_pipeline_parser, args=(raw_queue, parsed_queue, fetchers, stored_ids, SCRAPER_PARSE_POOL),
+        name="scrape-parse", daemon=True
+    ))
+    for thread in threads:
+        thread.start()
+
+    batch: Dict[str, MangaData] = {}
+    failed_ids: List[str] = []
+
+    def _flush():
+        nonlocal added_mangas, added_chapters
+        if batch:
+            new_mangas, new_chapters = save_data_to_db(db, batch)
+            added_mangas += new_mangas
+            added_chapters += new_chapters
+            batch.clear()
+
+    with tqdm(total=len(mangas), desc="Завантаження глав манг") as progress:
+        while (item := parsed_queue.get()) is not _PIPELINE_DONE:
+            manga_id, manga_data, failed = item
+            batch[manga_id] = manga_data
+            if failed:
+                failed_ids.append(manga_id)
+            progress.update()
+            if len(batch) >= save_batch:
+                _flush()
+        _flush()
+
+    for thread in threads:
+        thread.join()
+    if failed_ids:
+        logging.warning(f"Глави не отримано для {len(failed_ids)} манг: {', '.join(failed_ids)}.")
+    return added_mangas, added_chapters, failed_ids
+
+def refresh_tracked_mangas(
+    session: requests.Session,
+    db: DBManager,
+    delay: float = 3,
+    workers: int = SCRAPER_WORKERS,
+    limit: Optional[int] = None
+) -> Tuple[int, int]:
+    """
+    Шукає нові глави манг, що вже є в БД (перші `limit` за db_id), конвеєром
+    в інкрементальному режимі: зазвичай один запит сторінки манги на мангу.
+
+    Returns:
+        Кортеж (new_mangas_added, new_chapters_added).
+    """
+    mangas = get_tracked_mangas(db, limit)
+    if not mangas:
+        logging.warning("У БД немає манг для оновлення.")
+        return 0, 0
+
+    logging.info(f"Оновлення глав для {len(mangas)} манг з БД...")
+    added_mangas, added_chapters, _ = run_scrape_pipeline(session, db, mangas, delay, workers, incremental=True)
+    logging.info(f"Оновлення завершено. Нових глав: {added_chapters}.")
+    return added_mangas, added_chapters
+
+# ==============================================================================
+# 5. ОБХІД КАТАЛОГУ З ФРОНТИРОМ
+# ==============================================================================
+
+def _page_content_hash(mangas: Dict[str, MangaData]) -> str:
+    """Хеш вмісту сторінки списку: порядок манг та їхні картки (без HTML, що змінюється між запитами)."""
+    digest = hashlib.sha1()
+    for manga in mangas.values():
+        digest.update("\x1f".join((manga["id"], manga["url"], manga["name"], manga["rating"], manga["info"])).encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.hexdigest()
+
+def _crawl_page(
+    session: requests.Session,
+    db: DBManager,
+    params: Dict[str, str],
+    filter_hash: str,
+    page_num: int,
+    previous: Optional[Any],
+    delay: float,
+    workers: int
+) -> Tuple[CrawlStatus, bool, int, int]:
+    """
+    Обробляє одну сторінку каталогу і записує її стан у фронтир.
+
+    Returns:
+        Кортеж (статус, чи пропущено як незмінену, нових манг, нових глав).
+    """
+    save_crawl_page(db, filter_hash, page_num, CrawlStatus.IN_PROGRESS)
+    try:
+        response = _fetch_manga_list_response(session, page_num, params)
+        if response is None:
+            save_crawl_page(db, filter_hash, page_num, CrawlStatus.FAILED, error="list page request failed")
+            return CrawlStatus.FAILED, False, 0, 0
+
+        if response.unchanged and previous and previous.status == CrawlStatus.DONE.value:
+            # Відповідь як у HTTP-кеші - навіть парсити не потрібно
+            logging.info(f"Сторінка {page_num} не змінилась (HTTP-кеш). Пропускаю.")
+            save_crawl_page(db, filter_hash, page_num, CrawlStatus.DONE)
+            return CrawlStatus.DONE, True, 0, 0
+
+        mangas = parse_manga_list(response.content, response.raw)
+        if not mangas:
+            save_crawl_page(db, filter_hash, page_num, CrawlStatus.EMPTY, item_ids=[])
+            return CrawlStatus.EMPTY, False, 0, 0
+
+        content_hash = _page_content_hash(mangas)
+        if previous and previous.status == CrawlStatus.DONE.value and previous.content_hash == content_hash:
+            logging.info(f"Сторінка {page_num} не змінилась з останнього обходу. Пропускаю.")
+            save_crawl_page(db, filter_hash, page_num, CrawlStatus.DONE, content_hash=content_hash)
+            return CrawlStatus.DONE, True, 0, 0
+
+        added_mangas, added_chapters, failed_ids = run_scrape_pipeline(session, db, mangas, delay, workers)
+        if failed_ids:
+            # Без хешу вмісту і не DONE: наступний обхід завантажить глави цих манг знову
+            save_crawl_page(
+                db, filter_hash, page_num, CrawlStatus.FAILED,
+                item_ids=list(mangas), error=f"chapters failed: {','.join(failed_ids)}"
+            )
+            return CrawlStatus.FAILED, False, added_mangas, added_chapters
+        save_crawl_page(
+            db, filter_hash, page_num, CrawlStatus.DONE,
+            item_ids=list(mangas), content_hash=content_hash
+        )
+        return CrawlStatus.DONE, False, added_mangas, added_chapters
+
+    except Exception as e:
+        logging.error(f"Помилка обходу сторінки {page_num}: {e}", exc_info=True)
+        save_crawl_page(db, filter_hash, page_num, CrawlStatus.FAILED, error=str(e))
+        return CrawlStatus.FAILED, False, 0, 0
+
+def crawl_catalog(
+    session: requests.Session,
+    db: DBManager,
+    params: Optional[Dict[str, str]] = None,
+    first_page: int = 1,
+    max_pages: int = CRAWL_PAGES_PER_RUN,
+    last_page: Optional[int] = None,
+    delay: float = 3,
+    workers: int = SCRAPER_WORKERS,
+    page_workers: int = CRAWL_PAGE_WORKERS,
+    revisit_after: float = CRAWL_REVISIT_AFTER
+) -> CrawlReport:
+    """
+    Обходить сторінки каталогу `first_page`..`last_page` для фільтра `params`
+    (за замовчуванням PARAMS), до `page_workers` сторінок одночасно. Манги
+    отримують db_id у порядку каталогу (на ньому тримаються order_num і
+    обхід за зміщенням) лише з `page_workers` = 1: паралельні сторінки
+    записують свої манги впереміш.
+
+    Стан кожної сторінки (статус, ID манг, хеш вмісту) зберігається у фронтирі,
+    тож повторний запуск продовжує з першої необробленої сторінки:
+    - сторінки, оброблені менш ніж `revisit_after` секунд тому, пропускаються без запиту;
+    - старіші завантажуються повторно, але глави збираються лише якщо вміст змінився;
+    - порожня сторінка означає кінець каталогу.
+    За один виклик обробляється не більше `max_pages` сторінок (пропущені не рахуються).
+    """
+    params = PARAMS if params is None else params
+    filter_hash = get_filter_hash(params)
+    frontier = load_crawl_frontier(db, filter_hash)
+    now = get_current_timestamp()
+
+    def _is_fresh(row: Optional[Any]) -> bool:
+        return (
+            row is not None
+            and row.status in (CrawlStatus.DONE.value, CrawlStatus.EMPTY.value)
+            and now - row.updated_at < revisit_after
+        )
+
+    processed = skipped = failed = added_mangas = added_chapters = 0
+    reached_end = False
+    page_num = first_page
+
+    with ThreadPoolExecutor(max_workers=max(1, page_workers), thread_name_prefix="crawl") as pool:
+        while not reached_end and processed < max_pages:
+            # Наступне вікно сторінок для паралельної обробки
+            window: List[int] = []
+            while len(window) < page_workers and processed + len(window) < max_pages:
+                if last_page is not None and page_num > last_page:
+                    break
+                row = frontier.get(page_num)
+                if _is_fresh(row):
+                    if row.status == CrawlStatus.EMPTY.value:
+                        reached_end = True
+                        break
+                    skipped += 1
+                else:
+                    window.append(page_num)
+                page_num += 1
+
+            if not window:
+                break
+
+            futures = [
+                pool.submit(_crawl_page, session, db, params, filter_hash, num, frontier.get(num), delay, workers)
+                for num in window
+            ]
+            for num, future in zip(window, futures):
+                status, unchanged, new_mangas, new_chapters = future.result()
+                processed += 1
+                skipped += int(unchanged)
+                failed += int(status == CrawlStatus.FAILED)
+                added_mangas += new_mangas
+                added_chapters += new_chapters
+                if status == CrawlStatus.EMPTY:
+                    logging.info(f"Сторінка {num} порожня - кінець каталогу.")
+                    reached_end = True
+
+    report = CrawlReport(processed, skipped, failed, added_mangas, added_chapters, reached_end)
+    logging.info(
+        f"Обхід каталогу: оброблено сторінок {processed}, пропущено {skipped}, з помилками {failed}; "
+        f"нових манг {added_mangas}, нових глав {added_chapters}."
+    )
+    return report
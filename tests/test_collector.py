@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+
+from application.collector import ResourceCollector
+from db.manager import DBManager
+from db.models import Chapter, Manga
+from utils.enums import ChapterOutcome, ChapterWalkMode
+
+
+class UnreadQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = DBManager(f"sqlite:///{os.path.join(self.tmp.name, 'test.db')}")
+        self.db.init_models()
+        with self.db.session() as session:
+            session.add(Manga(id="m1", url="/manga/m1", name="Манга"))
+            for number in range(1, 4):
+                session.add(Chapter(
+                    data_id=f"c{number}", manga_id="m1", volume=1, chapter_num=number, url=f"/manga/m1/1/{number}"
+                ))
+        self.collector = ResourceCollector(None, self.db, target_amount=1, walk_mode=ChapterWalkMode.UNREAD)
+
+    def tearDown(self):
+        self.collector.ledger.close()
+        self.db.engine.dispose()
+        self.tmp.cleanup()
+
+    def _next_batch(self):
+        batches = self.collector._open_batches()
+        try:
+            return next(batches, None)
+        finally:
+            batches.close()
+
+    def _send(self, outcome: ChapterOutcome):
+        batch = self._next_batch()
+        self.collector.cursor = batch["last_cursor"]
+        self.collector._start_batch(batch)
+        self.collector._finish_batch(batch, {"candies": 0, "cards": 0, "outcome": outcome})
+        return batch
+
+    def test_error_batch_is_offered_again(self):
+        failed = self._send(ChapterOutcome.ERROR)
+        self.assertEqual(self._next_batch()["chapter_db_ids"], failed["chapter_db_ids"])
+
+    def test_answered_batch_is_not_offered_again(self):
+        answered = self._send(ChapterOutcome.EMPTY)
+        self.assertNotEqual(self._next_batch()["chapter_db_ids"], answered["chapter_db_ids"])
+
+    def test_batch_sent_before_a_crash_is_not_resent(self):
+        batch = self._next_batch()
+        self.collector.cursor = batch["last_cursor"]
+        self.collector._start_batch(batch)
+        # Процес зупинився до _finish_batch
+        self.assertNotEqual(self._next_batch()["chapter_db_ids"], batch["chapter_db_ids"])
+        with self.db.session() as session:
+            outcomes = {row.outcome for row in session.query(Chapter).filter(Chapter.db_id.in_(batch["chapter_db_ids"]))}
+        self.assertEqual(outcomes, {ChapterOutcome.SENT.value})
+
+
+if __name__ == "__main__":
+    unittest.main()
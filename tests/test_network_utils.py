@@ -0,0 +1,63 @@
+import unittest
+from typing import List
+from unittest import mock
+
+import requests
+
+from utils import network_utils
+from utils.network_utils import CircuitBreaker, RateLimiter, make_request
+from utils.settings import ADD_HISTORY_PATH, BASE_URL
+
+
+class FakeSession(requests.Session):
+    """Сесія, що відповідає статусами з `statuses` по черзі (останній - для решти запитів)."""
+    def __init__(self, statuses: List[int], headers=None):
+        super().__init__()
+        self.config = {}
+        self.statuses = statuses
+        self.response_headers = headers or {}
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        response = requests.Response()
+        response.status_code = self.statuses[min(self.calls, len(self.statuses) - 1)]
+        response.url = url
+        response.headers.update({"Content-Type": "application/json", **self.response_headers})
+        response._content = b"{}"
+        self.calls += 1
+        return response
+
+
+class RewardRetryTest(unittest.TestCase):
+    def setUp(self):
+        for patcher in (
+            mock.patch.object(network_utils, "CIRCUIT_BREAKER", CircuitBreaker()),
+            mock.patch.object(network_utils.time, "sleep"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _request(self, session: FakeSession, method: str, path: str):
+        return make_request(session, method, f"{BASE_URL}{path}", data={}, rate_limiter=RateLimiter())
+
+    def test_add_history_post_is_not_retried_on_5xx(self):
+        for status in (500, 502, 503, 504):
+            session = FakeSession([status, 200])
+            self.assertIsNone(self._request(session, "POST", ADD_HISTORY_PATH))
+            self.assertEqual(session.calls, 1, status)
+
+    def test_add_history_post_is_retried_when_not_processed(self):
+        for statuses, headers in (([429, 200], {}), ([503, 200], {"Retry-After": "1"})):
+            session = FakeSession(statuses, headers)
+            self.assertEqual(self._request(session, "POST", ADD_HISTORY_PATH), {})
+            self.assertEqual(session.calls, 2, statuses)
+
+    def test_read_requests_are_retried_on_5xx(self):
+        for method, path in (("GET", "/manga/m1"), ("POST", "/chapters/load")):
+            session = FakeSession([502, 200])
+            self.assertEqual(self._request(session, method, path), {})
+            self.assertEqual(session.calls, 2, path)
+
+
+if __name__ == "__main__":
+    unittest.main()
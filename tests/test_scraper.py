@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from db.crawl_service import get_filter_hash, load_crawl_frontier
+from db.manager import DBManager
+from db.models import Chapter
+from mangabuff import scraper
+from utils.enums import CachedResponse, CrawlStatus
+from utils.settings import BASE_URL, PARAMS
+
+LIST_PAGE = (
+    '<html><body><div class="cards">'
+    '<a class="cards__item card" href="/manga/m1" data-id="1">'
+    '<div class="cards__name">Манга</div><div class="cards__rating"><span>9.1</span></div>'
+    '<div class="cards__info">Манхва, 2024</div></a>'
+    '</div></body></html>'
+)
+
+def _chapters_html(numbers) -> str:
+    return "".join(
+        f'<a class="chapters__item" href="/manga/m1/1/{n}"><div class="chapters__volume">Том 1</div>'
+        f'<div class="chapters__value">Глава {n}</div>'
+        f'<button class="favourite-send-btn chapters__like" data-id="1-1-{n}"></button></a>'
+        for n in numbers
+    )
+
+MANGA_PAGE = f'<html><body><div class="chapters">{_chapters_html(range(5, 2, -1))}</div></body></html>'
+LOAD_MORE = {"content": _chapters_html(range(2, 0, -1))}
+
+
+class FakeSite:
+    """Відповіді `make_conditional_request` для однієї сторінки каталогу з однією мангою."""
+    def __init__(self):
+        self.load_more_fails = False
+
+    def __call__(self, session, method, url, cache, delay=None, params=None, data=None):
+        if method == "POST":
+            return None if self.load_more_fails else CachedResponse(LOAD_MORE, False)
+        if url.startswith(f"{BASE_URL}/manga?page="):
+            return CachedResponse(LIST_PAGE if url.endswith("page=1") else "<html></html>", False)
+        return CachedResponse(MANGA_PAGE, False)
+
+
+class LoadMoreFailureTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = DBManager(f"sqlite:///{os.path.join(self.tmp.name, 'test.db')}")
+        self.db.init_models()
+        self.site = FakeSite()
+        for patcher in (
+            mock.patch.object(scraper, "make_conditional_request", self.site),
+            mock.patch.object(scraper, "SCRAPER_PAGE_ARCHIVE", None),
+            mock.patch.object(scraper, "SCRAPER_PARSE_POOL", None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.db.engine.dispose()
+        self.tmp.cleanup()
+
+    def _stored_chapters(self) -> int:
+        with self.db.session() as session:
+            return session.query(Chapter).count()
+
+    def test_failed_load_more_fails_the_manga(self):
+        self.site.load_more_fails = True
+        manga = {"id": "1", "url": f"{BASE_URL}/manga/m1", "name": "Манга"}
+        self.assertIsNone(scraper.fetch_manga_chapter_pages(None, manga, delay=0))
+
+    def test_page_with_failed_load_more_is_retried(self):
+        self.site.load_more_fails = True
+        report = scraper.crawl_catalog(None, self.db, max_pages=2, delay=0)
+        page = load_crawl_frontier(self.db, get_filter_hash(PARAMS))[1]
+        self.assertEqual(report.pages_failed, 1)
+        self.assertEqual(page.status, CrawlStatus.FAILED.value)
+        self.assertIsNone(page.content_hash)
+        # Новіші глави зі сторінки манги не зберігаються без старших
+        self.assertEqual(self._stored_chapters(), 0)
+
+        self.site.load_more_fails = False
+        report = scraper.crawl_catalog(None, self.db, max_pages=2, delay=0)
+        page = load_crawl_frontier(self.db, get_filter_hash(PARAMS))[1]
+        self.assertEqual(page.status, CrawlStatus.DONE.value)
+        self.assertEqual(report.chapters_added, 5)
+        self.assertEqual(self._stored_chapters(), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
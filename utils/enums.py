@@ -1,11 +1,75 @@
 from enum import Enum
-from typing import NamedTuple
+from typing import Any, Dict, NamedTuple, Optional, Union
 
 
 class CollectMode(Enum):
     CANDY = "candy"
     CARD = "card"
 
+class ChapterWalkMode(Enum):
+    OFFSET = "offset"   # Старий режим: позиція "номер_манги.зміщення_глави"
+    KEYSET = "keyset"   # Пошук за ключем (manga db_id, том, глава, db_id глави)
+    UNREAD = "unread"   # Як KEYSET, але лише глави, які ще не надсилались
+
+class ChapterOutcome(Enum):
+    EMPTY = "empty"     # Історію надіслано, нагороди немає
+    CANDY = "candy"
+    PUMPKIN = "pumpkin"
+    CARD = "card"
+    ERROR = "error"     # Сервер не повернув валідної відповіді - глави повертаються в чергу
+    SENT = "sent"       # Запит надіслано, результат ще не записано (чи процес зупинився до запису)
+    LEGACY = "legacy"   # Оброблено до появи статусів (перенесено зі старого курсора)
+
+class RewardEndpoint(Enum):
+    ADD_HISTORY = "addHistory"
+    TAKE_CANDY = "takeCandy"
+
+class CrawlStatus(Enum):
+    IN_PROGRESS = "in_progress" # Обробка почалась (після збою сторінка обробляється знову)
+    DONE = "done"
+    FAILED = "failed"
+    EMPTY = "empty"             # Сторінка без манг - кінець каталогу
+
+class CrawlReport(NamedTuple):
+    pages_processed: int
+    pages_skipped: int
+    pages_failed: int
+    mangas_added: int
+    chapters_added: int
+    reached_end: bool
+
+class PageKind(Enum):
+    LIST = "list"         # Сторінка каталогу
+    MANGA = "manga"       # Сторінка манги з першими главами
+    CHAPTERS = "chapters" # HTML з відповіді /chapters/load
+
+class ArchiveEntry(NamedTuple):
+    kind: str
+    url: str
+    manga_id: Optional[str]
+    fetched_at: int
+    body_hash: str
+    segment: int
+    offset: int
+    length: int
+
+class BackfillReport(NamedTuple):
+    pages_read: int
+    pages_failed: int
+    mangas_written: int   # Вставлено або оновлено
+    chapters_written: int # Вставлено або оновлено
+    chapters_skipped: int # Глави манг, яких немає ні в БД, ні в архіві каталогу
+
+class RawBody(NamedTuple):
+    data: bytes # Тіло відповіді як отримано з мережі
+    encoding: str
+    html_field: Optional[str] = None # JSON-відповідь: поле з HTML
+
+class CachedResponse(NamedTuple):
+    content: Union[str, Dict[str, Any]]
+    unchanged: bool # 304 або те саме тіло, що й у кеші
+    raw: Optional[RawBody] = None # None - вміст узято з кешу (304)
+
 class BatchResult(NamedTuple):
     candies: int
     cards_found: int
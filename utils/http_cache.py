@@ -0,0 +1,195 @@
+# type: ignore
+"""
+Дисковий HTTP-кеш для умовних запитів (див. `make_conditional_request`).
+
+Для кожного запиту (метод + URL + params + data) зберігаються ETag,
+Last-Modified, хеш тіла та саме тіло. Повторний запит надсилається з
+If-None-Match/If-Modified-Since: на 304 тіло береться з кешу, а збіг хешу
+тіла при 200 теж означає "не змінилось" - тоді парсинг можна пропустити.
+
+Записи - окремі gzip-файли у теці кешу; загальний розмір обмежений,
+найдавніше використані записи витісняються (LRU за часом доступу до файлу,
+тож порядок зберігається між запусками).
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Mapping, Optional
+
+try:
+    from .settings import HTTP_CACHE_DIR, HTTP_CACHE_MAX_BYTES
+except ImportError:
+    from utils.settings import HTTP_CACHE_DIR, HTTP_CACHE_MAX_BYTES
+
+# CSRF-токен у <head> змінюється між сесіями і не впливає на вміст сторінки
+_VOLATILE_RE = re.compile(rb'<meta\s+name="csrf-token"\s+content="[^"]*"\s*/?>')
+_ENTRY_SUFFIX = ".json.gz"
+
+
+def get_body_hash(body: str) -> str:
+    """Хеш тіла відповіді без змінних між сесіями фрагментів."""
+    return hashlib.sha1(_VOLATILE_RE.sub(b"", body.encode("utf-8"))).hexdigest()
+
+
+class HttpCache:
+    """
+    Потокобезпечний LRU-кеш відповідей на диску з лічильниками:
+    'not_modified' (304), 'unchanged' (200 з тим самим тілом), 'changed',
+    'miss' (запису не було), 'stored', 'evicted'.
+
+    Тека створюється та сканується лише при першому зверненні.
+    """
+    def __init__(self, directory: str = HTTP_CACHE_DIR, max_bytes: int = HTTP_CACHE_MAX_BYTES) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._index: Optional["OrderedDict[str, int]"] = None # ключ -> розмір файлу, від найдавнішого
+        self._total_bytes = 0
+        self._counts: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(
+        method: str,
+        url: str,
+        params: Optional[Mapping[str, Any]] = None,
+        data: Optional[Mapping[str, Any]] = None
+    ) -> str:
+        canonical = json.dumps(
+            [method.upper(), url, sorted((params or {}).items()), sorted((data or {}).items())],
+            ensure_ascii=False, default=str,
+        )
+        return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _ENTRY_SUFFIX)
+
+    def _ensure_index(self) -> "OrderedDict[str, int]":
+        """Будує індекс з файлів теки (під self._lock)."""
+        if self._index is None:
+            os.makedirs(self.directory, exist_ok=True)
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and entry.name.endswith(_ENTRY_SUFFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name[:-len(_ENTRY_SUFFIX)], stat.st_size))
+            self._index = OrderedDict((key, size) for _, key, size in sorted(entries))
+            self._total_bytes = sum(self._index.values())
+        return self._index
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Запис кешу: {url, etag, last_modified, body_hash, content_type, body}
+        або None. Пошкоджений запис видаляється.
+        """
+        with self._lock:
+            index = self._ensure_index()
+            if key not in index:
+                return None
+            path = self._path(key)
+            try:
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    entry = json.load(f)
+                os.utime(path) # Позначка доступу для LRU між запусками
+                index.move_to_end(key)
+                return entry
+            except (OSError, EOFError, ValueError) as e:
+                logging.warning(f"Пошкоджений запис HTTP-кешу {key}: {e}")
+                self._remove(key)
+                return None
+
+    def conditional_headers(self, entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """Заголовки умовного запиту для запису кешу."""
+        headers: Dict[str, str] = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(
+        self,
+        key: str,
+        url: str,
+        body: str,
+        content_type: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        previous: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """
+        Зберігає нову відповідь 200. Повертає True, якщо тіло не змінилось
+        відносно `previous` (попереднього запису з `lookup`).
+        """
+        body_hash = get_body_hash(body)
+        unchanged = previous is not None and previous.get("body_hash") == body_hash
+        self.record("unchanged" if unchanged else "changed" if previous is not None else "miss")
+
+        entry = {
+            "url": url, "etag": etag, "last_modified": last_modified,
+            "body_hash": body_hash, "content_type": content_type, "body": body,
+        }
+        with self._lock:
+            index = self._ensure_index()
+            path = self._path(key)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+                    json.dump(entry, f, ensure_ascii=False)
+                os.replace(tmp_path, path)
+                size = os.path.getsize(path)
+            except OSError as e:
+                logging.error(f"Не вдалося записати HTTP-кеш для {url}: {e}")
+                return unchanged
+
+            self._total_bytes += size - index.pop(key, 0)
+            index[key] = size
+            self._counts["stored"] += 1
+            self._evict()
+        return unchanged
+
+    def _remove(self, key: str) -> None:
+        """Видаляє запис (під self._lock)."""
+        self._total_bytes -= self._index.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self) -> None:
+        """Витісняє найдавніше використані записи понад ліміт (під self._lock)."""
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            self._remove(next(iter(self._index)))
+            self._counts["evicted"] += 1
+
+    def record(self, outcome: str) -> None:
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._counts)
+            stats["entries"] = len(self._index or ())
+            stats["bytes"] = self._total_bytes
+            return stats
+
+    def log_stats(self) -> None:
+        stats = self.get_stats()
+        lookups = sum(stats.get(k, 0) for k in ("not_modified", "unchanged", "changed", "miss"))
+        if not lookups:
+            return
+        hits = stats.get("not_modified", 0) + stats.get("unchanged", 0)
+        logging.info(
+            f"HTTP-кеш: влучань {hits}/{lookups} (304: {stats.get('not_modified', 0)}, "
+            f"те саме тіло: {stats.get('unchanged', 0)}), змінено {stats.get('changed', 0)}, "
+            f"промахів {stats.get('miss', 0)}; витіснено {stats.get('evicted', 0)}, "
+            f"записів {stats['entries']} ({stats['bytes'] / 1024 / 1024:.1f} МБ)."
+        )
+
+
+HTTP_CACHE = HttpCache()
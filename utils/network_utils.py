@@ -1,72 +1,765 @@
 # type: ignore
 import json
 import logging
+import random
+import re
+import threading
 import time
 import socket
 import requests.packages.urllib3.util.connection as urllib3_conn
-from typing import Any, Dict, Optional, Union
+from collections import Counter
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterable, List, Mapping, MutableMapping, Optional, Tuple, Union
 
 import requests
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib.parse import urlsplit
 from bs4 import BeautifulSoup
 
 try:
-    from .settings import BASE_URL
+    import lxml.html
 except ImportError:
-    from utils.settings import BASE_URL
+    lxml = None
+
+try:
+    from .enums import CachedResponse, RawBody
+    from .http_cache import HttpCache
+    from .session_store import restore_session_state, save_session_state
+    from .settings import (
+        BASE_URL, RATE_LIMITS, RETRY_MAX_ATTEMPTS, RETRY_BACKOFF_BASE, RETRY_BACKOFF_MAX,
+        RETRY_AFTER_MAX, RETRY_STATUSES, RETRY_IDEMPOTENT_POST_PATHS, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_COOLDOWN, CIRCUIT_COOLDOWN_MAX,
+        SCRAPER_WORKERS, PROXY_EWMA_ALPHA, PROXY_SWITCH_RATIO, PROXY_EVICT_ERROR_RATE, PROXY_EVICT_MIN_SAMPLES,
+        PROXY_EVICT_CONSECUTIVE, PROXY_REPROBE_AFTER, PROXY_PROBE_URL, PROXY_PROBE_TIMEOUT,
+        CSRF_TTL, AUTH_REFRESH_STATUSES, HTML_PARSER
+    )
+except ImportError:
+    from utils.enums import CachedResponse, RawBody
+    from utils.http_cache import HttpCache
+    from utils.session_store import restore_session_state, save_session_state
+    from utils.settings import (
+        BASE_URL, RATE_LIMITS, RETRY_MAX_ATTEMPTS, RETRY_BACKOFF_BASE, RETRY_BACKOFF_MAX,
+        RETRY_AFTER_MAX, RETRY_STATUSES, RETRY_IDEMPOTENT_POST_PATHS, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_COOLDOWN, CIRCUIT_COOLDOWN_MAX,
+        SCRAPER_WORKERS, PROXY_EWMA_ALPHA, PROXY_SWITCH_RATIO, PROXY_EVICT_ERROR_RATE, PROXY_EVICT_MIN_SAMPLES,
+        PROXY_EVICT_CONSECUTIVE, PROXY_REPROBE_AFTER, PROXY_PROBE_URL, PROXY_PROBE_TIMEOUT,
+        CSRF_TTL, AUTH_REFRESH_STATUSES, HTML_PARSER
+    )
 
 def allowed_gai_family():
     return socket.AF_INET
 
 urllib3_conn.allowed_gai_family = allowed_gai_family
 
+def parse_csrf_from_html(html: str) -> Optional[str]:
+    """
+    Перевіряє авторизацію на сторінці та витягує CSRF-токен.
+    """
+    if HTML_PARSER == "lxml" and lxml is not None:
+        user_name, csrf_token, has_meta = _find_user_and_csrf_lxml(html)
+    else:
+        soup = BeautifulSoup(html, 'html.parser')
+        user_div = soup.find("div", class_="menu__name")
+        user_name = user_div.get_text(strip=True) if user_div else None
+        meta_tag = soup.find('meta', attrs={'name': 'csrf-token'})
+        csrf_token, has_meta = (meta_tag.get('content') if meta_tag else None), meta_tag is not None
+    
+    # 1. Перевірка авторизації (чи бачить сайт нас як користувача)
+    if user_name is not None:
+        logging.info(f"✅ Успішна автентифікація. Користувач: {user_name}")
+    else:
+        logging.warning("⚠️ Користувача не знайдено (виглядає як Гість). Перевірте Cookies.")
+
+    # 2. Отримання CSRF
+    if has_meta:
+        return csrf_token
+        
+    logging.warning("Мета-тег 'csrf-token' не знайдено на сторінці.")
+    return None
+
+def _find_user_and_csrf_lxml(html: str) -> Tuple[Optional[str], Optional[str], bool]:
+    """Ім'я користувача, CSRF-токен та чи є мета-тег - через lxml (див. HTML_PARSER)."""
+    try:
+        document = lxml.html.document_fromstring(html)
+    except (lxml.etree.ParserError, ValueError):
+        return None, None, False
+    user_divs = document.xpath("//div[contains(concat(' ', normalize-space(@class), ' '), ' menu__name ')]")
+    user_name = "".join(text.strip() for text in user_divs[0].itertext()) if user_divs else None
+    meta_tags = document.xpath("//meta[@name='csrf-token']")
+    return user_name, (meta_tags[0].get('content') if meta_tags else None), bool(meta_tags)
+
+class _EndpointState:
+    """Стан одного ендпоінта: токени бакета, час останнього (зарезервованого) запиту та статистика."""
+    def __init__(self, rate: Optional[float], burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.last_request: Optional[float] = None
+
+        self.requests = 0
+        self.waited_total = 0.0
+        self.waited_max = 0.0
+
+class RateLimiter:
+    """
+    Центральний планувальник запитів з бюджетом на кожен ендпоінт.
+
+    Бюджет - token bucket: `rate` запитів/с у середньому з запасом `burst`.
+    Додатково `min_interval` (параметр `delay` у `make_request`) задає
+    мінімальний інтервал від попереднього запиту до того ж ендпоінта,
+    тож запит іде одразу, щойно минув потрібний час, а не після фіксованого сну.
+
+    Місце в черзі резервується під блокуванням, а чекання відбувається поза ним,
+    тому лімітер можна ділити між потоками (`reserve`).
+    """
+    DEFAULT_ENDPOINT = "default"
+
+    def __init__(self, limits: Iterable[Tuple[str, str, Optional[float], int]] = ()) -> None:
+        self._rules = [(name, re.compile(pattern)) for name, pattern, _, _ in limits]
+        self._budgets = {name: (rate, burst) for name, _, rate, burst in limits}
+        self._states: Dict[str, _EndpointState] = {}
+        self._lock = threading.Lock()
+
+    def resolve_endpoint(self, url: str) -> str:
+        path = urlsplit(url).path or "/"
+        for name, pattern in self._rules:
+            if pattern.search(path):
+                return name
+        return self.DEFAULT_ENDPOINT
+
+    def reserve(self, url: str, min_interval: Optional[float] = None) -> float:
+        """Резервує слот для запиту і повертає, скільки секунд треба зачекати (без чекання)."""
+        endpoint = self.resolve_endpoint(url)
+        with self._lock:
+            state = self._state(endpoint)
+            now = time.monotonic()
+            ready_at = now
+            if state.rate:
+                state.tokens = min(state.burst, state.tokens + (now - state.updated) * state.rate)
+                state.updated = now
+                state.tokens -= 1
+                if state.tokens < 0:
+                    ready_at = now + (-state.tokens) / state.rate
+            if min_interval and state.last_request is not None:
+                ready_at = max(ready_at, state.last_request + min_interval)
+
+            state.last_request = ready_at
+            wait = ready_at - now
+            state.requests += 1
+            state.waited_total += wait
+            state.waited_max = max(state.waited_max, wait)
+        return wait
+
+    def _state(self, endpoint: str) -> _EndpointState:
+        state = self._states.get(endpoint)
+        if state is None:
+            rate, burst = self._budgets.get(endpoint, (None, 1))
+            state = self._states[endpoint] = _EndpointState(rate, burst)
+        return state
+
+    def note_request(self, url: str, seconds_ago: float = 0.0) -> None:
+        """
+        Враховує запит, зроблений поза лімітером (наприклад, у попередньому
+        запуску), щоб мінімальний інтервал відлічувався від нього.
+        """
+        with self._lock:
+            state = self._state(self.resolve_endpoint(url))
+            requested_at = time.monotonic() - max(seconds_ago, 0.0)
+            if state.last_request is None or requested_at > state.last_request:
+                state.last_request = requested_at
+
+    def time_until(self, url: str, min_interval: Optional[float] = None) -> float:
+        """
+        Скільки секунд лишилось до вільного слота, без резервування: для
+        планування роботи в паузі перед запитом (сам запит - через `acquire`).
+        """
+        with self._lock:
+            state = self._state(self.resolve_endpoint(url))
+            now = time.monotonic()
+            ready_at = now
+            if state.rate:
+                tokens = min(state.burst, state.tokens + (now - state.updated) * state.rate) - 1
+                if tokens < 0:
+                    ready_at = now + (-tokens) / state.rate
+            if min_interval and state.last_request is not None:
+                ready_at = max(ready_at, state.last_request + min_interval)
+        return max(ready_at - now, 0.0)
+
+    def acquire(self, url: str, min_interval: Optional[float] = None) -> float:
+        """Чекає на слот для запиту. Повертає час очікування в секундах."""
+        wait = self.reserve(url, min_interval)
+        if wait > 0:
+            logging.info(f"⏳ Чекаємо {wait:.1f} сек. перед запитом до {url}")
+            time.sleep(wait)
+        return wait
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """Статистика по ендпоінтах: 'requests', 'waited_total', 'waited_max' (с)."""
+        with self._lock:
+            return {
+                endpoint: {
+                    "requests": state.requests,
+                    "waited_total": round(state.waited_total, 3),
+                    "waited_max": round(state.waited_max, 3),
+                }
+                for endpoint, state in self._states.items()
+            }
+
+    def log_stats(self) -> None:
+        for endpoint, stats in self.get_stats().items():
+            logging.info(
+                f"Ліміт '{endpoint}': {stats['requests']} запитів, "
+                f"очікування {stats['waited_total']:.1f} с (макс. {stats['waited_max']:.1f} с)."
+            )
+
+# Спільний лімітер для всіх запитів процесу
+RATE_LIMITER = RateLimiter(RATE_LIMITS)
+
+# Класи невдач: з'єднання не встановлено (запит точно не дійшов) та таймаут відповіді
+FAILURE_CONNECT = "connect"
+FAILURE_TIMEOUT = "timeout"
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+class RetryPolicy:
+    """
+    Класифікація невдач та пауза перед повтором.
+
+    Повторюються помилки з'єднання, таймаути та статуси з `statuses`
+    (429/5xx). Інші 4xx - помилка запиту, повтор не допоможе.
+
+    Неідемпотентні запити (POST, крім шляхів з `idempotent_paths`) сервер міг
+    уже обробити (наприклад, /addHistory), а повтор подвоїв би його. Тому вони
+    повторюються лише тоді, коли запит точно не виконано: помилка з'єднання,
+    429 або 503 з Retry-After. Таймаут та інші 5xx для них - остаточна невдача.
+    """
+    def __init__(
+        self,
+        max_attempts: int = RETRY_MAX_ATTEMPTS,
+        backoff_base: float = RETRY_BACKOFF_BASE,
+        backoff_max: float = RETRY_BACKOFF_MAX,
+        retry_after_max: float = RETRY_AFTER_MAX,
+        statuses: Iterable[int] = RETRY_STATUSES,
+        idempotent_paths: Iterable[str] = RETRY_IDEMPOTENT_POST_PATHS,
+    ) -> None:
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+        self.statuses = frozenset(statuses)
+        self.idempotent_paths = frozenset(idempotent_paths)
+
+    def failure_reason(self, status: Optional[int], error_kind: Optional[str]) -> Optional[str]:
+        """Причина повторюваної невдачі ('connect', 'timeout', '429', '503', ...) або None."""
+        if error_kind:
+            return error_kind
+        if status in self.statuses:
+            return str(status)
+        return None
+
+    def is_idempotent(self, method: str, url: str) -> bool:
+        return method.upper() in IDEMPOTENT_METHODS or urlsplit(url).path in self.idempotent_paths
+
+    def should_retry(
+        self, method: str, url: str, reason: str, attempt: int, retry_after: Optional[str] = None
+    ) -> bool:
+        if attempt >= self.max_attempts:
+            return False
+        if self.is_idempotent(method, url):
+            return True
+        return reason in (FAILURE_CONNECT, "429") or (reason == "503" and bool(retry_after))
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Пауза перед спробою `attempt + 1`: Retry-After, якщо сервер його дав, інакше експонента з jitter."""
+        if retry_after:
+            seconds = self._parse_retry_after(retry_after)
+            if seconds is not None:
+                return min(max(seconds, 0.0), self.retry_after_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    @staticmethod
+    def _parse_retry_after(value: str) -> Optional[float]:
+        # Retry-After: кількість секунд або HTTP-дата
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        try:
+            return parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+
+class _HostCircuit:
+    def __init__(self, cooldown: float) -> None:
+        self.failures = 0
+        self.open_until = 0.0
+        self.cooldown = cooldown
+
+class CircuitBreaker:
+    """
+    Автоматичний вимикач по хостах.
+
+    Після `failure_threshold` повторюваних невдач поспіль ланцюг розмикається
+    на `cooldown` секунд: виклики до хоста чекають замість того, щоб бомбардувати
+    сайт під час збою. Після паузи проходить пробний запит (напіввідкритий стан):
+    успіх замикає ланцюг, невдача знову розмикає його з подвоєною паузою.
+    """
+    def __init__(
+        self,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        cooldown: float = CIRCUIT_COOLDOWN,
+        cooldown_max: float = CIRCUIT_COOLDOWN_MAX,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.cooldown_max = cooldown_max
+        self._hosts: Dict[str, _HostCircuit] = {}
+        self._lock = threading.Lock()
+
+    def _circuit(self, host: str) -> _HostCircuit:
+        circuit = self._hosts.get(host)
+        if circuit is None:
+            circuit = self._hosts[host] = _HostCircuit(self.base_cooldown)
+        return circuit
+
+    def wait_time(self, host: str) -> float:
+        """Скільки секунд ще розімкнений ланцюг хоста (0 - можна надсилати)."""
+        with self._lock:
+            return max(0.0, self._circuit(host).open_until - time.monotonic())
+
+    def wait(self, host: str) -> float:
+        wait = self.wait_time(host)
+        if wait > 0:
+            logging.warning(f"🔌 Ланцюг для {host} розімкнено. Чекаємо {wait:.0f} сек.")
+            time.sleep(wait)
+        return wait
+
+    def record_success(self, host: str) -> None:
+        with self._lock:
+            circuit = self._circuit(host)
+            circuit.failures = 0
+            circuit.cooldown = self.base_cooldown
+
+    def record_failure(self, host: str) -> None:
+        with self._lock:
+            circuit = self._circuit(host)
+            circuit.failures += 1
+            if circuit.failures < self.failure_threshold:
+                return
+            circuit.open_until = time.monotonic() + circuit.cooldown
+            logging.warning(
+                f"🔌 {circuit.failures} невдач поспіль для {host}: розмикаю ланцюг на {circuit.cooldown:.0f} сек."
+            )
+            circuit.cooldown = min(circuit.cooldown * 2, self.cooldown_max)
+            # Наступна ж невдача після паузи знову розімкне ланцюг
+            circuit.failures = self.failure_threshold - 1
+
+class RetryMetrics:
+    """
+    Лічильники рішень щодо повторів: (хост, рішення, причина) -> кількість.
+    Рішення: 'retry' (повтор), 'give_up' (спроби вичерпано або повтор небезпечний),
+    'recovered' (успіх після повторів), 'circuit_wait' (чекали на розімкнений ланцюг),
+    'auth_refresh' (оновлено авторизацію після 419/401).
+    """
+    def __init__(self) -> None:
+        self._counts: Counter[Tuple[str, str, str]] = Counter()
+        self._waited: Counter[Tuple[str, str, str]] = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, host: str, decision: str, reason: str, waited: float = 0.0) -> None:
+        with self._lock:
+            self._counts[(host, decision, reason)] += 1
+            self._waited[(host, decision, reason)] += waited
+
+    def get_metrics(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "host": host, "decision": decision, "reason": reason,
+                    "count": count, "waited": round(self._waited[(host, decision, reason)], 3),
+                }
+                for (host, decision, reason), count in sorted(self._counts.items())
+            ]
+
+    def log_metrics(self) -> None:
+        for metric in self.get_metrics():
+            logging.info(
+                f"Повтори {metric['host']}: {metric['decision']} ({metric['reason']}) - "
+                f"{metric['count']} раз, очікування {metric['waited']:.1f} с."
+            )
+
+RETRY_POLICY = RetryPolicy()
+CIRCUIT_BREAKER = CircuitBreaker()
+RETRY_METRICS = RetryMetrics()
+
+class _ProxyState:
+    """Здоров'я одного проксі: EWMA затримки та частки помилок, стан вилучення."""
+    def __init__(self, name: str, proxies: Dict[str, str]) -> None:
+        self.name = name
+        self.proxies = proxies
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.samples = 0
+        self.consecutive_failures = 0
+        self.evicted_until: Optional[float] = None # None - проксі в ротації
+        self.probing = False
+
+        self.requests = 0
+        self.failures = 0
+        self.evictions = 0
+
+class ProxyPool:
+    """
+    Пул проксі з оцінкою здоров'я.
+
+    Оцінка проксі - EWMA затримки, помножена на штраф за частку помилок
+    (менше - краще). Кожен акаунт закріплюється за одним проксі (cookies та
+    сесія сайту бачать стабільну IP-адресу) і переходить на інший, лише якщо
+    його проксі вилучено або він став у `switch_ratio` разів гіршим за найкращий.
+
+    Проксі вилучається після `evict_consecutive` помилок поспіль або частки
+    помилок від `evict_error_rate` (після `evict_min_samples` запитів). Через
+    `reprobe_after` секунд його перевіряє пробний запит до `probe_url`: успіх
+    повертає проксі в ротацію зі скинутою статистикою, невдача - ще на паузу.
+    """
+    def __init__(
+        self,
+        proxies: Iterable[Dict[str, str]],
+        ewma_alpha: float = PROXY_EWMA_ALPHA,
+        switch_ratio: float = PROXY_SWITCH_RATIO,
+        evict_error_rate: float = PROXY_EVICT_ERROR_RATE,
+        evict_min_samples: int = PROXY_EVICT_MIN_SAMPLES,
+        evict_consecutive: int = PROXY_EVICT_CONSECUTIVE,
+        reprobe_after: float = PROXY_REPROBE_AFTER,
+        probe_url: str = PROXY_PROBE_URL,
+        probe_timeout: float = PROXY_PROBE_TIMEOUT,
+    ) -> None:
+        self._proxies: Dict[str, _ProxyState] = {}
+        for proxy in proxies:
+            name = proxy.get("https") or proxy.get("http")
+            if name and name not in self._proxies:
+                self._proxies[name] = _ProxyState(name, dict(proxy))
+        self.ewma_alpha = ewma_alpha
+        self.switch_ratio = switch_ratio
+        self.evict_error_rate = evict_error_rate
+        self.evict_min_samples = evict_min_samples
+        self.evict_consecutive = evict_consecutive
+        self.reprobe_after = reprobe_after
+        self.probe_url = probe_url
+        self.probe_timeout = probe_timeout
+        self._assignments: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], **kwargs: Any) -> "ProxyPool":
+        """
+        Пул з конфігу: список "proxy_pool" (рядок - один проксі для http та https,
+        або словник {"http": ..., "https": ...}) та старий параметр "proxies".
+        """
+        entries = [
+            {"http": entry, "https": entry} if isinstance(entry, str) else entry
+            for entry in config.get("proxy_pool", [])
+        ]
+        if proxies := get_config_proxies(config):
+            entries.append(proxies)
+        return cls(entries, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self._proxies)
+
+    def _score(self, state: _ProxyState) -> float:
+        # Невипробуваний проксі - найкращий: так кожен отримує перший вимір
+        if state.latency is None:
+            return 0.0
+        return state.latency * (1 + 4 * state.error_rate)
+
+    def assign(self, account: str) -> Optional[Dict[str, str]]:
+        """Проксі для запиту акаунта (словник для `requests`) або None, якщо пул порожній."""
+        with self._lock:
+            if not self._proxies:
+                return None
+            active = [state for state in self._proxies.values() if state.evicted_until is None]
+            if not active:
+                # Усі вилучені: беремо той, що найскоріше має пройти перевірку
+                state = min(self._proxies.values(), key=lambda s: s.evicted_until)
+                return state.proxies
+
+            best = min(active, key=self._score)
+            current = self._proxies.get(self._assignments.get(account, ""))
+            if (
+                current is None
+                or current.evicted_until is not None
+                or self._score(current) > self.switch_ratio * self._score(best)
+            ):
+                if current is not best:
+                    logging.info(f"🌐 Акаунт '{account}' переходить на проксі {best.name}")
+                self._assignments[account] = best.name
+                current = best
+            return current.proxies
+
+    def _state_for(self, proxies: Dict[str, str]) -> Optional[_ProxyState]:
+        return self._proxies.get(proxies.get("https") or proxies.get("http"))
+
+    def record(self, proxies: Dict[str, str], latency: Optional[float], ok: bool) -> None:
+        """Результат запиту через проксі: затримка відповіді або невдача (ok=False)."""
+        with self._lock:
+            state = self._state_for(proxies)
+            if state is None or state.evicted_until is not None:
+                return
+            alpha = self.ewma_alpha
+            state.requests += 1
+            state.samples += 1
+            state.error_rate = (1 - alpha) * state.error_rate + alpha * (0.0 if ok else 1.0)
+            if ok:
+                state.consecutive_failures = 0
+                if latency is not None:
+                    state.latency = latency if state.latency is None else (1 - alpha) * state.latency + alpha * latency
+                return
+
+            state.failures += 1
+            state.consecutive_failures += 1
+            if (
+                state.consecutive_failures >= self.evict_consecutive
+                or (state.samples >= self.evict_min_samples and state.error_rate >= self.evict_error_rate)
+            ):
+                self._evict(state)
+
+    def _evict(self, state: _ProxyState) -> None:
+        """Вилучає проксі з ротації до пробного запиту (під self._lock)."""
+        state.evicted_until = time.monotonic() + self.reprobe_after
+        state.evictions += 1
+        logging.warning(
+            f"🌐 Проксі {state.name} вилучено на {self.reprobe_after:.0f} сек. "
+            f"(помилок поспіль: {state.consecutive_failures}, частка помилок: {state.error_rate:.2f})"
+        )
+
+    def evict(self, proxies: Dict[str, str]) -> None:
+        """Одразу вилучає проксі (наприклад, якщо через нього не вдалося навіть увійти)."""
+        with self._lock:
+            state = self._state_for(proxies)
+            if state is not None and state.evicted_until is None:
+                state.requests += 1
+                state.failures += 1
+                state.consecutive_failures += 1
+                self._evict(state)
+
+    def _probe(self, state: _ProxyState) -> bool:
+        try:
+            response = requests.get(self.probe_url, proxies=state.proxies, timeout=self.probe_timeout)
+            return response.status_code < 500
+        except requests.exceptions.RequestException as e:
+            logging.debug(f"Пробний запит через {state.name} не вдався: {e}")
+            return False
+
+    def reprobe_due(self) -> int:
+        """
+        Перевіряє вилучені проксі, чия пауза минула (пробні запити - поза
+        блокуванням). Повертає кількість проксі, повернутих у ротацію.
+        """
+        now = time.monotonic()
+        with self._lock:
+            due = [
+                state for state in self._proxies.values()
+                if state.evicted_until is not None and state.evicted_until <= now and not state.probing
+            ]
+            for state in due:
+                state.probing = True
+
+        restored = 0
+        for state in due:
+            ok = self._probe(state)
+            with self._lock:
+                state.probing = False
+                if ok:
+                    state.evicted_until = None
+                    state.latency = None
+                    state.error_rate = 0.0
+                    state.samples = state.consecutive_failures = 0
+                    restored += 1
+                    logging.info(f"🌐 Проксі {state.name} знову в ротації.")
+                else:
+                    state.evicted_until = time.monotonic() + self.reprobe_after
+        return restored
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "proxy": state.name,
+                    "active": state.evicted_until is None,
+                    "latency": None if state.latency is None else round(state.latency, 3),
+                    "error_rate": round(state.error_rate, 3),
+                    "requests": state.requests,
+                    "failures": state.failures,
+                    "evictions": state.evictions,
+                    "accounts": sorted(a for a, name in self._assignments.items() if name == state.name),
+                }
+                for state in self._proxies.values()
+            ]
+
+    def log_stats(self) -> None:
+        for stats in self.get_stats():
+            latency = "-" if stats["latency"] is None else f"{stats['latency']:.2f} с"
+            logging.info(
+                f"Проксі {stats['proxy']}: {'активний' if stats['active'] else 'вилучений'}, "
+                f"затримка {latency}, помилок {stats['failures']}/{stats['requests']}, "
+                f"вилучень {stats['evictions']}."
+            )
+
+def get_session_account(session: requests.Session) -> str:
+    """Ключ акаунта сесії для закріплення проксі."""
+    return session.config.get("auth_data", {}).get("email") or "default"
+
 def get_csrf_from_html(session: requests.Session, timeout: float) -> Optional[str]:
     """
     Виконує GET-запит на вказану URL, перевіряє авторизацію та витягує CSRF-токен.
     """
     logging.info(f"Намагаюся отримати CSRF-токен та перевірити вхід: {BASE_URL}")
-    try:
-        response = session.get(BASE_URL, timeout=timeout)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # 1. Перевірка авторизації (чи бачить сайт нас як користувача)
-        user_div = soup.find("div", class_="menu__name")
-        if user_div:
-            user_name = user_div.get_text(strip=True)
-            logging.info(f"✅ Успішна автентифікація. Користувач: {user_name}")
-        else:
-            logging.warning("⚠️ Користувача не знайдено (виглядає як Гість). Перевірте Cookies.")
+    proxy_pool: Optional[ProxyPool] = getattr(session, "proxy_pool", None)
+    account = get_session_account(session)
 
-        # 2. Отримання CSRF
-        meta_tag = soup.find('meta', attrs={'name': 'csrf-token'})
-        if meta_tag:
-            return meta_tag.get('content')
-            
-        logging.warning("Мета-тег 'csrf-token' не знайдено на сторінці.")
-        return None
+    # З пулом: проксі, через який не вдалося з'єднатися, вилучається і пробується наступний
+    for _ in range(len(proxy_pool) if proxy_pool else 1):
+        proxies = proxy_pool.assign(account) if proxy_pool else None
+        started = time.monotonic()
+        try:
+            response = session.get(BASE_URL, timeout=timeout, proxies=proxies)
+            if proxies:
+                proxy_pool.record(proxies, time.monotonic() - started, ok=True)
+            response.raise_for_status()
+            return parse_csrf_from_html(response.text)
 
-    except requests.exceptions.RequestException as e:
-        logging.error(f"❌ Не вдалося завантажити сторінку: {e}")
-        return None
+        except requests.exceptions.HTTPError as e:
+            logging.error(f"❌ Не вдалося завантажити сторінку: {e}")
+            return None
+        except requests.exceptions.RequestException as e:
+            logging.error(f"❌ Не вдалося завантажити сторінку: {e}")
+            if not proxies:
+                return None
+            proxy_pool.evict(proxies)
+    return None
 
 
-def create_mangabuff_session(config: Dict[str, Any], use_cookie: bool = True, timeout: float = 20) -> Optional[requests.Session]:
+def get_config_proxies(config: Dict[str, Any]) -> Dict[str, str]:
+    """Проксі з конфігу у вигляді {"http": ..., "https": ...} (лише задані)."""
+    proxies = config.get("proxies", {})
+    return {scheme: proxies[scheme] for scheme in ("http", "https") if proxies.get(scheme)}
+
+def build_request_headers(
+    base_headers: Mapping[str, str],
+    config: Dict[str, Any],
+    headers_profile: Optional[str] = None,
+    referer: Optional[str] = None
+) -> CaseInsensitiveDict:
+    """
+    Заголовки конкретного запиту: заголовки сесії + профіль з конфігу
+    (наприклад 'ajax_post', 'navigation_get') + динамічні Referer/Origin.
+    """
+    request_headers = CaseInsensitiveDict(base_headers)
+
+    # Застосовуємо профіль заголовків (наприклад 'image', 'api' тощо з конфігу)
+    if headers_profile:
+        profile_headers = config.get("headers", {}).get(headers_profile, {})
+        request_headers.update(profile_headers)
+    
+    # Динамічний Referer та Origin
+    if referer:
+        request_headers['Referer'] = referer
+        request_headers['Origin'] = config.get("base_url", BASE_URL)
+    return request_headers
+
+def _session_store_key(session: requests.Session) -> str:
+    # Акаунт + час входу з конфігу: після нового входу стара збережена сесія не підходить
+    return f"{get_session_account(session)}@{session.config.get('timestamp', 0)}"
+
+def persist_session(session: requests.Session) -> bool:
+    """Зберігає cookies та CSRF-токен сесії у її сховище (якщо воно задане)."""
+    store_path = getattr(session, "store_path", None)
+    if not store_path:
+        return False
+    return save_session_state(session, store_path, _session_store_key(session), CSRF_TTL)
+
+def refresh_session_auth(session: requests.Session, status: int, failed_token: Optional[str]) -> bool:
+    """
+    Оновлює авторизацію сесії після відповіді 419 (CSRF-токен застарів) або
+    401 (сесія сайту сплила): для 401 спершу виконується повторний вхід
+    (`session.reauthenticate`, якщо задано), потім береться новий CSRF-токен.
+
+    Потоки, що отримали відмову з тим самим токеном, оновлюють сесію лише
+    раз: решта бачить уже новий токен і просто повторює запит.
+    """
+    lock = getattr(session, "auth_lock", None)
+    if lock is None:
+        return False
+    with lock:
+        if session.headers.get("X-CSRF-TOKEN") != failed_token:
+            return True
+
+        logging.warning(f"🔑 Відповідь {status}: оновлюю авторизацію сесії.")
+        reauthenticate = getattr(session, "reauthenticate", None)
+        if status == 401 and reauthenticate is not None and not reauthenticate(session):
+            logging.error("❌ Повторний вхід не вдався.")
+            return False
+
+        if not _renew_csrf(session):
+            return False
+        logging.info("🔑 Авторизацію сесії оновлено.")
+        return True
+
+def _renew_csrf(session: requests.Session, timeout: float = 20) -> bool:
+    """Бере новий CSRF-токен з головної сторінки і зберігає сесію (під `session.auth_lock`)."""
+    csrf_token = get_csrf_from_html(session, timeout=timeout)
+    if not csrf_token:
+        logging.error("❌ Не вдалося оновити CSRF-токен.")
+        return False
+    session.headers['X-CSRF-TOKEN'] = csrf_token
+    persist_session(session)
+    return True
+
+def renew_session_csrf(session: requests.Session) -> bool:
+    """
+    Планове оновлення CSRF-токена (і cookies, що їх продовжує сайт), поки
+    старий ще дійсний - щоб запит нагороди не натрапив на 419.
+    """
+    lock = getattr(session, "auth_lock", None)
+    if lock is None:
+        return False
+    with lock:
+        if not _renew_csrf(session):
+            return False
+    logging.info("🔑 CSRF-токен сесії оновлено.")
+    return True
+
+def create_mangabuff_session(
+    config: Dict[str, Any],
+    use_cookie: bool = True,
+    timeout: float = 20,
+    proxy_pool: Optional[ProxyPool] = None,
+    store_path: Optional[str] = None
+) -> Optional[requests.Session]:
     """
     Створює сесію з проксі, headers та cookies.
+    Проксі обираються з `proxy_pool` (за замовчуванням - пул з конфігу) на
+    кожен запит; спільний пул між сесіями кількох акаунтів теж підтримується.
+
+    З `store_path` cookies та CSRF-токен зберігаються між запусками: поки
+    вони дійсні, сесія відновлюється без запиту головної сторінки.
     """
     session = requests.Session()
     session.config = config  # Зберігаємо конфіг
+    session.store_path = store_path if use_cookie else None
+    session.auth_lock = threading.Lock()
+    session.reauthenticate = None # Повторний вхід при 401 (задається на рівні застосунку)
     session.trust_env = False  # Ігноруємо системні проксі, використовуємо лише з конфігу
+    # Пул з'єднань не менший за кількість потоків скрейпера, що ділять сесію
+    adapter = HTTPAdapter(pool_maxsize=max(DEFAULT_POOLSIZE, SCRAPER_WORKERS))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
     
     # 1. Налаштування проксі
-    proxies = config.get("proxies", {})
-    if proxies:
-        session.proxies = {
-            "http": proxies.get("http"),
-            "https": proxies.get("https")
-        }
-        logging.info(f"🌐 Проксі встановлено: {proxies.get('http')}")
+    proxy_pool = proxy_pool if proxy_pool is not None else ProxyPool.from_config(config)
+    session.proxy_pool = proxy_pool if len(proxy_pool) else None
+    if session.proxy_pool:
+        logging.info(f"🌐 Пул проксі: {len(proxy_pool)} шт.")
 
     # 2. Налаштування заголовків та Cookies
     headers = config.get("headers", {}).get("common", {})
@@ -77,12 +770,17 @@ def create_mangabuff_session(config: Dict[str, Any], use_cookie: bool = True, ti
         session.cookies.update(cookies)
         logging.info("🍪 Cookies завантажено в сесію.")
 
+        if session.store_path and restore_session_state(session, session.store_path, _session_store_key(session)):
+            logging.info("✅ Сесію відновлено зі збережених cookies та CSRF.")
+            return session
+
     # 3. Спроба підключення та отримання CSRF
     try:
         csrf_token = get_csrf_from_html(session, timeout=timeout)
         
         if csrf_token:
             session.headers['X-CSRF-TOKEN'] = csrf_token
+            persist_session(session)
             logging.info(f"✅ Сесія готова. CSRF отримано.")
             return session
         else:
@@ -91,18 +789,136 @@ def create_mangabuff_session(config: Dict[str, Any], use_cookie: bool = True, ti
     except Exception as e:
         logging.error(f"❌ Критична помилка при створенні сесії: {e}")
         
-        # Блок діагностики проксі (якщо основний запит впав)
-        if proxies:
-            logging.info("🕵️ Починаю діагностику проксі...")
-            try:
-                test = session.get("https://www.google.com", timeout=10)
-                logging.info(f"Google через проксі доступний (Status: {test.status_code}). Проблема в Mangabuff або Cookies.")
-            except Exception as proxy_err:
-                logging.error(f"💀 Проксі мертвий. Google недоступний: {proxy_err}")
+    # Діагностика: стан кожного проксі пулу після спроб входу
+    if session.proxy_pool:
+        session.proxy_pool.log_stats()
 
     return None
 
 
+def _send_with_retries(
+    session: requests.Session,
+    method: str,
+    url: str,
+    request_headers: MutableMapping[str, str],
+    data: Optional[Dict[str, Any]],
+    params: Optional[Dict[str, Any]],
+    limiter: RateLimiter
+) -> Optional[requests.Response]:
+    """
+    Надсилає запит з повторами за RETRY_POLICY та CIRCUIT_BREAKER
+    (спільна частина `make_request` і `make_conditional_request`).
+    Відповідь 419/401 оновлює авторизацію сесії (`refresh_session_auth`),
+    після чого запит повторюється з новим токеном.
+    Повертає успішну відповідь (2xx/3xx) або None.
+    """
+    host = urlsplit(url).netloc
+    auth_refreshes = 0
+    proxy_pool: Optional[ProxyPool] = getattr(session, "proxy_pool", None)
+    account = get_session_account(session) if proxy_pool else ""
+    attempt = 1
+    while True:
+        circuit_wait = CIRCUIT_BREAKER.wait(host)
+        if circuit_wait:
+            RETRY_METRICS.record(host, "circuit_wait", "open", circuit_wait)
+
+        # Проксі обирається на кожну спробу: повтор піде через інший, якщо цей вилучено
+        proxies = None
+        if proxy_pool:
+            proxy_pool.reprobe_due()
+            proxies = proxy_pool.assign(account)
+
+        log_message = f"--> {method.upper()} {url}"
+        logging.debug(log_message)
+
+        status: Optional[int] = None
+        error_kind: Optional[str] = None
+        retry_after: Optional[str] = None
+        proxy_failed = False
+        started = time.monotonic()
+        try:
+            response = session.request(
+                method, 
+                url, 
+                headers=request_headers, 
+                data=data, 
+                params=params, 
+                proxies=proxies,
+                timeout=30  # Збільшено таймаут для проксі
+            )
+            status = response.status_code
+            if proxies:
+                proxy_pool.record(proxies, time.monotonic() - started, ok=True)
+            logging.debug(f"<-- Status: {response.status_code}")
+            response.raise_for_status()
+            break
+
+        except requests.exceptions.HTTPError as e:
+            retry_after = e.response.headers.get("Retry-After")
+            error = e
+            # Друга відмова поспіль для 419 - найімовірніше, сплила вся сесія: вхід заново
+            if status in AUTH_REFRESH_STATUSES and auth_refreshes < 2:
+                failed_token = request_headers.get('X-CSRF-TOKEN')
+                auth_status = 401 if auth_refreshes else status
+                auth_refreshes += 1
+                if refresh_session_auth(session, auth_status, failed_token):
+                    if 'X-CSRF-TOKEN' in session.headers:
+                        request_headers['X-CSRF-TOKEN'] = session.headers['X-CSRF-TOKEN']
+                    RETRY_METRICS.record(host, "auth_refresh", str(status))
+                    continue
+        except requests.exceptions.ConnectionError as e: # у т.ч. ConnectTimeout та ProxyError
+            error_kind, error = FAILURE_CONNECT, e
+            proxy_failed = isinstance(e, requests.exceptions.ProxyError)
+        except requests.exceptions.Timeout as e:
+            error_kind, error = FAILURE_TIMEOUT, e
+        except requests.exceptions.RequestException as e:
+            logging.error(f"❌ Помилка запиту до {url}: {e}")
+            return None
+
+        if proxies and error_kind:
+            proxy_pool.record(proxies, None, ok=False)
+
+        reason = RETRY_POLICY.failure_reason(status, error_kind)
+        if reason is None:
+            # Інші 4xx: сервер живий, але запит хибний - повтор не допоможе
+            CIRCUIT_BREAKER.record_success(host)
+            logging.error(f"❌ Помилка запиту до {url}: {error}")
+            return None
+
+        # Збій самого проксі не свідчить про стан сайту
+        if not (proxy_failed and proxy_pool and len(proxy_pool) > 1):
+            CIRCUIT_BREAKER.record_failure(host)
+        if not RETRY_POLICY.should_retry(method, url, reason, attempt, retry_after):
+            RETRY_METRICS.record(host, "give_up", reason)
+            logging.error(f"❌ Помилка запиту до {url} (спроба {attempt}): {error}")
+            return None
+
+        backoff = RETRY_POLICY.backoff(attempt, retry_after)
+        RETRY_METRICS.record(host, "retry", reason, backoff)
+        logging.warning(f"🔁 {reason} від {url} (спроба {attempt}). Повтор через {backoff:.1f} сек.")
+        time.sleep(backoff)
+        limiter.acquire(url)
+        attempt += 1
+
+    CIRCUIT_BREAKER.record_success(host)
+    if attempt > 1:
+        RETRY_METRICS.record(host, "recovered", str(status))
+    return response
+
+def _decode_body(url: str, body: str, content_type: str) -> Optional[Union[str, Dict[str, Any]]]:
+    """dict для JSON-відповіді, текст для решти, None якщо JSON пошкоджений."""
+    try:
+        if 'application/json' in content_type:
+            return json.loads(body)
+        return body
+    except json.JSONDecodeError:
+        logging.error(f"❌ Помилка декодування JSON з {url}.")
+        return None
+
+def _raw_body(response: requests.Response) -> RawBody:
+    # Кодування із заголовка (як у response.text); без нього - UTF-8, а не повільне вгадування
+    return RawBody(response.content, response.encoding or "utf-8")
+
 def make_request(
     session: requests.Session,
     method: str,
@@ -111,50 +927,83 @@ def make_request(
     data: Optional[Dict[str, Any]] = None,
     params: Optional[Dict[str, Any]] = None,
     referer: Optional[str] = None,
-    headers_profile: Optional[str] = None
+    headers_profile: Optional[str] = None,
+    rate_limiter: Optional[RateLimiter] = None
 ) -> Optional[Union[str, Dict[str, Any]]]:
     """
     Універсальна функція запиту з підтримкою профілів заголовків.
+    `delay` - мінімальний інтервал від попереднього запиту до того ж ендпоінта
+    (див. RateLimiter), а не безумовна пауза.
+
+    Невдачі з'єднання, таймаути та 429/5xx повторюються за RETRY_POLICY
+    (з урахуванням Retry-After; неідемпотентні POST - лише якщо сервер їх не виконав); під час збою хоста CIRCUIT_BREAKER
+    призупиняє запити. Повертає None, якщо запит так і не вдався.
     """
-    if delay and delay > 0:
-        logging.info(f"⏳ Чекаємо {delay} сек. перед запитом до {url}")
-        time.sleep(delay)
+    limiter = rate_limiter or RATE_LIMITER
+    limiter.acquire(url, delay)
 
-    request_headers = session.headers.copy()
+    request_headers = build_request_headers(session.headers, session.config, headers_profile, referer)
+    response = _send_with_retries(session, method, url, request_headers, data, params, limiter)
+    if response is None:
+        return None
+    return _decode_body(url, response.text, response.headers.get('Content-Type', ''))
 
-    # Застосовуємо профіль заголовків (наприклад 'image', 'api' тощо з конфігу)
-    if headers_profile:
-        profile_headers = session.config.get("headers", {}).get(headers_profile, {})
-        request_headers.update(profile_headers)
-    
-    # Динамічний Referer та Origin
-    if referer:
-        request_headers['Referer'] = referer
-        request_headers['Origin'] = session.config.get("base_url", BASE_URL)
+def make_conditional_request(
+    session: requests.Session,
+    method: str,
+    url: str,
+    cache: Optional[HttpCache],
+    delay: Optional[float] = None,
+    data: Optional[Dict[str, Any]] = None,
+    params: Optional[Dict[str, Any]] = None,
+    referer: Optional[str] = None,
+    headers_profile: Optional[str] = None,
+    rate_limiter: Optional[RateLimiter] = None
+) -> Optional[CachedResponse]:
+    """
+    `make_request` через HTTP-кеш: запит надсилається з If-None-Match /
+    If-Modified-Since збереженої відповіді, на 304 вміст береться з кешу.
 
-    log_message = f"--> {method.upper()} {url}"
-    logging.debug(log_message)
+    Returns:
+        CachedResponse(content, unchanged, raw) або None, якщо запит не вдався.
+        unchanged=True (304 або те саме тіло) - вміст такий самий, як при
+        попередньому запиті, і його не потрібно парсити знову. raw - байти
+        відповіді з мережі (для парсингу в іншому процесі без повторного
+        кодування), None для вмісту з кешу.
+        Без `cache` - запит як у `make_request` з unchanged=False.
+    """
+    limiter = rate_limiter or RATE_LIMITER
+    limiter.acquire(url, delay)
 
-    try:
-        response = session.request(
-            method, 
-            url, 
-            headers=request_headers, 
-            data=data, 
-            params=params, 
-            timeout=30  # Збільшено таймаут для проксі
-        )
-        
-        logging.debug(f"<-- Status: {response.status_code}")
-        response.raise_for_status()
-        
-        if 'application/json' in response.headers.get('Content-Type', ''):
-            return response.json()
-        return response.text
+    request_headers = build_request_headers(session.headers, session.config, headers_profile, referer)
+    if cache is None:
+        response = _send_with_retries(session, method, url, request_headers, data, params, limiter)
+        if response is None:
+            return None
+        content = _decode_body(url, response.text, response.headers.get('Content-Type', ''))
+        return None if content is None else CachedResponse(content, False, _raw_body(response))
+
+    key = cache.make_key(method, url, params, data)
+    entry = cache.lookup(key)
+    request_headers.update(cache.conditional_headers(entry))
 
-    except requests.exceptions.RequestException as e:
-        logging.error(f"❌ Помилка запиту до {url}: {e}")
+    response = _send_with_retries(session, method, url, request_headers, data, params, limiter)
+    if response is None:
         return None
-    except json.JSONDecodeError:
-        logging.error(f"❌ Помилка декодування JSON з {url}.")
-        return None
\ No newline at end of file
+
+    if response.status_code == 304 and entry is not None:
+        cache.record("not_modified")
+        content = _decode_body(url, entry["body"], entry["content_type"])
+        return None if content is None else CachedResponse(content, True)
+
+    content_type = response.headers.get('Content-Type', '')
+    content = _decode_body(url, response.text, content_type)
+    if content is None:
+        return None
+    unchanged = cache.store(
+        key, url, response.text, content_type,
+        etag=response.headers.get('ETag'),
+        last_modified=response.headers.get('Last-Modified'),
+        previous=entry,
+    )
+    return CachedResponse(content, unchanged, _raw_body(response))
@@ -0,0 +1,192 @@
+"""
+Архів сирих сторінок скрейпера для повторного парсингу без мережі
+(див. application/backfill.py).
+
+Кожна завантажена сторінка списку, сторінка манги та відповідь /chapters/load
+дописується в кінець поточного сегмента (`segment-NNNNNN.gz`) окремим
+gzip-членом, тож сегмент - звичайний багаточленний gzip-файл. Індекс
+(`index.jsonl`) - рядок на запис: тип сторінки, URL, ID манги, час
+завантаження, хеш тіла та положення в сегменті. Обидва файли лише
+доповнюються; байти сегмента без рядка в індексі (збій між двома записами)
+просто ігноруються.
+
+Тіло, що не змінилось з попереднього запису тієї ж сторінки (хеш без
+CSRF-токена, див. `get_body_hash`), повторно не зберігається.
+"""
+import gzip
+import json
+import logging
+import os
+import threading
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from .enums import ArchiveEntry, PageKind
+    from .http_cache import get_body_hash
+    from .settings import PAGE_ARCHIVE_DIR, PAGE_ARCHIVE_SEGMENT_BYTES
+    from .time import get_current_timestamp
+except ImportError:
+    from utils.enums import ArchiveEntry, PageKind
+    from utils.http_cache import get_body_hash
+    from utils.settings import PAGE_ARCHIVE_DIR, PAGE_ARCHIVE_SEGMENT_BYTES
+    from utils.time import get_current_timestamp
+
+_INDEX_FILE = "index.jsonl"
+_SEGMENT_PREFIX = "segment-"
+_SEGMENT_SUFFIX = ".gz"
+# Сурогати можуть прийти з JSON-відповіді /chapters/load - зберігаємо їх як є
+_ENCODING_ERRORS = "surrogatepass"
+
+PageKey = Tuple[str, str, Optional[str]] # (тип, URL, ID манги)
+
+
+def _entry_key(entry: ArchiveEntry) -> PageKey:
+    return entry.kind, entry.url, entry.manga_id
+
+
+class PageArchive:
+    """
+    Потокобезпечний архів сторінок з лічильниками 'stored', 'duplicate'
+    (тіло не змінилось), 'failed' та обсягом записаного.
+
+    Тека створюється, а індекс читається лише при першому записі.
+    """
+    def __init__(self, directory: str = PAGE_ARCHIVE_DIR, segment_bytes: int = PAGE_ARCHIVE_SEGMENT_BYTES) -> None:
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self._latest_hashes: Optional[Dict[PageKey, str]] = None
+        self._segment = 1
+        self._counts: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"{_SEGMENT_PREFIX}{segment:06d}{_SEGMENT_SUFFIX}")
+
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, _INDEX_FILE)
+
+    def _ensure_state(self) -> Dict[PageKey, str]:
+        """Хеші останніх версій сторінок та поточний сегмент (під self._lock)."""
+        if self._latest_hashes is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._latest_hashes = {_entry_key(entry): entry.body_hash for entry in self.iter_index()}
+            segments = [
+                int(name[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)])
+                for name in os.listdir(self.directory)
+                if name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX)
+            ]
+            self._segment = max(segments, default=1)
+        return self._latest_hashes
+
+    def append(self, kind: PageKind, url: str, body: str, manga_id: Optional[str] = None) -> bool:
+        """Дописує сторінку в архів. Повертає True, якщо запис додано (тіло змінилось)."""
+        body_hash = get_body_hash(body)
+        key = (kind.value, url, manga_id)
+        with self._lock:
+            latest_hashes = self._ensure_state()
+            if latest_hashes.get(key) == body_hash:
+                self._counts["duplicate"] += 1
+                return False
+
+            record = gzip.compress(body.encode("utf-8", _ENCODING_ERRORS), compresslevel=6)
+            try:
+                segment_path = self._segment_path(self._segment)
+                if os.path.exists(segment_path) and os.path.getsize(segment_path) + len(record) > self.segment_bytes:
+                    self._segment += 1
+                    segment_path = self._segment_path(self._segment)
+                with open(segment_path, "ab") as f:
+                    offset = f.seek(0, os.SEEK_END)
+                    f.write(record)
+                entry = ArchiveEntry(
+                    kind.value, url, manga_id, get_current_timestamp(), body_hash, self._segment, offset, len(record)
+                )
+                with open(self._index_path(), "a", encoding="utf-8") as f:
+                    f.write(json.dumps(list(entry), ensure_ascii=False) + "\n")
+            except OSError as e:
+                logging.error(f"Не вдалося записати сторінку {url} в архів: {e}")
+                self._counts["failed"] += 1
+                return False
+
+            latest_hashes[key] = body_hash
+            self._counts["stored"] += 1
+            self._counts["bytes"] += len(record)
+            return True
+
+    def iter_index(self) -> Iterator[ArchiveEntry]:
+        """Записи індексу в порядку додавання (тобто за часом завантаження)."""
+        try:
+            f = open(self._index_path(), "r", encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                try:
+                    yield ArchiveEntry(*json.loads(line))
+                except (ValueError, TypeError):
+                    # Обірваний рядок після збою запису
+                    logging.warning(f"Пошкоджений рядок індексу архіву: {line[:80]!r}")
+
+    def latest_entries(self, as_of: Optional[int] = None) -> List[ArchiveEntry]:
+        """
+        Остання версія кожної сторінки, завантажена не пізніше `as_of`
+        (за замовчуванням - будь-коли), у порядку розташування на диску.
+        """
+        latest: Dict[PageKey, ArchiveEntry] = {}
+        for entry in self.iter_index():
+            if as_of is None or entry.fetched_at <= as_of:
+                latest[_entry_key(entry)] = entry
+        return sorted(latest.values(), key=lambda entry: (entry.segment, entry.offset))
+
+    def history(self, url: str) -> List[ArchiveEntry]:
+        """Усі збережені версії сторінки `url` від найстарішої."""
+        return [entry for entry in self.iter_index() if entry.url == url]
+
+    def iter_pages(self, entries: Iterable[ArchiveEntry]) -> Iterator[Tuple[ArchiveEntry, Optional[str]]]:
+        """
+        Тіла записів `entries` (None - запис пошкоджено або сегмент не
+        читається). Сегменти читаються послідовно, якщо `entries`
+        впорядковані як у `latest_entries`.
+        """
+        segment: Optional[int] = None
+        f = None
+        try:
+            for entry in entries:
+                if entry.segment != segment:
+                    if f is not None:
+                        f.close()
+                        f = None
+                    segment = entry.segment
+                    try:
+                        f = open(self._segment_path(segment), "rb")
+                    except OSError as e:
+                        logging.warning(f"Не вдалося відкрити сегмент архіву {segment}: {e}")
+                if f is None:
+                    yield entry, None
+                    continue
+                f.seek(entry.offset)
+                try:
+                    yield entry, gzip.decompress(f.read(entry.length)).decode("utf-8", _ENCODING_ERRORS)
+                except (OSError, EOFError, zlib.error) as e:
+                    logging.warning(f"Пошкоджений запис архіву {entry.url} ({entry.fetched_at}): {e}")
+                    yield entry, None
+        finally:
+            if f is not None:
+                f.close()
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+    def log_stats(self) -> None:
+        stats = self.get_stats()
+        if not stats:
+            return
+        logging.info(
+            f"Архів сторінок: збережено {stats.get('stored', 0)} ({stats.get('bytes', 0) / 1024 / 1024:.1f} МБ), "
+            f"без змін {stats.get('duplicate', 0)}, помилок {stats.get('failed', 0)}."
+        )
+
+
+PAGE_ARCHIVE = PageArchive()
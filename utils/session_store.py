@@ -0,0 +1,87 @@
+"""
+Збережений стан HTTP-сесії: cookies та CSRF-токен з терміном дії.
+
+Дозволяє при старті відновити сесію без запиту головної сторінки
+(див. `create_mangabuff_session`), доки не минув термін дії токена
+або cookies сесії.
+"""
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+import requests
+
+try:
+    from .file import save_json_data
+    from .time import get_current_timestamp
+except ImportError:
+    from utils.file import save_json_data
+    from utils.time import get_current_timestamp
+
+def _load_store(path: str) -> Optional[Dict[str, Any]]:
+    # load_json_data пише помилку для відсутнього файлу - тут це звичайна ситуація
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logging.warning(f"Збережену сесію {path} не прочитано: {e}")
+        return None
+
+def save_session_state(session: requests.Session, path: str, account: str, csrf_ttl: int) -> bool:
+    """
+    Зберігає cookies та X-CSRF-TOKEN сесії. Термін дії - найраніший з
+    `csrf_ttl` від поточного моменту та завершення cookies сесії.
+    """
+    csrf_token = session.headers.get("X-CSRF-TOKEN")
+    if not csrf_token:
+        return False
+
+    now = get_current_timestamp()
+    expires_at = now + csrf_ttl
+    # Cookie з конфігу (без домену) та виставлений сайтом мають одне ім'я -
+    # зберігаємо лише актуальний, від сайту
+    cookies: Dict[str, Dict[str, Any]] = {}
+    for cookie in session.cookies:
+        if cookie.name in cookies and not cookie.domain:
+            continue
+        cookies[cookie.name] = {
+            "name": cookie.name, "value": cookie.value, "domain": cookie.domain,
+            "path": cookie.path, "expires": cookie.expires, "secure": cookie.secure,
+        }
+    for cookie in cookies.values():
+        if cookie["expires"]:
+            expires_at = min(expires_at, int(cookie["expires"]))
+
+    state = {
+        "account": account,
+        "csrf_token": csrf_token,
+        "saved_at": now,
+        "expires_at": expires_at,
+        "cookies": list(cookies.values()),
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return save_json_data(state, path)
+
+def restore_session_state(session: requests.Session, path: str, account: str) -> bool:
+    """
+    Відновлює cookies та CSRF-токен, якщо збережена сесія належить `account`
+    і ще не сплила. Повертає True, якщо сесію відновлено (без мережевих запитів).
+    """
+    state = _load_store(path)
+    if not state or state.get("account") != account or not state.get("csrf_token"):
+        return False
+    if state.get("expires_at", 0) <= get_current_timestamp():
+        logging.info("Збережена сесія сплила.")
+        return False
+
+    session.cookies.clear()
+    for cookie in state.get("cookies", []):
+        session.cookies.set(
+            cookie["name"], cookie["value"], domain=cookie.get("domain", ""),
+            path=cookie.get("path", "/"), expires=cookie.get("expires"), secure=cookie.get("secure", False),
+        )
+    session.headers["X-CSRF-TOKEN"] = state["csrf_token"]
+    return True
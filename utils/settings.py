@@ -1,20 +1,103 @@
 CONFIG_FILE = "data/config_ouash.json"
-LAST_READED = "data/last_readed_ouash.txt"
+LAST_READED = "data/last_readed_ouash.txt" # Старий формат позиції, читається лише для переходу
+READING_CURSOR_NAME = "collector"
 LOG_FILE = "script_ouash.log"
 
 DB_PATH = "data/manga_ouash.db"
 DB_URL = f"sqlite:///{DB_PATH}"
+# Профіль SQLite: WAL дозволяє читати під час запису скрейпера,
+# busy_timeout чекає на блокування замість помилки "database is locked".
+# auto_vacuum діє лише для нової БД (для існуючої - після VACUUM).
+SQLITE_PRAGMAS = {
+    "auto_vacuum": "INCREMENTAL",
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 10_000,
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64_000, # у KiB (від'ємне значення)
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
+DB_MAINTENANCE_INTERVAL = 6 * 3600.0
+DB_INCREMENTAL_VACUUM_PAGES = 2000
 CHAPTERS_FILE = "data/manga_ouash.json"
 
 BASE_URL = "https://mangabuff.ru"
+# Повтори запитів та автоматичний вимикач (utils/network_utils.py)
+RETRY_MAX_ATTEMPTS = 4 # Усього спроб, включно з першою
+RETRY_BACKOFF_BASE = 2.0 # Експоненційна пауза: до base * 2^(спроба-1) с (повний jitter)
+RETRY_BACKOFF_MAX = 120.0
+RETRY_AFTER_MAX = 900.0 # Верхня межа для заголовка Retry-After
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# POST-ендпоінти, що лише читають дані: повторюються на 5xx, як GET.
+# Решта POST (/addHistory, /takeCandy, ...) на 5xx не повторюються - сервер міг
+# уже виконати запит; лише 429 та 503 з Retry-After означають, що не виконав.
+RETRY_IDEMPOTENT_POST_PATHS = ("/chapters/load",)
+CIRCUIT_FAILURE_THRESHOLD = 5 # Невдач поспіль до розмикання для хоста
+CIRCUIT_COOLDOWN = 60.0 # Пауза після розмикання, подвоюється при повторних збоях
+CIRCUIT_COOLDOWN_MAX = 900.0
+# Пул проксі (utils/network_utils.py): "proxy_pool" у конфігу + старий "proxies"
+PROXY_EWMA_ALPHA = 0.3 # Вага нового виміру в ковзних затримці та частці помилок
+PROXY_SWITCH_RATIO = 2.0 # Акаунт переходить на інший проксі, якщо його гірший у стільки разів
+PROXY_EVICT_ERROR_RATE = 0.5
+PROXY_EVICT_MIN_SAMPLES = 3
+PROXY_EVICT_CONSECUTIVE = 3 # Помилок поспіль до вилучення проксі
+PROXY_REPROBE_AFTER = 300.0 # Пауза перед пробним запитом через вилучений проксі
+PROXY_PROBE_URL = BASE_URL
+PROXY_PROBE_TIMEOUT = 10.0
+# Дисковий HTTP-кеш умовних запитів скрейпера (utils/http_cache.py)
+HTTP_CACHE_ENABLED = True
+HTTP_CACHE_DIR = "data/http_cache_ouash"
+HTTP_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Архів сирих сторінок для повторного парсингу без мережі (utils/page_archive.py)
+PAGE_ARCHIVE_ENABLED = False
+PAGE_ARCHIVE_DIR = "data/page_archive_ouash"
+PAGE_ARCHIVE_SEGMENT_BYTES = 64 * 1024 * 1024
+BACKFILL_BATCH = 50 # Манг на одну транзакцію запису при відновленні з архіву
 COOKIE_TTL = 28_800
+SESSION_STORE_FILE = "data/session_ouash.json" # Cookies та CSRF між запусками
+CSRF_TTL = 2 * 3600 # Скільки збережений CSRF-токен вважається дійсним без перевірки
+AUTH_REFRESH_STATUSES = (401, 419) # Оновити авторизацію та повторити запит
 ADD_HISTORY_PATH = "/addHistory?r=702"
 TAKE_CANDY_PATH = "/halloween/takeCandy"
-DELAY = 5400.0
+DELAY = 5400.0 # Мінімальний інтервал між запитами /addHistory
+# Бюджети запитів для RateLimiter (utils/network_utils.py), перше правило, що
+# збіглося зі шляхом URL, визначає ендпоінт: (назва, regex шляху, запитів/с, запас).
+# rate=None - без бюджету, лише мінімальний інтервал з параметра delay.
+# /addHistory та /takeCandy в одній групі: delay цукерки відлічується від /addHistory.
+RATE_LIMITS = [
+    ("manga_list", r"^/manga/?$", 1 / 3, 1),
+    ("manga_page", r"^/manga/.+", 1 / 2, 3),
+    ("chapters_load", r"^/chapters/load", 1 / 2, 3),
+    ("rewards", r"^/(addHistory|halloween/takeCandy)", None, 1),
+]
 TARGET_COUNT = 10
 SCRAPER_MANGA_PER_PAGE = 30
+HTML_PARSER = "lxml" # "lxml" (pip install .[fast]) або "bs4"; без lxml - завжди bs4
+HTML_PARSE_STREAMING = True # Будувати дерево лише для карток/глав, а не всієї сторінки
+PARSE_PROCESSES = 0 # Процесів для HTML-парсингу (0 - парсити в потоках скрейпера), напр. os.cpu_count() - 1
+SCRAPER_WORKERS = 4 # Паралельне завантаження глав (1 - послідовно), темп - за RATE_LIMITS
+SCRAPER_SAVE_BATCH = 5 # Манг на одну транзакцію запису в конвеєрі скрейпера
+SCRAPER_QUEUE_SIZE = 8 # Місткість черг між стадіями конвеєра
+SCRAPER_INCREMENTAL = True # Для відомих манг парсити лише глави, новіші за збережені
+SCRAPER_KNOWN_CHAPTERS = 3 # Скільки найновіших збережених глав шукати на сторінці
+CRAWL_PAGES_PER_RUN = 3 # Сторінок каталогу за один обхід колектора
+CRAWL_PAGE_WORKERS = 1 # Сторінок каталогу одночасно; >1 - db_id нових манг уже не за порядком каталогу
+CRAWL_REVISIT_AFTER = 24 * 3600 # Оброблені сторінки перевіряються знову не раніше ніж через
+TRACKED_REFRESH_INTERVAL = 24 * 3600 # Пошук нових глав манг з БД, коли обхід каталогу їх не дав (не частіше, с)
+TRACKED_REFRESH_LIMIT = None # Скільки манг з БД оновлювати за раз (None - усі)
 BATCH_SIZE = 2
+LEDGER_FLUSH_SIZE = 20 # Журнал нагород пишеться в БД пачками
+LEDGER_FLUSH_INTERVAL = 300.0
+LEDGER_FLUSH_ENDPOINTS = ("addHistory",) # Події цих ендпоінтів пишуться одразу (разом з буфером)
+COLLECTOR_ASYNC = False # Колектор на asyncio: обхід, оновлення сесії та читання БД - у паузах між /addHistory
+COLLECTOR_IDLE_GUARD = 60.0 # Фонова робота не починається, якщо до запиту нагороди лишилось менше (с)
+COLLECTOR_IDLE_CRAWL_WINDOW = 900.0 # Мінімальна пауза (с), у якій запускається фоновий обхід каталогу
+COLLECTOR_PREFETCH_BATCHES = 4 # Порцій глав, підвантажених з БД наперед
+SESSION_REFRESH_INTERVAL = CSRF_TTL / 2 # Планове оновлення CSRF-токена, поки старий ще дійсний
 MODE = "card" # "candy" or "card"
+WALK_MODE = "unread" # "unread" or "keyset"
+VERIFY_CHAPTER_STATS = True # Звіряти (і виправляти) статистику глав манг при старті
 PARAMS = {
     "type_id[0]": "3",
     "tags[0]": "7702",